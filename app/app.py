@@ -1,20 +1,36 @@
+import gc
 import os
 import sys
-import json
 import shutil
 import asyncio
 import logging
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Depends
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict
-import subprocess
 import aiofiles
 
-# Import ProjectManager
-from project import ProjectManager
+# Project registry and rendering
+from projects import ProjectRegistry, Project, DEFAULT_PROJECT, split_run_key
+from render_queue import RenderPool, RenderQueue, PRIORITY_EDIT, PRIORITY_BATCH, DEFAULT_WORKERS
+from render_farm import FarmQueue, default_store_path
+from lease_store import LeaseStore, DEFAULT_LEASE_SECONDS
+from events import EventBus
+from task_runner import TaskRunner
+from pipeline import AudioPipeline, DEFAULT_CPU_WORKERS, DEFAULT_QUEUE_SIZE
+from preview import build_playlist, ensure_silence
+from tts import DEFAULT_PAUSE_MS, SAME_SPEAKER_PAUSE_MS
+from export import OUTPUT_BASENAME, FORMAT_PRESETS
+from profiling import PROFILES_DIR, list_profiles
+from json_store import get_file
+import progress
+import concurrency
+import tracing
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -26,11 +42,8 @@ app = FastAPI(title="Alexandria Audiobook")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(BASE_DIR)
 CONFIG_PATH = os.path.join(BASE_DIR, "config.json")
-VOICES_PATH = os.path.join(ROOT_DIR, "voices.json")
-VOICE_CONFIG_PATH = os.path.join(ROOT_DIR, "voice_config.json")
-SCRIPT_PATH = os.path.join(ROOT_DIR, "annotated_script.json")
-AUDIOBOOK_PATH = os.path.join(ROOT_DIR, "cloned_audiobook.mp3")
 UPLOADS_DIR = os.path.join(BASE_DIR, "uploads")
+PREVIEW_DIR = os.path.join(ROOT_DIR, "preview")
 
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 
@@ -44,8 +57,167 @@ VOICELINES_DIR = os.path.join(ROOT_DIR, "voicelines")
 os.makedirs(VOICELINES_DIR, exist_ok=True)
 app.mount("/voicelines", StaticFiles(directory=VOICELINES_DIR), name="voicelines")
 
-# Initialize Project Manager
-project_manager = ProjectManager(ROOT_DIR)
+# Push channel for chunk, log and progress events (see /api/events)
+event_bus = EventBus()
+
+# Throttled progress snapshots of script/audio tasks and render batches
+progress.on_update = lambda snapshot: event_bus.publish(
+    "progress", snapshot, project=split_run_key(snapshot["name"])[0]
+)
+
+# config.json, voice_config.json and state.json are read through json_store:
+# parsed once, re-read only when their mtime changes, written atomically
+config_file = get_file(CONFIG_PATH)
+
+app_config = config_file.load()
+render_config = app_config.get("render", {})
+pipeline_config = app_config.get("pipeline", {})
+
+# Adaptive caps on in-flight TTS/LLM requests, shared by every caller in this process
+tts_limiter = concurrency.configure("tts", app_config.get("tts", {}))
+concurrency.configure("llm", app_config.get("llm", {}))
+
+# Span tracing (opt-in via ALEXANDRIA_TRACE=1 or config "tracing.enabled"), see tracing.py
+tracing_config = app_config.get("tracing", {})
+if tracing_config.get("enabled"):
+    tracing.enable(tracing_config.get("path"))
+
+if tracing.enabled():
+    @app.middleware("http")
+    async def trace_request(request: Request, call_next):
+        # Root span of a request and of the tasks, renders and encodes it starts;
+        # a caller can make it part of its own trace with a traceparent header
+        with tracing.attach(request.headers.get("traceparent")), tracing.span(
+            "request", method=request.method, path=request.url.path,
+            project=request.query_params.get("project")
+        ) as span:
+            response = await call_next(request)
+            span.set("status", response.status_code)
+            return response
+
+# One pool of render workers for all projects, scheduled fair-share by characters
+render_pool = RenderPool(workers=render_config.get("workers", max(DEFAULT_WORKERS, tts_limiter.max_limit)))
+
+# Pipeline tasks run in-process on persistent threads; modules and clients stay warm.
+# Task names are per project (see projects.run_key), e.g. "script" or "<id>/script".
+def publish_task_event(event_type, key, data):
+    project_id, task = split_run_key(key)
+    event_bus.publish(event_type, {"task": task, **data}, project=project_id)
+
+task_runner = TaskRunner(
+    [],
+    on_log=lambda key, line: publish_task_event("log", key, {"line": line}),
+    on_status=lambda key, running: publish_task_event("status", key, {"running": running})
+)
+
+def setup_project(project):
+    """Wire a project's manager, render queue and tasks into the app (called by the registry)."""
+    pm = project.manager
+    pm.normalize_dbfs = pipeline_config.get("normalize_dbfs")
+    pm.on_chunks_changed = lambda chunks: event_bus.publish("chunks", chunks, project=project.id)
+
+    if render_config.get("mode") == "farm":
+        # Chunks are rendered by worker.py processes (and optionally app threads)
+        # leasing jobs from a SQLite store; each project has its own store
+        store_path = render_config.get("store") if project.id == DEFAULT_PROJECT else None
+        render_queue = FarmQueue(
+            pm,
+            LeaseStore(store_path or default_store_path(project.root_dir)),
+            local_workers=render_config.get("local_workers", 1),
+            lease_seconds=render_config.get("lease_seconds", DEFAULT_LEASE_SECONDS),
+            name=project.run_key("render")
+        )
+    else:
+        render_queue = RenderQueue(pm, pool=render_pool, name=project.run_key("render"))
+    render_queue.on_change = lambda status: event_bus.publish("render", status, project=project.id)
+    project.render_queue = render_queue
+    # Takes that fail QA are rendered again
+    pm.on_take_rejected = render_queue.retake
+
+    def on_chunks_rebuilt():
+        # Queued indices point at the old chunk list
+        render_queue.cancel()
+        event_bus.publish("resync", {}, project=project.id)
+
+    pm.on_chunks_rebuilt = on_chunks_rebuilt
+
+    for task in ("script", "voices", "audio"):
+        task_runner.add(project.run_key(task))
+
+projects = ProjectRegistry(ROOT_DIR, CONFIG_PATH, default_uploads_dir=UPLOADS_DIR, setup=setup_project)
+default_project = projects.get(DEFAULT_PROJECT)
+
+async def get_project(project: str = DEFAULT_PROJECT) -> Project:
+    """Dependency: the project named by the ?project= query parameter (default: the root project)."""
+    found = projects.get(project)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return found
+
+# Handlers never touch files, parse JSON or build audio on the event loop: that
+# work runs on a bounded pool, so a bulk render rewriting chunks.json (and
+# holding its lock) cannot stall other requests or the event stream
+API_IO_THREADS = 8
+api_executor = ThreadPoolExecutor(max_workers=API_IO_THREADS, thread_name_prefix="api-io")
+
+# Render workers and pipeline stages run at idle CPU priority but still share
+# the GIL; make them hand it back to the event loop after 1 ms instead of 5
+GIL_SWITCH_INTERVAL = 0.001
+sys.setswitchinterval(GIL_SWITCH_INTERVAL)
+
+async def run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # In a copy of the handler's context, so trace spans nest under its request
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(api_executor, functools.partial(context.run, func, *args, **kwargs))
+
+def rebuild_chunks(project):
+    """Update chunks.json after the script or voice config changed, keeping reusable audio."""
+    try:
+        return project.manager.rebuild_chunks()
+    except Exception as e:
+        logger.error(f"Chunk rebuild failed for project {project.id}: {e}")
+        return None
+
+def start_project(project):
+    # Pick up script or voice edits made while the server was down
+    rebuild_chunks(project)
+    project.render_queue.start()
+
+def warmup_voice():
+    """First custom voice in voice_config.json, used for the TTS warm-up call."""
+    for voice_data in default_project.manager.load_voice_config().values():
+        if voice_data.get("type", "custom") == "custom":
+            return voice_data.get("voice") or "Ryan"
+    return "Ryan"
+
+@app.on_event("startup")
+async def start_render_queue():
+    if pipeline_config.get("enabled", True) and render_config.get("mode") != "farm":
+        # Render workers only wait on TTS; decode/normalize/encode run in a staged pool
+        render_pool.pipeline = AudioPipeline(
+            cpu_workers=pipeline_config.get("cpu_workers", DEFAULT_CPU_WORKERS),
+            queue_size=pipeline_config.get("queue_size", DEFAULT_QUEUE_SIZE),
+            normalize_dbfs=pipeline_config.get("normalize_dbfs"),
+            background=True
+        )
+    for project in projects.list():
+        start_project(project)
+    if render_config.get("mode") != "farm":
+        render_pool.start()
+    # Connect and warm up in the background so the first rendered chunk is fast
+    default_project.manager.get_client_manager().start(voice=warmup_voice())
+    # Everything loaded so far lives for the whole run; keep full collections
+    # (triggered by render churn) from rescanning it and pausing every request
+    gc.freeze()
+
+@app.on_event("shutdown")
+async def stop_render_queue():
+    # Render bookkeeping is written to chunks.json with a short delay
+    for project in projects.list():
+        project.manager.flush_chunks()
+    if render_pool.pipeline is not None:
+        render_pool.pipeline.shutdown()
 
 # CORS for development
 app.add_middleware(
@@ -80,61 +252,33 @@ class VoiceConfigItem(BaseModel):
 class ProcessStatus(BaseModel):
     running: bool
     logs: List[str]
+    cursor: int
+    progress: Optional[dict] = None
 
 class ChunkUpdate(BaseModel):
     text: Optional[str] = None
     style: Optional[str] = None
     speaker: Optional[str] = None
 
-# Global state for process tracking
-process_state = {
-    "script": {"running": False, "logs": []},
-    "voices": {"running": False, "logs": []},
-    "audio": {"running": False, "logs": []}
-}
-
-def run_process(command: List[str], task_name: str):
-    """Run a subprocess and capture logs."""
-    global process_state
-    process_state[task_name]["running"] = True
-    process_state[task_name]["logs"] = []
-
-    logger.info(f"Starting task {task_name}: {' '.join(command)}")
-
-    try:
-        # Use shell=True for Windows compatibility in some cases, but cleaner to pass list
-        # For Windows, we might need shell=True if relying on system path resolution for python
-        process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            cwd=BASE_DIR,
-            bufsize=1,
-            universal_newlines=True
-        )
+class RenderBatch(BaseModel):
+    indices: List[int]
 
-        for line in process.stdout:
-            log_line = line.strip()
-            if log_line:
-                process_state[task_name]["logs"].append(log_line)
-                # Keep log size manageable
-                if len(process_state[task_name]["logs"]) > 1000:
-                    process_state[task_name]["logs"].pop(0)
+class ProjectCreate(BaseModel):
+    name: str
 
-        process.wait()
-        return_code = process.returncode
+def run_generate_script(project, input_file: str):
+    import generate_script
+    result = generate_script.main([input_file], root_dir=project.root_dir, run_name=project.run_key("script"))
+    rebuild_chunks(project)
+    return result
 
-        if return_code == 0:
-            process_state[task_name]["logs"].append(f"Task {task_name} completed successfully.")
-        else:
-            process_state[task_name]["logs"].append(f"Task {task_name} failed with return code {return_code}.")
+def run_parse_voices(project):
+    import parse_voices
+    return parse_voices.main(root_dir=project.root_dir)
 
-    except Exception as e:
-        logger.error(f"Error running {task_name}: {e}")
-        process_state[task_name]["logs"].append(f"Error: {str(e)}")
-    finally:
-        process_state[task_name]["running"] = False
+def run_generate_audiobook(project):
+    import generate_audiobook
+    return generate_audiobook.main(root_dir=project.root_dir, run_name=project.run_key("audio"))
 
 # Endpoints
 
@@ -144,7 +288,7 @@ async def read_index():
 
 @app.get("/api/config")
 async def get_config():
-    if not os.path.exists(CONFIG_PATH):
+    if not config_file.exists():
         # Return defaults if no config
         return {
             "llm": {
@@ -156,178 +300,376 @@ async def get_config():
                 "url": "http://127.0.0.1:7860"
             }
         }
-    with open(CONFIG_PATH, "r") as f:
-        return json.load(f)
+    return await run_blocking(config_file.load)
 
 @app.post("/api/config")
 async def save_config(config: AppConfig):
-    with open(CONFIG_PATH, "w") as f:
-        json.dump(config.dict(), f, indent=2)
+    def save():
+        old_manager = default_project.manager.get_client_manager()
+        config_file.save(config.dict())
+
+        new_manager = default_project.manager.get_client_manager()
+        if new_manager is not old_manager:
+            old_manager.stop()
+            new_manager.start(voice=warmup_voice())
+
+    await run_blocking(save)
     return {"status": "saved"}
 
+@app.get("/api/tts/status")
+async def tts_status():
+    return default_project.manager.get_client_manager().status()
+
+# --- Projects (select one with ?project=<id>; without it the root project is used) ---
+
+@app.get("/api/projects")
+async def list_projects():
+    def summaries():
+        result = []
+        for project in projects.list():
+            status = project.render_queue.status()
+            result.append({
+                **project.info(),
+                "queued": status["queued"],
+                "active": len(status["active"]),
+                "running": [task for task in ("script", "voices", "audio")
+                            if task_runner.is_running(project.run_key(task))],
+            })
+        return result
+
+    return await run_blocking(summaries)
+
+@app.post("/api/projects")
+async def create_project(data: ProjectCreate):
+    try:
+        project = await run_blocking(projects.create, data.name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await run_blocking(start_project, project)
+    return project.info()
+
+@app.get("/api/projects/{project_id}/voicelines/{filename}")
+async def project_voiceline(project_id: str, filename: str):
+    """Voicelines of non-default projects (the default project's are under /voicelines)."""
+    project = await get_project(project_id)
+    if os.path.basename(filename) != filename:
+        raise HTTPException(status_code=400, detail="Invalid file name")
+    path = os.path.join(project.manager.voicelines_dir, filename)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Voiceline not found")
+    return FileResponse(path)
+
 @app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
-    file_path = os.path.join(UPLOADS_DIR, file.filename)
+async def upload_file(file: UploadFile = File(...), project: Project = Depends(get_project)):
+    os.makedirs(project.uploads_dir, exist_ok=True)
+    file_path = os.path.join(project.uploads_dir, os.path.basename(file.filename))
     async with aiofiles.open(file_path, 'wb') as out_file:
         content = await file.read()
         await out_file.write(content)
 
     # Save input path to state.json to be compatible with original scripts if needed
-    state_path = os.path.join(ROOT_DIR, "state.json")
-    state = {}
-    if os.path.exists(state_path):
-        with open(state_path, "r") as f:
-            try:
-                state = json.load(f)
-            except: pass
-
-    state["input_file_path"] = file_path
-    with open(state_path, "w") as f:
-        json.dump(state, f, indent=2)
+    await run_blocking(project.manager.state_file.update, lambda state: state.update(input_file_path=file_path))
 
     return {"filename": file.filename, "path": file_path}
 
 @app.post("/api/generate_script")
-async def generate_script(background_tasks: BackgroundTasks):
+async def generate_script(project: Project = Depends(get_project)):
     # Get input file from state.json
-    state_path = os.path.join(ROOT_DIR, "state.json")
-    if not os.path.exists(state_path):
+    state_file = project.manager.state_file
+    if not state_file.exists():
         raise HTTPException(status_code=400, detail="No input file selected")
 
-    with open(state_path, "r") as f:
-        state = json.load(f)
-        input_file = state.get("input_file_path")
+    input_file = (await run_blocking(state_file.load)).get("input_file_path")
 
     if not input_file:
          raise HTTPException(status_code=400, detail="No input file found in state")
 
-    if process_state["script"]["running"]:
+    if not task_runner.start(project.run_key("script"), run_generate_script, project, input_file):
          raise HTTPException(status_code=400, detail="Script generation already running")
-
-    background_tasks.add_task(run_process, [sys.executable, "-u", "generate_script.py", input_file], "script")
     return {"status": "started"}
 
 @app.get("/api/status/{task_name}")
-async def get_status(task_name: str):
-    if task_name not in process_state:
+async def get_status(task_name: str, cursor: Optional[int] = None, project: Project = Depends(get_project)):
+    """Task state. Pass back the returned cursor to receive only new log lines."""
+    key = project.run_key(task_name)
+    if key not in task_runner:
         raise HTTPException(status_code=404, detail="Task not found")
-    return process_state[task_name]
+    status = task_runner.status(key, cursor)
+    status["progress"] = progress.snapshot(key)
+    return status
+
+@app.get("/api/progress")
+async def get_progress(project: Project = Depends(get_project)):
+    """Latest progress run per name (script, audio, render) of a project."""
+    runs = {}
+    for key, snapshot in progress.snapshots().items():
+        project_id, name = split_run_key(key)
+        if project_id == project.id:
+            runs[name] = snapshot
+    return runs
+
+@app.get("/api/progress/history")
+async def get_progress_history(name: Optional[str] = None, limit: int = 100):
+    """Persisted summaries of finished runs, newest first, for comparing backends and settings."""
+    return await run_blocking(progress.load_history, name, limit)
+
+@app.get("/api/events")
+async def events_endpoint(request: Request, project: Project = Depends(get_project)):
+    """Server-Sent Events stream of one project's chunk changes, task logs and render progress."""
+    return StreamingResponse(
+        event_bus.stream(request, project.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/api/voices")
-async def get_voices():
-    # Run parse_voices first to ensure we have latest
-    # But we don't want to block, so we'll just read what's there
-    # User can trigger parse manually if needed
-
-    if not os.path.exists(VOICES_PATH):
-        return []
+async def get_voices(project: Project = Depends(get_project)):
+    """Speakers with their voice config and script stats, from the script index."""
+    index = await run_blocking(project.manager.get_script_index)
+    voice_config = await run_blocking(project.manager.load_voice_config)
 
-    with open(VOICES_PATH, "r") as f:
-        voices_list = json.load(f)
-
-    # Combine with config
-    voice_config = {}
-    if os.path.exists(VOICE_CONFIG_PATH):
-        with open(VOICE_CONFIG_PATH, "r") as f:
-            voice_config = json.load(f)
+    if index is None:
+        # No script yet: fall back to the last parsed voice list, if any
+        voices = await run_blocking(get_file(project.path("voices.json"), default=[]).load)
+        return [{"name": name, "config": voice_config.get(name, {})} for name in voices]
 
     result = []
-    for voice_name in voices_list:
-        config = voice_config.get(voice_name, {})
+    for voice_name, stats in index["speakers"].items():
         result.append({
             "name": voice_name,
-            "config": config
+            "config": voice_config.get(voice_name, {}),
+            "entries": len(stats["entries"]),
+            "chunks": len(stats["chunks"]),
+            "chars": stats["chars"],
+            "rendered_chunks": stats["rendered_chunks"],
+            "estimated_ms": stats["estimated_ms"],
         })
     return result
 
+@app.get("/api/voices/{speaker}")
+async def get_voice_index(speaker: str, project: Project = Depends(get_project)):
+    """Index lookup for one speaker: entry and chunk ids, characters, durations."""
+    index = await run_blocking(project.manager.get_script_index)
+    stats = (index or {}).get("speakers", {}).get(speaker)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Speaker not found")
+    offsets = [index["entries"][i]["offset"] for i in stats["entries"]]
+    return {"name": speaker, **stats, "offsets": offsets}
+
 @app.post("/api/parse_voices")
-async def parse_voices(background_tasks: BackgroundTasks):
-    if process_state["voices"]["running"]:
+async def parse_voices(project: Project = Depends(get_project)):
+    if not task_runner.start(project.run_key("voices"), run_parse_voices, project):
          raise HTTPException(status_code=400, detail="Voice parsing already running")
-
-    background_tasks.add_task(run_process, [sys.executable, "-u", "parse_voices.py"], "voices")
     return {"status": "started"}
 
 @app.post("/api/save_voice_config")
-async def save_voice_config(config_data: Dict[str, VoiceConfigItem]):
+async def save_voice_config(config_data: Dict[str, VoiceConfigItem], project: Project = Depends(get_project)):
     # Read existing to preserve any fields not sent?
     # For now, we assume frontend sends full config or we just overwrite specific keys
 
-    current_config = {}
-    if os.path.exists(VOICE_CONFIG_PATH):
-        with open(VOICE_CONFIG_PATH, "r") as f:
-            try:
-                current_config = json.load(f)
-            except: pass
-
-    # Update current config with new data
-    for voice_name, config in config_data.items():
-        # Convert Pydantic model to dict
-        current_config[voice_name] = config.dict()
+    def apply(current_config):
+        # Update current config with new data
+        for voice_name, config in config_data.items():
+            # Convert Pydantic model to dict
+            current_config[voice_name] = config.dict()
 
-    with open(VOICE_CONFIG_PATH, "w") as f:
-        json.dump(current_config, f, indent=2)
+    await run_blocking(project.manager.voice_config_file.update, apply)
 
-    return {"status": "saved"}
+    # Chunks rendered with a voice that just changed need re-rendering
+    rebuild = await run_blocking(rebuild_chunks, project)
+    return {"status": "saved", "invalidated": rebuild["invalidated"] if rebuild else 0}
 
 @app.post("/api/generate_audiobook")
-async def generate_audiobook_endpoint(background_tasks: BackgroundTasks):
-    if process_state["audio"]["running"]:
+async def generate_audiobook_endpoint(project: Project = Depends(get_project)):
+    if not task_runner.start(project.run_key("audio"), run_generate_audiobook, project):
          raise HTTPException(status_code=400, detail="Audio generation already running")
-
-    background_tasks.add_task(run_process, [sys.executable, "-u", "generate_audiobook.py"], "audio")
     return {"status": "started"}
 
 @app.get("/api/audiobook")
-async def get_audiobook():
-    if not os.path.exists(AUDIOBOOK_PATH):
-        raise HTTPException(status_code=404, detail="Audiobook not found")
-    return FileResponse(AUDIOBOOK_PATH)
+async def get_audiobook(format: Optional[str] = None, project: Project = Depends(get_project)):
+    """Download the audiobook. Without ?format= the first exported format found is served."""
+    if format:
+        if format not in FORMAT_PRESETS and format != "wav":
+            raise HTTPException(status_code=400, detail="Unknown format")
+        candidates = [format]
+    else:
+        candidates = list(FORMAT_PRESETS) + ["wav"]
+
+    for name in candidates:
+        ext = FORMAT_PRESETS[name]["ext"] if name in FORMAT_PRESETS else name
+        path = project.path(f"{OUTPUT_BASENAME}.{ext}")
+        if os.path.exists(path):
+            return FileResponse(path)
+    raise HTTPException(status_code=404, detail="Audiobook not found")
+
+# --- Profiling (opt-in via ALEXANDRIA_PROFILE=1 or config "profiling.enabled") ---
+
+@app.get("/api/profiles")
+async def get_profiles():
+    return await run_blocking(list_profiles)
+
+@app.get("/api/profiles/{filename}")
+async def get_profile_file(filename: str):
+    if os.path.basename(filename) != filename or not filename.endswith((".json", ".prof")):
+        raise HTTPException(status_code=400, detail="Invalid profile file")
+    path = os.path.join(PROFILES_DIR, filename)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=filename)
+
+# --- Live Preview (listen while rendering) ---
+
+@app.get("/api/preview/playlist.m3u8")
+async def preview_playlist(project: Project = Depends(get_project)):
+    chunks = await run_blocking(project.manager.load_chunks)
+    # May probe durations of chunks rendered before duration_ms was recorded
+    playlist, _, _ = await run_blocking(
+        build_playlist, chunks, project.root_dir,
+        silence_uri=lambda ms, fmt: f"/api/preview/silence/{ms}.{fmt}",
+        audio_prefix="/" if project.id == DEFAULT_PROJECT else f"/api/projects/{project.id}/"
+    )
+    return Response(
+        content=playlist,
+        media_type="application/vnd.apple.mpegurl",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@app.get("/api/preview/silence/{duration_ms}.{fmt}")
+async def preview_silence(duration_ms: int, fmt: str):
+    if duration_ms not in (DEFAULT_PAUSE_MS, SAME_SPEAKER_PAUSE_MS) or fmt not in ("mp3", "wav"):
+        raise HTTPException(status_code=404, detail="Silence segment not found")
+    path = await run_blocking(ensure_silence, PREVIEW_DIR, duration_ms, fmt)
+    return FileResponse(path)
 
 # --- Chunk Management Endpoints ---
 
 @app.get("/api/chunks")
-async def get_chunks():
-    chunks = project_manager.load_chunks()
-    return chunks
+async def get_chunks(
+    request: Request,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    speaker: Optional[str] = None,
+    status: Optional[str] = None,
+    q: Optional[str] = None,
+    since: Optional[int] = None,
+    project: Project = Depends(get_project)
+):
+    """List chunks.
+
+    Without query parameters this returns the full chunk list (legacy shape).
+    With any of offset/limit/speaker/status/q/since it returns a page object:
+    {items, total, count, offset, limit, version, epoch, status_counts}.
+    `since=<version>` limits items to rows changed after that version and
+    adds `ids`, the ids of every row in the window.
+    """
+    pm = project.manager
+    if_none_match = request.headers.get("if-none-match")
+    legacy = not set(request.query_params) - {"project"}
+
+    def respond():
+        # Serializing thousands of chunks is too slow to do on the loop
+        etag = pm.chunks_etag()
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        if legacy:
+            return JSONResponse(pm.chunks_snapshot()[1], headers={"ETag": etag})
+        page = pm.query_chunks(offset=offset, limit=limit, speaker=speaker, status=status, q=q, since=since)
+        return JSONResponse(page, headers={"ETag": etag})
+
+    return await run_blocking(respond)
 
 @app.post("/api/chunks/{index}")
-async def update_chunk(index: int, update: ChunkUpdate):
+async def update_chunk(index: int, update: ChunkUpdate, project: Project = Depends(get_project)):
     data = update.dict(exclude_unset=True)
-    chunk = project_manager.update_chunk(index, data)
+    chunk = await run_blocking(project.manager.update_chunk, index, data)
     if not chunk:
         raise HTTPException(status_code=404, detail="Chunk not found")
     return chunk
 
 @app.post("/api/chunks/{index}/generate")
-async def generate_chunk_endpoint(index: int, background_tasks: BackgroundTasks):
-    def task():
-        project_manager.generate_chunk_audio(index)
+async def generate_chunk_endpoint(index: int, project: Project = Depends(get_project)):
+    chunks = await run_blocking(project.manager.load_chunks)
+    if not (0 <= index < len(chunks)):
+        raise HTTPException(status_code=404, detail="Chunk not found")
 
-    background_tasks.add_task(task)
-    return {"status": "started"}
+    # Single-chunk renders from the editor jump ahead of bulk jobs
+    await run_blocking(project.render_queue.enqueue, index, priority=PRIORITY_EDIT)
+    return {"status": "queued"}
+
+# --- Render Queue Endpoints ---
+
+@app.post("/api/render/all")
+async def render_all_endpoint(project: Project = Depends(get_project)):
+    chunks = await run_blocking(project.manager.load_chunks)
+    pending = [c["id"] for c in chunks if c.get("status") != "done"]
+    queued = await run_blocking(project.render_queue.enqueue_many, pending, priority=PRIORITY_BATCH)
+    return {"status": "queued", "queued": len(queued)}
+
+@app.post("/api/render/batch")
+async def render_batch_endpoint(batch: RenderBatch, project: Project = Depends(get_project)):
+    total = len(await run_blocking(project.manager.load_chunks))
+    indices = [i for i in batch.indices if 0 <= i < total]
+    queued = await run_blocking(project.render_queue.enqueue_many, indices, priority=PRIORITY_BATCH)
+    return {"status": "queued", "queued": len(queued)}
+
+@app.post("/api/render/speaker/{speaker}")
+async def render_speaker_endpoint(speaker: str, project: Project = Depends(get_project)):
+    """Re-render every chunk of one speaker (e.g. after tweaking their voice)."""
+    indices = await run_blocking(project.manager.speaker_chunk_ids, speaker)
+    if not indices:
+        raise HTTPException(status_code=404, detail="Speaker has no chunks")
+    queued = await run_blocking(project.render_queue.enqueue_many, indices, priority=PRIORITY_BATCH)
+    return {"status": "queued", "queued": len(queued)}
+
+@app.post("/api/render/cancel")
+async def render_cancel_endpoint(project: Project = Depends(get_project)):
+    cancelled = await run_blocking(project.render_queue.cancel)
+    return {"status": "cancelled", "cancelled": len(cancelled)}
+
+@app.post("/api/render/pause")
+async def render_pause_endpoint(project: Project = Depends(get_project)):
+    await run_blocking(project.render_queue.pause)
+    return await run_blocking(project.render_queue.status)
+
+@app.post("/api/render/resume")
+async def render_resume_endpoint(project: Project = Depends(get_project)):
+    await run_blocking(project.render_queue.resume)
+    return await run_blocking(project.render_queue.status)
+
+@app.get("/api/render/status")
+async def render_status_endpoint(project: Project = Depends(get_project)):
+    render_queue = project.render_queue
+    # A farm queue's status is a SQLite query
+    status = await run_blocking(render_queue.status)
+    if render_queue.pipeline:
+        status["pipeline"] = render_queue.pipeline.stats()
+    status["progress"] = progress.snapshot(render_queue.name)
+    status["concurrency"] = concurrency.get_limiter("tts").status()
+    return status
+
+@app.get("/api/render/pool")
+async def render_pool_endpoint():
+    """Shared render workers and the characters each project has been served."""
+    return render_pool.status()
+
+@app.get("/api/concurrency")
+async def concurrency_endpoint():
+    """Current adaptive concurrency limits per backend (llm, tts)."""
+    return concurrency.statuses()
 
 @app.post("/api/merge")
-async def merge_audio_endpoint(background_tasks: BackgroundTasks):
-    # Reuse audio process state for merge if possible, or just background it
-    # For simplicity, we just background it and frontend will assume it works
-    # Or we can link it to process_state["audio"]
-
+async def merge_audio_endpoint(project: Project = Depends(get_project)):
     def task():
-        process_state["audio"]["running"] = True
-        process_state["audio"]["logs"] = ["Starting merge..."]
-        try:
-            success, msg = project_manager.merge_audio()
-            if success:
-                process_state["audio"]["logs"].append(f"Merge complete: {msg}")
-            else:
-                process_state["audio"]["logs"].append(f"Merge failed: {msg}")
-        except Exception as e:
-            process_state["audio"]["logs"].append(f"Merge error: {e}")
-        finally:
-            process_state["audio"]["running"] = False
-
-    background_tasks.add_task(task)
+        print("Starting merge...")
+        success, msg = project.manager.merge_audio()
+        if success:
+            print(f"Merge complete: {msg}")
+            return 0
+        print(f"Merge failed: {msg}")
+        return 1
+
+    if not task_runner.start(project.run_key("audio"), task):
+        raise HTTPException(status_code=400, detail="Audio generation already running")
     return {"status": "started"}
 
 if __name__ == "__main__":
@@ -0,0 +1,139 @@
+import os
+import json
+import hashlib
+import tempfile
+
+GRAPH_FILENAME = "build_graph.json"
+
+# Build graph layout (build_graph.json in the project root):
+#
+#   "script": source book -> LLM chunks -> script entries
+#       {"source_hash", "script_hash", "model",
+#        "llm_chunks": [{"hash", "offset", "length", "entry_start", "entry_end"}]}
+#       (hash is None for a chunk the LLM returned no entries for)
+#   "chunks": script entries -> TTS chunks
+#       {"script_hash"}  (each chunk in chunks.json carries "entries": [start, end]
+#                         and the "render_hash" its audio was rendered from)
+#   "merge": TTS chunk audio -> merge regions of the final audiobook
+#       {"regions": [{"start", "end", "key", "path"}]}
+#
+# Region boundaries are content-defined (see is_region_boundary) so inserting
+# or removing a line only invalidates the region around it.
+
+MERGE_REGION_SIZE = 50    # average chunks per merge region
+MAX_REGION_SIZE = 200
+
+def content_hash(*parts):
+    """Stable hash of JSON-serialisable inputs."""
+    data = json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:16]
+
+def file_hash(path):
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+def load_graph(root_dir):
+    path = os.path.join(root_dir, GRAPH_FILENAME)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Warning: ignoring unreadable {GRAPH_FILENAME}: {e}")
+    return {}
+
+def save_graph(root_dir, graph):
+    path = os.path.join(root_dir, GRAPH_FILENAME)
+    fd, tmp_path = tempfile.mkstemp(dir=root_dir, prefix=".build_graph_", suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(graph, f, indent=2)
+    os.replace(tmp_path, path)
+
+def update_graph(root_dir, section, value):
+    graph = load_graph(root_dir)
+    graph[section] = value
+    save_graph(root_dir, graph)
+
+def chunk_render_hash(chunk, voice_config):
+    """Everything that determines a chunk's audio: its text and its speaker's voice."""
+    speaker = chunk.get("speaker")
+    return content_hash(speaker, chunk.get("text", ""), chunk.get("style", ""), voice_config.get(speaker))
+
+def reconcile_chunks(old_chunks, new_chunks, voice_config):
+    """Carry rendered audio over from old_chunks to matching new_chunks.
+
+    A new chunk reuses audio from an old chunk with the same render hash. Chunks
+    rendered before render hashes existed are assumed current. Returns a list
+    of (old_audio_path, new_chunk) pairs whose files must move to match their
+    new position.
+    """
+    available = {}
+    for old in old_chunks:
+        if old.get("status") != "done" or not old.get("audio_path"):
+            continue
+        key = old.get("render_hash") or chunk_render_hash(old, voice_config)
+        available.setdefault(key, []).append(old)
+
+    moves = []
+    for chunk in new_chunks:
+        key = chunk_render_hash(chunk, voice_config)
+        candidates = available.get(key)
+        if not candidates:
+            continue
+        old = candidates.pop(0)
+        chunk["status"] = "done"
+        chunk["audio_path"] = old["audio_path"]
+        chunk["render_hash"] = key
+        if old.get("duration_ms"):
+            chunk["duration_ms"] = old["duration_ms"]
+        if old.get("qa"):
+            chunk["qa"] = old["qa"]
+        moves.append((old["audio_path"], chunk))
+    return moves
+
+def region_key(chunks, root_dir):
+    """Key of one merge region: the identity of every audio file in it.
+
+    Files are identified by render hash, size and mtime rather than by name, so
+    audio that was only renamed to a new chunk position keeps its region valid.
+    """
+    parts = []
+    for chunk in chunks:
+        path = chunk.get("audio_path")
+        full_path = os.path.join(root_dir, path) if path else None
+        if full_path and os.path.exists(full_path):
+            st = os.stat(full_path)
+            identity = chunk.get("render_hash") or path
+            parts.append((identity, st.st_size, st.st_mtime_ns, chunk.get("speaker")))
+        else:
+            parts.append((None, chunk.get("speaker")))
+    return content_hash(parts)
+
+def is_region_boundary(chunk, region_length):
+    """Whether a merge region ends after this chunk.
+
+    Decided by the chunk's own content, so boundaries stay put when lines are
+    inserted or removed elsewhere.
+    """
+    if region_length >= MAX_REGION_SIZE:
+        return True
+    h = content_hash(chunk.get("speaker"), chunk.get("text", ""))
+    return int(h, 16) % MERGE_REGION_SIZE == 0
+
+def split_regions(chunks):
+    """Split chunks into merge regions. Returns a list of lists."""
+    regions = []
+    current = []
+    for chunk in chunks:
+        current.append(chunk)
+        if is_region_boundary(chunk, len(current)):
+            regions.append(current)
+            current = []
+    if current:
+        regions.append(current)
+    return regions
@@ -0,0 +1,198 @@
+import os
+import time
+import threading
+import itertools
+from collections import deque
+
+# Per-backend defaults; "max_concurrency" in the llm/tts sections of config.json
+# overrides max_limit. Gradio TTS servers often run one job at a time, so both
+# start at 1 and only grow while the backend keeps up.
+DEFAULT_SETTINGS = {
+    "llm": {"initial": 1, "max_limit": 4},
+    "tts": {"initial": 1, "max_limit": 4},
+}
+
+SMOOTHING = 0.2        # EWMA weight of each new latency sample
+BASELINE_DRIFT = 0.1   # how fast the baseline follows latency up while at the minimum limit
+MIN_SAMPLES = 5        # samples needed before latency can trigger a backoff
+GROW_BELOW = 1.2       # grow only while latency is within this factor of baseline
+BACKOFF_ABOVE = 1.5    # latency above baseline * BACKOFF_ABOVE counts as congestion
+BACKOFF = 0.7          # multiplicative decrease on congestion or errors
+SETTLE_SMOOTHING = 0.05  # EWMA weight for the reported settled limit
+
+class Slot:
+    """One in-flight request. Use as a context manager: an exception leaving
+    the block is recorded as an error. Set ok = False to record a failure that
+    was handled inside the block."""
+
+    def __init__(self, limiter, cost, saturated):
+        self.limiter = limiter
+        self.cost = max(1, cost)
+        self.saturated = saturated
+        self.started = time.monotonic()
+        self.ok = True
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.limiter._release(self, self.ok)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.ok = False
+        self.release()
+        return False
+
+class AdaptiveLimiter:
+    """AIMD limit on concurrent requests to one backend (LLM or TTS server).
+
+    Requests wait in FIFO order for a slot. Latency is divided by the
+    request's cost (characters sent) and smoothed, so a mix of long and short
+    chunks averages out. The baseline follows the smoothed latency down at
+    once, but up only while the limit is at its minimum (then nothing we send
+    can be queueing), so sustained queueing never becomes the new normal. While the limit is fully used and latency stays within
+    GROW_BELOW of the baseline, the limit grows by about one slot per limit's
+    worth of completions. An error, or latency above BACKOFF_ABOVE times the
+    baseline, cuts it by BACKOFF, at most once per round of requests.
+    """
+
+    def __init__(self, name, initial=1, min_limit=1, max_limit=4):
+        self.name = name
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.settled = self.limit   # limit averaged over recent completions (AIMD saw-tooths)
+        self.in_flight = 0
+        self.completed = 0
+        self.errors = 0
+        self._smoothed = None
+        self._baseline = None
+        self._samples = 0
+        self._last_decrease = 0.0
+        self._tickets = itertools.count()
+        self._waiting = deque()
+        self._cond = threading.Condition()
+
+    def configure(self, max_limit=None, initial=None):
+        with self._cond:
+            if max_limit is not None:
+                self.max_limit = max(self.min_limit, int(max_limit))
+            if initial is not None:
+                self.limit = float(initial)
+            self.limit = min(max(self.limit, self.min_limit), self.max_limit)
+            self._cond.notify_all()
+        return self
+
+    def acquire(self, cost=1):
+        """Block until a slot is free. Returns a Slot to release when done."""
+        with self._cond:
+            ticket = next(self._tickets)
+            self._waiting.append(ticket)
+            while self._waiting[0] != ticket or self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self._waiting.popleft()
+            self.in_flight += 1
+            saturated = self.in_flight >= int(self.limit)
+            self._cond.notify_all()
+        return Slot(self, cost, saturated)
+
+    def wait_for_capacity(self):
+        """Block until a request could start right away (a hint; acquire() still queues)."""
+        with self._cond:
+            while self._waiting or self.in_flight >= int(self.limit):
+                self._cond.wait()
+
+    def _release(self, slot, ok):
+        now = time.monotonic()
+        latency = (now - slot.started) / slot.cost
+        with self._cond:
+            before = int(self.limit)
+            self.in_flight -= 1
+            reason = None
+            if not ok:
+                self.errors += 1
+                reason = self._decrease(slot, now, "error")
+            else:
+                self.completed += 1
+                self._samples += 1
+                if self._smoothed is None:
+                    self._smoothed = self._baseline = latency
+                self._smoothed += SMOOTHING * (latency - self._smoothed)
+                if self._smoothed < self._baseline:
+                    self._baseline = self._smoothed
+                elif int(self.limit) <= self.min_limit:
+                    # e.g. a slower model was loaded
+                    self._baseline += BASELINE_DRIFT * (self._smoothed - self._baseline)
+                ratio = self._smoothed / self._baseline
+                if self._samples >= MIN_SAMPLES and ratio > BACKOFF_ABOVE:
+                    reason = self._decrease(slot, now, f"latency {ratio:.1f}x baseline")
+                elif slot.saturated and ratio <= GROW_BELOW:
+                    # Only grow when the current limit was actually in use
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.settled += SETTLE_SMOOTHING * (int(self.limit) - self.settled)
+            after = int(self.limit)
+            self._cond.notify_all()
+
+        if after != before:
+            print(f"{self.name} concurrency limit {before} -> {after}" + (f" ({reason})" if reason else ""))
+
+    def _decrease(self, slot, now, reason):
+        # Requests started before the last cut saw the old limit; don't punish twice
+        if slot.started < self._last_decrease:
+            return None
+        self.limit = max(self.min_limit, self.limit * BACKOFF)
+        self._last_decrease = now
+        return reason
+
+    def status(self):
+        with self._cond:
+            baseline = self._baseline
+            return {
+                "name": self.name,
+                "limit": int(self.limit),
+                "settled": round(self.settled, 1),
+                "max_limit": self.max_limit,
+                "in_flight": self.in_flight,
+                "waiting": len(self._waiting),
+                "completed": self.completed,
+                "errors": self.errors,
+                "baseline_ms_per_char": round(baseline * 1000, 3) if baseline is not None else None,
+                "latency_ms_per_char": round(self._smoothed * 1000, 3) if self._smoothed is not None else None,
+            }
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(name):
+    """Return the shared limiter for a backend ("llm" or "tts")."""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = AdaptiveLimiter(name, **DEFAULT_SETTINGS.get(name, {}))
+        return _limiters[name]
+
+def configure(name, config_section):
+    """Apply "max_concurrency" from a config.json section (llm or tts)."""
+    return get_limiter(name).configure(max_limit=(config_section or {}).get("max_concurrency"))
+
+def statuses():
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.status() for limiter in limiters}
+
+def lower_priority():
+    """Move the calling thread to the idle CPU class, so it only runs when nothing
+    else wants the core. Threads and processes it starts inherit the class.
+
+    Render workers and the audio pipeline call this: on a small machine a bulk
+    render would otherwise take CPU time away from API requests. Linux only.
+    """
+    if not hasattr(os, "SCHED_IDLE"):
+        return
+    try:
+        os.sched_setscheduler(threading.get_native_id(), os.SCHED_IDLE, os.sched_param(0))
+    except OSError as e:
+        print(f"Could not lower the CPU priority of {threading.current_thread().name}: {e}")
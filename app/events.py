@@ -0,0 +1,70 @@
+import json
+import asyncio
+import threading
+
+SUBSCRIBER_QUEUE_SIZE = 1000
+KEEPALIVE_SECONDS = 15
+
+class EventBus:
+    """Fan out server events to connected Server-Sent Events clients.
+
+    publish() may be called from any thread (render workers, task threads);
+    each subscriber owns an asyncio.Queue on the server's event loop. Events
+    published for a project only reach subscribers of that project; events
+    without one reach everybody.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self, project=None):
+        loop = asyncio.get_running_loop()
+        q = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        sub = (loop, q, project)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, event_type, data, project=None):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, q, sub_project in subscribers:
+            if project is not None and sub_project != project:
+                continue
+            try:
+                loop.call_soon_threadsafe(_offer, q, event_type, data)
+            except RuntimeError:
+                # Loop already closed; the stream generator will clean up
+                pass
+
+    async def stream(self, request, project=None):
+        """Async generator yielding SSE frames until the client disconnects."""
+        sub = self.subscribe(project)
+        _, q, _ = sub
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event_type, data = await asyncio.wait_for(q.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+def _offer(q, event_type, data):
+    if q.full():
+        # Slow client: drop its backlog and tell it to re-fetch a snapshot
+        while not q.empty():
+            q.get_nowait()
+        q.put_nowait(("resync", {}))
+        return
+    q.put_nowait((event_type, data))
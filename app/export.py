@@ -0,0 +1,115 @@
+import os
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from profiling import record_stage, current_run, attach_run
+from task_runner import current_log_sink, bind_log_sink
+import tracing
+
+OUTPUT_BASENAME = "cloned_audiobook"
+
+# Encoder settings per output format. Anything set under "export.formats" in
+# config.json overrides these; "bitrate" and "sample_rate" are the usual knobs.
+FORMAT_PRESETS = {
+    "mp3": {"ext": "mp3", "container": "mp3", "codec": "libmp3lame", "bitrate": None, "sample_rate": None},
+    "opus": {"ext": "opus", "container": "ogg", "codec": "libopus", "bitrate": "32k", "sample_rate": 48000},
+    "m4b": {"ext": "m4b", "container": "ipod", "codec": "aac", "bitrate": "128k", "sample_rate": 44100},
+}
+
+# Without configuration the export matches the old single MP3 at ffmpeg defaults
+DEFAULT_FORMATS = {"mp3": {}}
+
+_PCM_FORMATS = {1: "u8", 2: "s16le", 3: "s24le", 4: "s32le"}
+
+def resolve_formats(formats=None):
+    """Merge configured formats over the presets. Unknown formats are skipped."""
+    resolved = {}
+    for name, overrides in (formats or DEFAULT_FORMATS).items():
+        if name not in FORMAT_PRESETS:
+            print(f"Warning: unknown export format '{name}', skipping")
+            continue
+        settings = dict(FORMAT_PRESETS[name])
+        settings.update(overrides or {})
+        resolved[name] = settings
+    return resolved
+
+def encode_pcm(pcm, audio_format, output_path, settings):
+    """Encode raw PCM to output_path by piping it into one ffmpeg process."""
+    from pydub import AudioSegment
+    command = [
+        AudioSegment.converter, "-y", "-loglevel", "error",
+        "-f", audio_format["sample_fmt"],
+        "-ar", str(audio_format["frame_rate"]),
+        "-ac", str(audio_format["channels"]),
+        "-i", "pipe:0",
+        "-c:a", settings["codec"],
+    ]
+    if settings.get("bitrate"):
+        command += ["-b:a", str(settings["bitrate"])]
+    if settings.get("sample_rate"):
+        command += ["-ar", str(settings["sample_rate"])]
+    command += ["-f", settings["container"], output_path]
+
+    result = subprocess.run(command, input=pcm, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            env=tracing.subprocess_env())
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='replace').strip()}")
+
+def export_audiobook(audio, output_dir, formats=None, basename=OUTPUT_BASENAME):
+    """Write the assembled audiobook in every configured format.
+
+    The PCM stream is taken from the segment once and fanned out to one ffmpeg
+    encoder per format, all running in parallel. Falls back to a single WAV if
+    no encoder succeeds (e.g. ffmpeg is missing). Returns the filenames written.
+    """
+    settings_by_format = resolve_formats(formats)
+    pcm = audio.raw_data
+    audio_format = {
+        "sample_fmt": _PCM_FORMATS[audio.sample_width],
+        "frame_rate": audio.frame_rate,
+        "channels": audio.channels,
+    }
+
+    log_sink = current_log_sink()
+    trace_parent = tracing.current()
+    profile_run = current_run()
+
+    def run(name):
+        # Encoder threads print into the log of the task that started the export
+        bind_log_sink(log_sink)
+        with attach_run(profile_run):
+            return encode(name)
+
+    def encode(name):
+        settings = settings_by_format[name]
+        filename = f"{basename}.{settings['ext']}"
+        tmp_path = os.path.join(output_dir, f".{filename}.tmp")
+        start = time.perf_counter()
+        try:
+            with tracing.attach(trace_parent), tracing.span(f"export.{name}", codec=settings["codec"], bytes=len(pcm)):
+                encode_pcm(pcm, audio_format, tmp_path, settings)
+            os.replace(tmp_path, os.path.join(output_dir, filename))
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            print(f"  Export {name} failed after {time.perf_counter() - start:.1f}s: {e}")
+            return None
+        finally:
+            record_stage(f"export.{name}", time.perf_counter() - start)
+        size_mb = os.path.getsize(os.path.join(output_dir, filename)) / (1024 * 1024)
+        print(f"  Export {name}: {filename} ({size_mb:.1f} MB) in {time.perf_counter() - start:.1f}s")
+        return filename
+
+    print(f"Exporting {len(audio) / 1000:.0f}s of audio as {', '.join(settings_by_format)}...")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, len(settings_by_format))) as executor:
+        written = [f for f in executor.map(run, settings_by_format) if f]
+
+    if not written:
+        print("All encoders failed (ffmpeg missing?); saving WAV instead")
+        filename = f"{basename}.wav"
+        audio.export(os.path.join(output_dir, filename), format="wav")
+        written = [filename]
+
+    print(f"Export finished in {time.perf_counter() - start:.1f}s")
+    return written
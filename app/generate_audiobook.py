@@ -1,9 +1,15 @@
 import os
 import re
 import json
-from pydub import AudioSegment
-from gradio_client import Client, handle_file
-import shutil
+import threading
+from tts_client import get_manager
+from pipeline import AudioPipeline, DEFAULT_CPU_WORKERS, DEFAULT_QUEUE_SIZE
+from export import export_audiobook
+from profiling import profiled, stage
+from json_store import get_file
+from concurrency import configure as configure_concurrency
+from take_qa import QA_DEFAULTS, check_take, speaker_baseline, retake_voice
+import progress
 from tts import (
     sanitize_filename,
     preprocess_text_for_tts,
@@ -11,6 +17,7 @@ from tts import (
     generate_custom_voice,
     generate_clone_voice,
     generate_voice,
+    synthesize_voice,
     combine_audio_with_pauses,
     DEFAULT_PAUSE_MS,
     SAME_SPEAKER_PAUSE_MS
@@ -18,6 +25,9 @@ from tts import (
 
 MAX_CHUNK_CHARS = 500
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BASE_DIR)
+
 def group_into_chunks(script_entries, max_chars=MAX_CHUNK_CHARS):
     """Group consecutive entries by same speaker into chunks up to max_chars"""
     if not script_entries:
@@ -67,37 +77,35 @@ def group_into_chunks(script_entries, max_chars=MAX_CHUNK_CHARS):
 
     return chunks
 
-def main():
+@profiled("generate_audiobook")
+def main(root_dir=ROOT_DIR, run_name="audio"):
+    """Render and combine the whole script of root_dir (a project directory)."""
     # Load configurations
-    config = {}
-    try:
-        with open("config.json", "r") as f:
-            config = json.load(f)
-    except:
-        print("Warning: config.json not found or invalid. Using defaults.")
-
-    voice_config = {}
-    try:
-        with open("../voice_config.json", "r") as f:
-            voice_config = json.load(f)
-    except:
-        pass
+    config_file = get_file(os.path.join(BASE_DIR, "config.json"))
+    if not config_file.exists():
+        print("Warning: config.json not found. Using defaults.")
+    config = config_file.load()
+    voice_config = get_file(os.path.join(root_dir, "voice_config.json")).load()
 
     tts_url = config.get("tts", {}).get("url", "http://127.0.0.1:7860")
     if not tts_url:
         print("Error: TTS URL not found in config.json")
         return
 
-    # Test TTS connection
-    if not test_tts_connection(tts_url, voice_config):
-        print("\nAborting: TTS connection test failed.")
+    # Shared, health-checked client: warm if the app already connected to this server
+    tts_manager = get_manager(tts_url)
+    client = tts_manager.get()
+    if client is None:
+        print("\nAborting: could not connect to TTS server.")
         return
 
-    print(f"\nConnecting to TTS server at {tts_url}...")
-    client = Client(tts_url)
+    # Test TTS connection (reuses the same client, no second handshake)
+    if not test_tts_connection(tts_url, voice_config, client=client):
+        print("\nAborting: TTS connection test failed.")
+        return
 
     # Read the JSON script
-    with open("../annotated_script.json", "r", encoding="utf-8") as f:
+    with open(os.path.join(root_dir, "annotated_script.json"), "r", encoding="utf-8") as f:
         script_entries = json.load(f)
 
     # Group into chunks
@@ -105,50 +113,116 @@ def main():
 
     print(f"Loaded {len(script_entries)} script entries, grouped into {len(chunks)} chunks\n")
 
-    audio_segments = []
-    chunk_speakers = []
+    voicelines_dir = os.path.join(root_dir, "voicelines")
+    os.makedirs(voicelines_dir, exist_ok=True)
 
-    temp_dir = "output_audio_cloned"
-    os.makedirs(temp_dir, exist_ok=True)
+    # TTS runs in its own stage; decode/normalize/encode overlap with the next synthesis
+    def fetch(job):
+        i, speaker, text, style = job["index"], job["speaker"], job["text"], job["style"]
+        preview = text[:60] + "..." if len(text) > 60 else text
+        style_preview = f" [{style}]" if style else ""
+        print(f"[{i+1}/{len(chunks)}] {speaker}{style_preview} ({len(text)} chars): '{preview}'")
+        voices = voice_config
+        if job.get("attempt") and speaker in voice_config:
+            voices = dict(voice_config, **{speaker: retake_voice(voice_config[speaker], job["attempt"])})
+        with stage("tts", speaker=speaker, chars=len(text)):
+            return synthesize_voice(text, style, speaker, voices, client)
 
-    voicelines_dir = "../voicelines"
-    os.makedirs(voicelines_dir, exist_ok=True)
+    # Enough fetch threads for the adaptive TTS limit to grow into
+    tts_limiter = configure_concurrency("tts", config.get("tts", {}))
+    pipeline_config = config.get("pipeline", {})
+    pipeline = AudioPipeline(
+        fetch=fetch,
+        fetch_workers=tts_limiter.max_limit,
+        cpu_workers=pipeline_config.get("cpu_workers", DEFAULT_CPU_WORKERS),
+        queue_size=pipeline_config.get("queue_size", DEFAULT_QUEUE_SIZE),
+        normalize_dbfs=pipeline_config.get("normalize_dbfs")
+    )
 
-    successful = 0
-    failed = 0
+    # Same take QA as the app: a failing take is rendered again up to
+    # qa.max_retries times, and the last take is kept either way
+    qa_config = dict(QA_DEFAULTS, **config.get("qa", {}))
+    finished = {}     # chunk index -> its latest take, shaped like a chunks.json entry
+    finished_lock = threading.Lock()
+    tracker = progress.start(run_name, total=len(chunks), meta={
+        "tts_url": tts_url,
+        "cpu_workers": pipeline_config.get("cpu_workers", DEFAULT_CPU_WORKERS),
+        "normalize_dbfs": pipeline_config.get("normalize_dbfs"),
+    })
+
+    def on_done(job, error):
+        i, attempt = job["index"], job.get("attempt", 0)
+        if error:
+            if job.get("audio") is None:
+                tts_manager.report_failure()
+            print(f"  Chunk {i+1} failed: {error}")
+        # The take is on disk now; keep its path, not the WAV bytes
+        job.pop("audio", None)
+        take = {
+            "id": i,
+            "speaker": job["speaker"],
+            "text": job["text"],
+            "status": "error" if error else "done",
+            "qa": None,
+            "output_path": job.get("output_path"),
+            "duration_ms": job.get("duration_ms"),
+            "error": error,
+        }
+        retry = False
+        with finished_lock:
+            if not error and qa_config["enabled"] and job.get("qa_metrics"):
+                baseline = speaker_baseline(finished.values(), job["speaker"], qa_config, exclude=i)
+                issues = check_take(job["qa_metrics"], job["text"], baseline, qa_config)
+                take["qa"] = dict(job["qa_metrics"], issues=issues, attempt=attempt)
+                retry = bool(issues) and attempt < qa_config["max_retries"]
+                if issues:
+                    outcome = "rendering it again" if retry else f"keeping it after {attempt + 1} takes"
+                    print(f"  QA flagged chunk {i+1} ({', '.join(issues)}): {outcome}")
+            if not (error and i in finished):
+                # A retake that failed keeps the earlier take
+                finished[i] = take
+        if retry:
+            retake = {key: job[key] for key in ("index", "speaker", "text", "style", "output_base", "on_done")}
+            retake["attempt"] = attempt + 1
+            pipeline.submit(retake)
+            return
+        tracker.advance(chars=len(job["text"]), audio_ms=job.get("duration_ms"), failed=bool(error))
 
     for i, chunk in enumerate(chunks):
+        # Generated audio stays in memory; no temp WAV per chunk
         speaker = chunk["speaker"]
-        text = chunk["text"]
-        style = chunk["style"]
+        voiceline_base = os.path.join(voicelines_dir, f"voiceline_{i+1:04d}_{sanitize_filename(speaker)}")
+        pipeline.submit({
+            "index": i,
+            "speaker": speaker,
+            "text": chunk["text"],
+            "style": chunk["style"],
+            "output_base": voiceline_base,
+            "on_done": on_done,
+        })
 
-        temp_path = os.path.join(temp_dir, f"chunk_{i}.wav")
-        preview = text[:60] + "..." if len(text) > 60 else text
-        style_preview = f" [{style}]" if style else ""
-        print(f"[{i+1}/{len(chunks)}] {speaker}{style_preview} ({len(text)} chars): '{preview}'")
+    pipeline.join()
+    pipeline.shutdown()
+    print(f"TTS concurrency settled at {tts_limiter.status()['settled']} (max {tts_limiter.max_limit})")
+    tracker.meta["concurrency"] = tts_limiter.status()["settled"]
+    tracker.finish()
 
-        if generate_voice(text, style, speaker, voice_config, temp_path, client):
-            try:
-                segment = AudioSegment.from_wav(temp_path)
-                audio_segments.append(segment)
-                chunk_speakers.append(speaker)
-
-                # Export individual voiceline
-                voiceline_filename = f"voiceline_{i+1:04d}_{sanitize_filename(speaker)}.mp3"
-                voiceline_path = os.path.join(voicelines_dir, voiceline_filename)
-                segment.export(voiceline_path, format="mp3")
+    voiceline_paths = []
+    chunk_speakers = []
+    failed = 0
 
-                successful += 1
-            except Exception as e:
-                print(f"  Could not process audio file: {e}")
-                failed += 1
-        else:
+    for i in range(len(chunks)):
+        job = finished.get(i)
+        if not job or job["status"] != "done" or not job["output_path"]:
             failed += 1
+            continue
+        voiceline_paths.append(job["output_path"])
+        chunk_speakers.append(job["speaker"])
 
     print(f"\n--- Generation Complete ---")
-    print(f"Successful: {successful}, Failed: {failed}")
+    print(f"Successful: {len(voiceline_paths)}, Failed: {failed}")
 
-    if not audio_segments:
+    if not voiceline_paths:
         print("No audio segments were generated. Exiting.")
         return
 
@@ -156,14 +230,27 @@ def main():
     print(f"\nSpeakers ({len(unique_speakers)}): {', '.join(unique_speakers)}")
     print(f"Individual voicelines saved to: {os.path.abspath(voicelines_dir)}/")
 
-    print(f"\nCombining {len(audio_segments)} audio segments with pauses...")
+    print(f"\nCombining {len(voiceline_paths)} audio segments with pauses...")
     print(f"  Pause between speakers: {DEFAULT_PAUSE_MS}ms")
     print(f"  Pause within same speaker: {SAME_SPEAKER_PAUSE_MS}ms")
 
-    final_audio = combine_audio_with_pauses(audio_segments, chunk_speakers)
-    output_filename = "../cloned_audiobook.mp3"
-    final_audio.export(output_filename, format="mp3")
-    print(f"Combined audiobook saved as {output_filename}")
+    with stage("concat"):
+        from pydub import AudioSegment
+        audio_segments = []
+        segment_speakers = []
+        for path, speaker in zip(voiceline_paths, chunk_speakers):
+            try:
+                audio_segments.append(AudioSegment.from_file(path))
+                segment_speakers.append(speaker)
+            except Exception as e:
+                print(f"  Could not process audio file {path}: {e}")
+        final_audio = combine_audio_with_pauses(audio_segments, segment_speakers)
+    if final_audio is None:
+        print("Could not decode any voiceline. Exiting.")
+        return
+    written = export_audiobook(final_audio, root_dir, config.get("export", {}).get("formats"))
+    for filename in written:
+        print(f"Combined audiobook saved as {os.path.join(root_dir, filename)}")
 
 
 if __name__ == '__main__':
@@ -2,7 +2,31 @@ import os
 import sys
 import json
 import re
-from openai import OpenAI
+import threading
+from build_graph import content_hash, file_hash, load_graph, update_graph
+from script_index import refresh_index, locate_entries
+from json_store import get_file
+from profiling import profiled, stage, current_run, attach_run
+from concurrency import get_limiter, configure as configure_concurrency
+from task_runner import current_log_sink, bind_log_sink
+import progress
+import tracing
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BASE_DIR)
+
+# OpenAI clients are reused across in-process runs (keyed by base_url, api_key)
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_llm_client(base_url, api_key):
+    with _clients_lock:
+        key = (base_url, api_key)
+        if key not in _clients:
+            # Imported on first use; the openai package is slow to load
+            from openai import OpenAI
+            _clients[key] = OpenAI(base_url=base_url, api_key=api_key)
+        return _clients[key]
 
 SYSTEM_PROMPT = """You are a script writer converting books/novels into audioplay scripts. Output ONLY valid JSON arrays, no markdown, no explanations.
 
@@ -37,10 +61,47 @@ RULES:
 6. STYLE should be a detailed acting direction (1-2 sentences) describing voice quality, pacing, emphasis, and emotional undertone
 7. EMOTIONAL CONTINUITY: Keep style directions consistent within a scene. If a character is distressed, maintain that emotional thread across their lines until something in the text justifies a shift. Avoid jarring tonal whiplash between consecutive lines."""
 
+# Prompt layout keeps everything that is the same on every call at the front:
+# the system prompt, then the instruction line. Per-chunk values (the text,
+# then the part number and speaker hints) come last, so llama.cpp, vLLM and
+# Ollama can reuse the cached KV state of the shared prefix.
 USER_PROMPT_TEMPLATE = """Convert this text into an audioplay script JSON array:
 
-{context}
-{chunk}"""
+{chunk}
+
+{context}"""
+
+def find_array_end(text, start):
+    """Index just past the ']' closing the array opened at text[start], or -1."""
+    bracket_count = 0
+    in_string = False
+    escape_next = False
+
+    for i, char in enumerate(text[start:], start):
+        if escape_next:
+            escape_next = False
+            continue
+        if char == '\\':
+            escape_next = True
+            continue
+        if char == '"' and not escape_next:
+            in_string = not in_string
+            continue
+        if in_string:
+            continue
+        if char == '[':
+            bracket_count += 1
+        elif char == ']':
+            bracket_count -= 1
+            if bracket_count == 0:
+                return i + 1
+    return -1
+
+def has_unclosed_array(text):
+    """True if the response opens a JSON array that never closes (output cut off)."""
+    text = re.sub(r'<(think|thinking|reflection|reasoning)>[\s\S]*?</\1>', '', text)
+    start = text.find('[')
+    return start != -1 and find_array_end(text, start) == -1
 
 def clean_json_string(text):
     """Clean and extract valid JSON array from LLM response."""
@@ -67,30 +128,7 @@ def clean_json_string(text):
     if start == -1:
         return None
 
-    bracket_count = 0
-    end = -1
-    in_string = False
-    escape_next = False
-
-    for i, char in enumerate(text[start:], start):
-        if escape_next:
-            escape_next = False
-            continue
-        if char == '\\':
-            escape_next = True
-            continue
-        if char == '"' and not escape_next:
-            in_string = not in_string
-            continue
-        if in_string:
-            continue
-        if char == '[':
-            bracket_count += 1
-        elif char == ']':
-            bracket_count -= 1
-            if bracket_count == 0:
-                end = i + 1
-                break
+    end = find_array_end(text, start)
 
     if end == -1:
         # No closing bracket found, try to salvage
@@ -170,8 +208,54 @@ def split_into_chunks(text, max_size=3000):
 
     return chunks
 
-def process_chunk(client, model_name, chunk, chunk_num, total_chunks, previous_entries=None):
-    """Process a text chunk and return JSON script entries"""
+def response_usage(response):
+    """Prompt, completion and cached prompt token counts of a chat completion.
+
+    Servers report cache hits differently: OpenAI and vLLM in
+    usage.prompt_tokens_details.cached_tokens, llama.cpp in timings.cache_n.
+    cached_tokens is None when the server reports neither.
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    if cached is None:
+        timings = (getattr(response, "model_extra", None) or {}).get("timings") or {}
+        cached = timings.get("cache_n")
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
+        "cached_tokens": cached,
+    }
+
+def add_usage(totals, usage):
+    """Accumulate one call's usage into a running totals dict."""
+    if not usage:
+        return totals
+    totals["calls"] = totals.get("calls", 0) + usage.get("calls", 1)
+    for key in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+        if usage.get(key) is not None:
+            totals[key] = totals.get(key, 0) + usage[key]
+    return totals
+
+def format_usage(usage):
+    text = f"{usage.get('prompt_tokens', 0)} prompt"
+    if usage.get("cached_tokens") is not None and usage.get("prompt_tokens"):
+        text += f" ({usage['cached_tokens']} cached, {usage['cached_tokens'] / usage['prompt_tokens']:.0%})"
+    return text + f", {usage.get('completion_tokens', 0)} completion tokens"
+
+def process_chunk(client, model_name, chunk, chunk_num, total_chunks, previous_entries=None, slot=None, usage=None,
+                  adjacent=True):
+    """Process a text chunk and return JSON script entries
+
+    adjacent=False means previous_entries stop short of this chunk (its
+    predecessor is still running), so the last speaker is not hinted.
+    slot is a concurrency slot the caller took from the "llm" limiter and
+    releases; without one, the call takes and releases its own. If a usage
+    dict is passed, it accumulates the token counts of every call made,
+    follow-ups included (see response_usage).
+    """
     context_parts = []
 
     if chunk_num == 1:
@@ -182,7 +266,7 @@ def process_chunk(client, model_name, chunk, chunk_num, total_chunks, previous_e
         context_parts.append(f"(Part {chunk_num} of {total_chunks})")
 
     if previous_entries and len(previous_entries) > 0:
-        last_speaker = previous_entries[-1].get("speaker", "UNKNOWN")
+        last_speaker = previous_entries[-1].get("speaker", "UNKNOWN") if adjacent else None
         speaker_counts = {}
         for entry in previous_entries:
             s = entry.get("speaker", "")
@@ -191,34 +275,65 @@ def process_chunk(client, model_name, chunk, chunk_num, total_chunks, previous_e
 
         if speaker_counts:
             main_char = max(speaker_counts, key=speaker_counts.get)
-            context_parts.append(f"Main character: {main_char}. Last speaker: {last_speaker}.")
+            hint = f"Main character: {main_char}."
+            if last_speaker:
+                hint += f" Last speaker: {last_speaker}."
+            context_parts.append(hint)
             context_parts.append(f"First-person text ('I', 'my') is {main_char} speaking.")
 
     context = "\n".join(context_parts)
 
-    user_prompt = USER_PROMPT_TEMPLATE.format(context=context, chunk=chunk)
+    own_slot = slot is None
+    if own_slot:
+        slot = get_limiter("llm").acquire(cost=len(chunk))
+    try:
+        entries = request_entries(client, model_name, chunk, context, f"chunk {chunk_num}", usage)
+        if entries is None:
+            slot.ok = False
+            return []
+        return complete_coverage(client, model_name, chunk, entries, chunk_num, total_chunks, slot, usage)
+    finally:
+        if own_slot:
+            slot.release()
+
+def request_entries(client, model_name, passage, context, label, usage=None):
+    """One LLM call for a passage. Returns its script entries (possibly a
+    salvaged prefix of a truncated response), or None if the API call failed."""
+    user_prompt = USER_PROMPT_TEMPLATE.format(context=context, chunk=passage)
 
     try:
-        response = client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.7,
-            max_tokens=4096
-        )
+        with stage("llm", model=model_name, label=label, chars=len(passage)) as span:
+            response = client.chat.completions.create(
+                model=model_name,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0.7,
+                max_tokens=4096
+            )
+            call_usage = response_usage(response)
+            if span is not None and call_usage:
+                for key, value in call_usage.items():
+                    span.set(key, value)
 
         text = response.choices[0].message.content.strip()
+        finish_reason = response.choices[0].finish_reason
+        if usage is not None:
+            add_usage(usage, call_usage)
     except Exception as e:
         print(f"Error calling LLM API: {e}")
-        return []
+        return None
+
+    if finish_reason == "length" or has_unclosed_array(text):
+        # The entries that did arrive are kept; complete_coverage asks for the rest
+        print(f"Note: {label} response was cut off (finish_reason={finish_reason})")
 
     # Clean and extract JSON from response
     json_text = clean_json_string(text)
 
     if not json_text:
-        print(f"Warning: Could not find JSON array in chunk {chunk_num} response")
+        print(f"Warning: Could not find JSON array in {label} response")
         print(f"Response preview: {text[:300]}...")
         return []
 
@@ -227,7 +342,7 @@ def process_chunk(client, model_name, chunk, chunk_num, total_chunks, previous_e
         if isinstance(entries, list):
             return entries
     except json.JSONDecodeError as e:
-        print(f"Warning: Could not parse chunk {chunk_num} response as JSON: {e}")
+        print(f"Warning: Could not parse {label} response as JSON: {e}")
         print(f"JSON preview: {json_text[:300]}...")
 
         # Try to salvage by finding last complete entry
@@ -243,13 +358,185 @@ def process_chunk(client, model_name, chunk, chunk_num, total_chunks, previous_e
 
     return []
 
-def main():
-    if len(sys.argv) < 2:
+# --- Coverage of the source passage ---
+
+PASSAGE_CHARS = 400       # long paragraphs are checked in sentence groups of about this size
+MIN_GAP_WORDS = 5         # shorter passages (e.g. a lone "he said") never count as missing
+COVERAGE_THRESHOLD = 0.6  # share of a passage's words the script must contain, in order
+MAX_FOLLOW_UPS = 3        # follow-up rounds per chunk before giving up
+
+CONTINUATION_CONTEXT = "(Continuation of part {chunk_num} of {total_chunks}: script only the text above, it follows on from the previous line)"
+
+def script_words(text):
+    """Lowercased words with bracketed non-verbal cues removed, for alignment."""
+    return re.findall(r"\w+", re.sub(r'\[[^\]]*\]', ' ', text).lower())
+
+def split_passages(chunk):
+    """Split a chunk into paragraphs, and long paragraphs into sentence groups."""
+    passages = []
+    for para in re.split(r'\n\s*\n', chunk):
+        para = para.strip()
+        if not para:
+            continue
+        if len(para) <= PASSAGE_CHARS * 1.5:
+            passages.append(para)
+            continue
+        current = ""
+        for sentence in re.split(r'(?<=[.!?])\s+', para):
+            if current and len(current) + len(sentence) + 1 > PASSAGE_CHARS:
+                passages.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            passages.append(current)
+    return passages
+
+def coverage_gaps(passages, entries):
+    """Runs of passages the entries don't script.
+
+    Source and script words are aligned in order, so a passage only counts as
+    covered by entries in the right place. Returns a list of
+    (first_passage, last_passage, text, insert_at): the source text still to
+    script (a partly scripted first passage is trimmed to what follows its last
+    scripted word) and the entry index the missing lines belong before.
+    """
+    from difflib import SequenceMatcher
+
+    source, owner, spans, totals = [], [], [], []
+    for p, passage in enumerate(passages):
+        words = list(re.finditer(r"\w+", passage))
+        source.extend(m.group(0).lower() for m in words)
+        owner.extend([p] * len(words))
+        spans.extend(m.end() for m in words)
+        totals.append(len(words))
+    script, entry_of = [], []
+    for e, entry in enumerate(entries):
+        words = script_words(str(entry.get("text", ""))) if isinstance(entry, dict) else []
+        script.extend(words)
+        entry_of.extend([e] * len(words))
+
+    matched = [0] * len(passages)
+    last_end = [0] * len(passages)        # char offset after the last scripted word
+    entry_passage = [-1] * len(entries)   # last passage each entry was matched to
+    for a, b, size in SequenceMatcher(None, source, script, autojunk=False).get_matching_blocks():
+        for k in range(size):
+            p = owner[a + k]
+            matched[p] += 1
+            last_end[p] = max(last_end[p], spans[a + k])
+            e = entry_of[b + k]
+            entry_passage[e] = max(entry_passage[e], p)
+
+    runs = []
+    for p in range(len(passages)):
+        missing = totals[p] >= MIN_GAP_WORDS and matched[p] < totals[p] * COVERAGE_THRESHOLD
+        if not missing:
+            continue
+        if runs and runs[-1][1] == p - 1:
+            runs[-1][1] = p
+        else:
+            runs.append([p, p])
+
+    gaps = []
+    for first, last in runs:
+        # Lines already scripted from the first passage stay; continue after them
+        head = passages[first][last_end[first]:].lstrip(" ,;:.!?\"'\u201d\u2019)-")
+        text = "\n\n".join([head] + passages[first + 1:last + 1]).strip()
+        insert_at = 0
+        for e, p in enumerate(entry_passage):
+            if 0 <= p < first or (p == first and last_end[first]):
+                insert_at = e + 1
+        gaps.append((first, last, text, insert_at))
+    return gaps
+
+def complete_coverage(client, model_name, chunk, entries, chunk_num, total_chunks, slot=None, usage=None):
+    """Ask for just the parts of the chunk the entries miss (a truncated tail or a
+    skipped paragraph) and splice the answers in place, instead of re-running
+    the whole chunk."""
+    passages = split_passages(chunk)
+    for _ in range(MAX_FOLLOW_UPS):
+        gaps = coverage_gaps(passages, entries)
+        if not gaps:
+            return entries
+
+        added = 0
+        # Last gap first, so earlier insert positions stay valid
+        for first, last, remaining, insert_at in reversed(gaps):
+            context = CONTINUATION_CONTEXT.format(chunk_num=chunk_num, total_chunks=total_chunks)
+            previous = entries[insert_at - 1] if insert_at > 0 else None
+            if isinstance(previous, dict):
+                context += f"\nPrevious line: {previous.get('speaker', 'NARRATOR')}: {str(previous.get('text', ''))[-200:]}"
+            print(f"  Chunk {chunk_num}: requesting {len(remaining)} unscripted chars (passages {first + 1}-{last + 1} of {len(passages)})")
+            if slot is not None:
+                # Keep the limiter's latency-per-char honest: this slot now covers more text
+                slot.cost += len(remaining)
+            more = request_entries(client, model_name, remaining, context, f"chunk {chunk_num} follow-up", usage)
+            if more:
+                entries[insert_at:insert_at] = more
+                added += len(more)
+        if not added:
+            break
+
+    missing = sum(last - first + 1 for first, last, _, _ in coverage_gaps(passages, entries))
+    if missing:
+        print(f"Warning: chunk {chunk_num} still has {missing} of {len(passages)} passages unscripted")
+    return entries
+
+def llm_chunk_hash(model_name, chunk):
+    """Cache key of one LLM chunk: the model, the prompts and the source text."""
+    return content_hash(model_name, SYSTEM_PROMPT, USER_PROMPT_TEMPLATE, chunk)
+
+def locate_chunks(text, chunks):
+    """Best-effort (offset, length) of each chunk in the source text."""
+    locations = []
+    cursor = 0
+    for chunk in chunks:
+        offset = text.find(chunk[:80], cursor)
+        if offset == -1:
+            locations.append((None, len(chunk)))
+            continue
+        locations.append((offset, len(chunk)))
+        cursor = offset + 1
+    return locations
+
+def load_cached_entries(script_path, model_name, root_dir=ROOT_DIR):
+    """Map LLM chunk hash -> script entries from the previous run.
+
+    Only trusted while annotated_script.json is exactly what that run wrote.
+    """
+    script_graph = load_graph(root_dir).get("script")
+    if not script_graph or script_graph.get("model") != model_name:
+        return {}
+    if script_graph.get("script_hash") != file_hash(script_path):
+        print("Note: annotated_script.json changed since the last run; regenerating all chunks.")
+        return {}
+
+    with open(script_path, "r", encoding="utf-8") as f:
+        previous_entries = json.load(f)
+
+    cached = {}
+    for node in script_graph.get("llm_chunks", []):
+        entries = previous_entries[node["entry_start"]:node["entry_end"]]
+        # A chunk the LLM failed on (no hash, or no entries) is sent again
+        if node.get("hash") and entries:
+            cached[node["hash"]] = entries
+    return cached
+
+@profiled("generate_script")
+def main(argv=None, root_dir=ROOT_DIR, run_name="script"):
+    """Generate annotated_script.json in root_dir (a project directory).
+
+    run_name names the progress run, so runs of several projects can be told apart.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    full_rebuild = "--full" in argv
+    args = [a for a in argv if not a.startswith("--")]
+    if len(args) < 1:
         print("Error: No input file path provided.")
-        print("Usage: python generate_script.py <input_file_path>")
+        print("Usage: python generate_script.py <input_file_path> [--full]")
         sys.exit(1)
 
-    input_file_path = sys.argv[1]
+    input_file_path = args[0]
     print(f"Processing book from: {input_file_path}")
 
     if not os.path.exists(input_file_path):
@@ -265,16 +552,10 @@ def main():
     print(f"Read {len(book_content)} characters")
 
     # Load LLM config
-    config_path = os.path.join(os.path.dirname(__file__), "config.json")
-    config = {}
-    if os.path.exists(config_path):
-        try:
-            with open(config_path, "r") as f:
-                config = json.load(f)
-        except Exception as e:
-            print(f"Warning: Failed to load config.json: {e}")
-    else:
+    config_file = get_file(os.path.join(BASE_DIR, "config.json"))
+    if not config_file.exists():
         print("Warning: config.json not found. Using defaults.")
+    config = config_file.load()
 
     llm_config = config.get("llm", {})
     base_url = llm_config.get("base_url", "http://localhost:11434/v1")
@@ -284,11 +565,8 @@ def main():
     print(f"Connecting to: {base_url}")
     print(f"Using model: {model_name}")
 
-    # Create OpenAI client with custom base URL
-    client = OpenAI(
-        base_url=base_url,
-        api_key=api_key
-    )
+    # Create (or reuse) OpenAI client with custom base URL
+    client = get_llm_client(base_url, api_key)
 
     # Split into chunks at natural boundaries
     chunks = split_into_chunks(book_content, max_size=3000)
@@ -296,24 +574,124 @@ def main():
 
     print(f"Split into {total_chunks} chunks at paragraph/sentence boundaries")
 
-    all_entries = []
-    for i, chunk in enumerate(chunks, 1):
-        print(f"Processing chunk {i}/{total_chunks} ({len(chunk)} chars)...")
+    output_path = os.path.join(root_dir, "annotated_script.json")
+
+    # Incremental rebuild: chunks whose source text is unchanged reuse their entries
+    cached = {} if full_rebuild else load_cached_entries(output_path, model_name, root_dir)
+    locations = locate_chunks(book_content, chunks)
+
+    keys = [llm_chunk_hash(model_name, chunk) for chunk in chunks]
+    tracker = progress.start(
+        run_name, total=sum(1 for key in keys if key not in cached), unit="llm chunks",
+        meta={"model": model_name, "base_url": base_url, "book_chars": len(book_content)}
+    )
 
-        previous = all_entries if len(all_entries) > 0 else None
-        entries = process_chunk(client, model_name, chunk, i, total_chunks, previous_entries=previous)
+    # Chunks go out in order, each once the adaptive limiter has a free slot,
+    # so a local server gets as many parallel requests as it can take without
+    # queueing. Each chunk's context comes from the chunks finished before it;
+    # the last speaker is only hinted once the chunk right before it is done.
+    # With a limit of 1 this is the plain sequential run.
+    limiter = configure_concurrency("llm", llm_config)
+    results = [cached.get(key) for key in keys]
+    usages = [None] * total_chunks
+    results_lock = threading.Lock()
+    log_sink = current_log_sink()
+    trace_parent = tracing.current()
+    profile_run = current_run()
+    reused = sum(1 for entries in results if entries is not None)
+
+    def finished_prefix(i):
+        """Entries of the first i chunks up to the first unfinished one, and whether all i are done."""
+        entries = []
+        with results_lock:
+            for done in results[:i]:
+                if done is None:
+                    return entries, False
+                entries.extend(done)
+        return entries, True
+
+    def run(i, chunk, slot):
+        bind_log_sink(log_sink)
+        # The slot is held until the entries are stored, so the next chunk sees them
+        usage = {}
+        with attach_run(profile_run), tracing.attach(trace_parent), \
+                tracing.span("script_chunk", chunk=i, chars=len(chunk)), slot:
+            previous, adjacent = finished_prefix(i - 1)
+            entries = process_chunk(client, model_name, chunk, i, total_chunks,
+                                    previous_entries=previous or None, slot=slot, usage=usage,
+                                    adjacent=adjacent)
+            with results_lock:
+                results[i - 1] = entries
+                usages[i - 1] = usage or None
+        print(f"  Chunk {i}: got {len(entries)} entries" + (f" ({format_usage(usage)})" if usage else ""))
+        tracker.advance(chars=len(chunk), failed=not entries)
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=limiter.max_limit) as executor:
+        futures = []
+        for i, (chunk, key) in enumerate(zip(chunks, keys), 1):
+            if key in cached:
+                print(f"Chunk {i}/{total_chunks} unchanged, reusing {len(cached[key])} entries")
+                continue
+            slot = limiter.acquire(cost=len(chunk))
+            print(f"Processing chunk {i}/{total_chunks} ({len(chunk)} chars)...")
+            futures.append(executor.submit(run, i, chunk, slot))
+        for future in futures:
+            future.result()
+
+    if futures:
+        print(f"LLM concurrency settled at {limiter.status()['settled']} (max {limiter.max_limit})")
+    tracker.meta["concurrency"] = limiter.status()["settled"]
+
+    # Token totals show how much of each prompt the server's prefix cache served
+    totals = {}
+    for usage in usages:
+        add_usage(totals, usage)
+    if totals:
+        print(f"LLM usage over {totals['calls']} calls: {format_usage(totals)}")
+        tracker.meta["tokens"] = totals
+
+    all_entries = []
+    llm_chunks = []
+    for i, (key, entries) in enumerate(zip(keys, results)):
+        offset, length = locations[i]
+        llm_chunks.append({
+            # None for a failed chunk, so the next run retries it instead of reusing nothing
+            "hash": key if entries else None,
+            "offset": offset,
+            "length": length,
+            "entry_start": len(all_entries),
+            "entry_end": len(all_entries) + len(entries),
+            "usage": usages[i],
+        })
         all_entries.extend(entries)
-        print(f"  Got {len(entries)} entries")
 
     if not all_entries:
         print("Error: No script entries generated")
+        tracker.finish("failed")
         sys.exit(1)
 
+    tracker.finish()
+    if reused:
+        print(f"Reused {reused}/{total_chunks} unchanged chunks; sent {total_chunks - reused} to the LLM")
+
     # Save as JSON
-    output_path = os.path.join("..", "annotated_script.json")
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(all_entries, f, indent=2, ensure_ascii=False)
 
+    # Record source -> LLM chunk -> entry provenance for the next incremental run
+    update_graph(root_dir, "script", {
+        "source_path": os.path.abspath(input_file_path),
+        "source_hash": content_hash(book_content),
+        "script_hash": file_hash(output_path),
+        "model": model_name,
+        "llm_chunks": llm_chunks,
+    })
+    # Speaker index with per-entry source offsets; chunk membership carries over
+    # until chunks.json is regrouped from the new script
+    refresh_index(root_dir, None, entries=all_entries,
+                  offsets=locate_entries(book_content, llm_chunks, all_entries))
+
     # Summary
     speakers = set(entry.get("speaker", "UNKNOWN") for entry in all_entries)
     print(f"\nGenerated {len(all_entries)} script entries")
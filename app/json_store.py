@@ -0,0 +1,76 @@
+import os
+import copy
+import json
+import threading
+import tracing
+
+class JsonFile:
+    """In-process cache of one small JSON file (config.json, voice_config.json, state.json).
+
+    load() stats the file and re-parses it only when its mtime or size
+    changed, so edits made by hand or by another process are still picked up.
+    The returned data is shared between callers: treat it as read-only and
+    change the file through save() or update(). Writes go to a temp file that
+    then replaces the original, so readers never see a half-written file.
+    """
+
+    def __init__(self, path, default=None):
+        self.path = path
+        self.default = {} if default is None else default
+        self._lock = threading.RLock()
+        self._stat = None
+        self._data = None
+
+    def _current_stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def exists(self):
+        return self._current_stat() is not None
+
+    def load(self):
+        """Parsed contents, or the default if the file is missing or unreadable."""
+        stat = self._current_stat()
+        if stat is None:
+            return self.default
+        with self._lock:
+            if stat != self._stat:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._data = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Warning: ignoring unreadable {os.path.basename(self.path)}: {e}")
+                    self._data = self.default
+                self._stat = stat
+            return self._data
+
+    def save(self, data):
+        with self._lock, tracing.span("json_store.save", file=os.path.basename(self.path)):
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.path)
+            self._data = data
+            self._stat = self._current_stat()
+
+    def update(self, func):
+        """Read-modify-write: func(data) changes a copy in place, which is then saved."""
+        with self._lock:
+            data = copy.deepcopy(self.load())
+            func(data)
+            self.save(data)
+            return data
+
+_files = {}
+_files_lock = threading.Lock()
+
+def get_file(path, default=None):
+    """Return the shared JsonFile for path, so every module uses one cache per file."""
+    path = os.path.abspath(path)
+    with _files_lock:
+        if path not in _files:
+            _files[path] = JsonFile(path, default)
+        return _files[path]
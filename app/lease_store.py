@@ -0,0 +1,286 @@
+import json
+import time
+import sqlite3
+from contextlib import closing
+
+DEFAULT_LEASE_SECONDS = 60
+MAX_ATTEMPTS = 3            # leases per chunk before it is marked failed
+WORKER_TIMEOUT = 120        # seconds without a heartbeat before a worker counts as gone
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    chunk_index   INTEGER PRIMARY KEY,
+    priority      INTEGER NOT NULL,
+    seq           INTEGER NOT NULL,
+    payload       TEXT NOT NULL,
+    state         TEXT NOT NULL,          -- queued, leased, done, failed
+    worker        TEXT,
+    lease_expires REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    result        TEXT,
+    updated       REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, priority, seq);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id  TEXT PRIMARY KEY,
+    info       TEXT,
+    last_seen  REAL,
+    current    INTEGER,
+    rendered   INTEGER NOT NULL DEFAULT 0,
+    failed     INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+class LeaseStore:
+    """Shared render job queue in a SQLite file that any number of workers poll.
+
+    Workers lease one chunk at a time. A lease must be renewed before it
+    expires; a crashed worker simply stops renewing and the chunk is handed to
+    the next worker that asks. The app enqueues chunks and collects finished
+    results; workers never touch chunks.json.
+
+    Each call opens its own connection, so one store object can be shared
+    between threads. Writes take the database lock up front (BEGIN IMMEDIATE),
+    which makes leasing atomic across processes and machines. A transaction
+    left open by an error is rolled back when its connection closes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _transaction(self, conn):
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    # --- App side ---
+
+    def enqueue(self, jobs, priority):
+        """Queue {"index", ...payload} jobs. Leased chunks and chunks already
+        queued at an equal or better priority are skipped. Returns accepted indices."""
+        accepted = []
+        now = time.time()
+        conn = self._connect()
+        try:
+            self._transaction(conn)
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM jobs").fetchone()[0]
+            for job in jobs:
+                row = conn.execute(
+                    "SELECT state, priority FROM jobs WHERE chunk_index = ?", (job["index"],)
+                ).fetchone()
+                if row and row["state"] == "leased":
+                    continue
+                if row and row["state"] == "queued" and row["priority"] <= priority:
+                    continue
+                seq += 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO jobs (chunk_index, priority, seq, payload, state, attempts, updated) "
+                    "VALUES (?, ?, ?, ?, 'queued', 0, ?)",
+                    (job["index"], priority, seq, json.dumps(job), now)
+                )
+                accepted.append(job["index"])
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return accepted
+
+    def cancel(self, indices=None):
+        """Remove queued (not leased) jobs. Returns the cancelled indices."""
+        conn = self._connect()
+        try:
+            self._transaction(conn)
+            rows = conn.execute("SELECT chunk_index FROM jobs WHERE state = 'queued'").fetchall()
+            cancelled = [r[0] for r in rows if indices is None or r[0] in indices]
+            conn.executemany("DELETE FROM jobs WHERE chunk_index = ?", [(i,) for i in cancelled])
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return cancelled
+
+    def finished(self):
+        """Done and failed jobs not yet collected, as dicts with a parsed result."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT chunk_index, state, priority, payload, result, updated FROM jobs WHERE state IN ('done', 'failed')"
+            ).fetchall()
+        return [
+            {
+                "index": r["chunk_index"],
+                "state": r["state"],
+                "priority": r["priority"],
+                "payload": json.loads(r["payload"]),
+                "result": json.loads(r["result"]) if r["result"] else {},
+                "updated": r["updated"],
+            }
+            for r in rows
+        ]
+
+    def remove_finished(self, finished):
+        """Delete collected results (only if they were not re-queued meanwhile)."""
+        conn = self._connect()
+        try:
+            self._transaction(conn)
+            conn.executemany(
+                "DELETE FROM jobs WHERE chunk_index = ? AND updated = ? AND state IN ('done', 'failed')",
+                [(f["index"], f["updated"]) for f in finished]
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def leased(self):
+        """{chunk index: worker id} of live leases."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT chunk_index, worker FROM jobs WHERE state = 'leased' AND lease_expires >= ?",
+                (time.time(),)
+            ).fetchall()
+        return {r[0]: r[1] for r in rows}
+
+    def set_paused(self, paused):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('paused', ?)", ("1" if paused else "0",)
+            )
+
+    def is_paused(self):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'paused'").fetchone()
+        return bool(row and row[0] == "1")
+
+    def status(self):
+        now = time.time()
+        with closing(self._connect()) as conn:
+            counts = dict(conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            workers = [
+                {
+                    "id": r["worker_id"],
+                    "info": json.loads(r["info"]) if r["info"] else {},
+                    "current": r["current"],
+                    "rendered": r["rendered"],
+                    "failed": r["failed"],
+                    "seconds_since_seen": round(now - r["last_seen"], 1),
+                }
+                for r in conn.execute(
+                    "SELECT * FROM workers WHERE last_seen >= ? ORDER BY worker_id", (now - WORKER_TIMEOUT,)
+                ).fetchall()
+            ]
+        return {"jobs": counts, "workers": workers}
+
+    # --- Worker side ---
+
+    def heartbeat(self, worker_id, info=None, current=None):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO workers (worker_id, info, last_seen, current) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(worker_id) DO UPDATE SET info = excluded.info, "
+                "last_seen = excluded.last_seen, current = excluded.current",
+                (worker_id, json.dumps(info or {}), time.time(), current)
+            )
+
+    def lease(self, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Lease the most urgent queued (or abandoned) chunk. Returns its payload or None."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            self._transaction(conn)
+            paused = conn.execute("SELECT value FROM meta WHERE key = 'paused'").fetchone()
+            if paused and paused[0] == "1":
+                conn.execute("COMMIT")
+                return None
+
+            while True:
+                row = conn.execute(
+                    "SELECT chunk_index, payload, attempts FROM jobs "
+                    "WHERE state = 'queued' OR (state = 'leased' AND lease_expires < ?) "
+                    "ORDER BY priority, seq LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                if row["attempts"] >= MAX_ATTEMPTS:
+                    # Every worker that took it died or hung: stop handing it out
+                    conn.execute(
+                        "UPDATE jobs SET state = 'failed', worker = NULL, result = ?, updated = ? WHERE chunk_index = ?",
+                        (json.dumps({"error": f"Lease expired {row['attempts']} times"}), now, row["chunk_index"])
+                    )
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET state = 'leased', worker = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated = ? WHERE chunk_index = ?",
+                    (worker_id, now + lease_seconds, now, row["chunk_index"])
+                )
+                conn.execute("COMMIT")
+                return json.loads(row["payload"])
+        finally:
+            conn.close()
+
+    def renew(self, index, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Extend a lease. Returns False if the worker no longer holds it."""
+        with closing(self._connect()) as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE chunk_index = ? AND worker = ? AND state = 'leased'",
+                (time.time() + lease_seconds, index, worker_id)
+            )
+        return cur.rowcount == 1
+
+    def complete(self, index, worker_id, result):
+        return self._finish(index, worker_id, "done", result, "rendered")
+
+    def fail(self, index, worker_id, error):
+        """Record a failed render; the chunk is retried until MAX_ATTEMPTS."""
+        conn = self._connect()
+        try:
+            self._transaction(conn)
+            row = conn.execute(
+                "SELECT attempts FROM jobs WHERE chunk_index = ? AND worker = ? AND state = 'leased'",
+                (index, worker_id)
+            ).fetchone()
+            if row is not None and row[0] < MAX_ATTEMPTS:
+                conn.execute(
+                    "UPDATE jobs SET state = 'queued', worker = NULL, updated = ? WHERE chunk_index = ?",
+                    (time.time(), index)
+                )
+                conn.execute("UPDATE workers SET failed = failed + 1 WHERE worker_id = ?", (worker_id,))
+                conn.execute("COMMIT")
+                return True
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return self._finish(index, worker_id, "failed", {"error": error}, "failed")
+
+    def release(self, index, worker_id):
+        """Give a lease back untouched (worker shutting down)."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET state = 'queued', worker = NULL, attempts = MAX(attempts - 1, 0), updated = ? "
+                "WHERE chunk_index = ? AND worker = ? AND state = 'leased'",
+                (time.time(), index, worker_id)
+            )
+
+    def _finish(self, index, worker_id, state, result, counter):
+        conn = self._connect()
+        try:
+            self._transaction(conn)
+            cur = conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, worker = NULL, updated = ? "
+                "WHERE chunk_index = ? AND worker = ? AND state = 'leased'",
+                (state, json.dumps(result), time.time(), index, worker_id)
+            )
+            if cur.rowcount == 1:
+                conn.execute(f"UPDATE workers SET {counter} = {counter} + 1 WHERE worker_id = ?", (worker_id,))
+            conn.execute("COMMIT")
+            return cur.rowcount == 1
+        finally:
+            conn.close()
@@ -1,28 +1,25 @@
-import json
 import os
+from profiling import profiled
+from script_index import refresh_index, speaker_names
+from json_store import get_file
 
-def main():
-    input_path = "../annotated_script.json"
-    output_path = "../voices.json"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BASE_DIR)
+
+@profiled("parse_voices")
+def main(root_dir=ROOT_DIR):
+    input_path = os.path.join(root_dir, "annotated_script.json")
+    output_path = os.path.join(root_dir, "voices.json")
 
     if not os.path.exists(input_path):
         print(f"Error: {input_path} not found. Please generate the script first.")
         return
 
-    with open(input_path, 'r', encoding='utf-8') as f:
-        script_data = json.load(f)
-
-    # Extract unique speakers
-    voices = set()
-    for entry in script_data:
-        speaker = entry.get("speaker", "").strip()
-        if speaker:
-            voices.add(speaker)
-
-    voice_list = sorted(list(voices))
+    # Speakers come from the script index; the script is only scanned if it
+    # changed since the index was built
+    voice_list = speaker_names(refresh_index(root_dir, None))
 
-    with open(output_path, 'w') as f:
-        json.dump(voice_list, f, indent=2)
+    get_file(output_path, default=[]).save(voice_list)
 
     print(f"Found {len(voice_list)} unique voices: {', '.join(voice_list)}")
     print(f"Saved voice list to {output_path}")
@@ -0,0 +1,237 @@
+import io
+import os
+import time
+import queue
+import threading
+from tts import wav_duration_ms, encode_wav_bytes
+from task_runner import current_log_sink, bind_log_sink
+from profiling import record_stage, current_run, attach_run
+from take_qa import measure_take
+from concurrency import lower_priority
+import tracing
+
+DEFAULT_QUEUE_SIZE = 8
+DEFAULT_CPU_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+# --- Post-processing steps (top-level so they can run in a process pool) ---
+
+def decode_audio(audio):
+    """Validate generated audio and return its duration in ms."""
+    if not audio:
+        raise ValueError("Generated audio file is missing or empty")
+    duration_ms = wav_duration_ms(audio)
+    if duration_ms is None:
+        # Not a plain PCM WAV; let pydub/ffmpeg decode it
+        from pydub import AudioSegment
+        duration_ms = len(AudioSegment.from_file(io.BytesIO(audio)))
+    if not duration_ms:
+        raise ValueError("Generated audio has 0 duration")
+    return duration_ms
+
+def inspect_audio(audio):
+    """decode_audio, plus the QA measurements of the raw take (None if they fail)."""
+    duration_ms = decode_audio(audio)
+    try:
+        metrics = measure_take(audio)
+    except Exception as e:
+        print(f"Take QA skipped: {e}")
+        metrics = None
+    return duration_ms, metrics
+
+def normalize_audio(audio, target_dbfs):
+    """Apply gain so the clip's average loudness hits target_dbfs. Returns WAV bytes."""
+    from pydub import AudioSegment
+    segment = AudioSegment.from_file(io.BytesIO(audio), format="wav")
+    if segment.dBFS == float("-inf"):
+        return audio
+    segment = segment.apply_gain(target_dbfs - segment.dBFS)
+    buf = io.BytesIO()
+    segment.export(buf, format="wav")
+    return buf.getvalue()
+
+def encode_audio(audio, output_base, format="mp3"):
+    """Encode to output_base.<format>, falling back to WAV if ffmpeg is unavailable.
+
+    Returns the path written.
+    """
+    output_path = f"{output_base}.{format}"
+    try:
+        # This might fail if ffmpeg is missing
+        encode_wav_bytes(audio, output_path, format=format)
+        return output_path
+    except Exception as e:
+        print(f"MP3 conversion failed (ffmpeg missing?): {e}")
+        wav_path = f"{output_base}.wav"
+        with open(wav_path, "wb") as f:
+            f.write(audio)
+        return wav_path
+
+def post_process(job, normalize_dbfs=None, format="mp3"):
+    """Run decode -> normalize -> encode inline for one job (no pipeline)."""
+    job["duration_ms"], job["qa_metrics"] = inspect_audio(job["audio"])
+    if normalize_dbfs is not None:
+        job["audio"] = normalize_audio(job["audio"], normalize_dbfs)
+    job["output_path"] = encode_audio(job["audio"], job["output_base"], format)
+    return job
+
+# --- Staged pipeline ---
+
+class _Stage:
+    """One pipeline stage: a bounded input queue drained by its own worker threads."""
+
+    def __init__(self, name, step, workers, queue_size, pipeline):
+        self.name = name
+        self.step = step
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.next = None
+        self.pipeline = pipeline
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+        # Keep printing into the log of the task that built the pipeline, if any
+        self._log_sink = current_log_sink()
+        self.workers = workers
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"pipeline-{name}-{i}", daemon=True).start()
+
+    def stop(self):
+        for _ in range(self.workers):
+            self.queue.put(None)
+
+    def _work(self):
+        if self.pipeline.background:
+            lower_priority()
+        bind_log_sink(self._log_sink)
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            start = time.perf_counter()
+            # Stage threads are shared, so each job carries its trace and profiled run along
+            with attach_run(job.get("profile")):
+                try:
+                    with tracing.attach(job.get("trace")), tracing.span(f"pipeline.{self.name}", chunk=job.get("index")):
+                        self.step(job)
+                except Exception as e:
+                    self.pipeline._finish(job, f"{self.name} failed: {e}")
+                    continue
+                finally:
+                    elapsed = time.perf_counter() - start
+                    with self._lock:
+                        self.processed += 1
+                        self.busy_seconds += elapsed
+                    record_stage(f"pipeline.{self.name}", elapsed)
+
+            if self.next is not None:
+                # Blocks when the next stage is saturated: backpressure, bounded memory
+                self.next.queue.put(job)
+            else:
+                self.pipeline._finish(job, None)
+
+class AudioPipeline:
+    """TTS fetch -> validate/decode/measure -> normalize -> encode, each with its own bounded queue.
+
+    The TTS stage only waits on the server, so synthesis of chunk N+1 overlaps
+    with post-processing of chunk N. Decode and normalize run in a process pool.
+    Encode runs on threads because ffmpeg is already a separate process.
+
+    A job is a dict with at least "output_base" (path without extension) and an
+    optional "on_done(job, error)" callback; the fetch step must set job["audio"].
+    With background=True, stage threads and pool processes run at idle CPU
+    priority (for the web app, whose API requests come first).
+    """
+
+    def __init__(self, fetch=None, fetch_workers=1, cpu_workers=DEFAULT_CPU_WORKERS,
+                 queue_size=DEFAULT_QUEUE_SIZE, normalize_dbfs=None, format="mp3", background=False):
+        self.fetch = fetch
+        self.normalize_dbfs = normalize_dbfs
+        self.format = format
+        self.background = background
+        # multiprocessing is slow to import; only pay for it when a pipeline is built
+        from concurrent.futures import ProcessPoolExecutor
+        self._executor = ProcessPoolExecutor(max_workers=cpu_workers, initializer=lower_priority if background else None)
+
+        self._pending = 0
+        self._pending_cond = threading.Condition()
+
+        self.stages = []
+        if fetch is not None:
+            self._fetch_stage = self._add_stage("fetch", self._fetch_step, fetch_workers, queue_size)
+        else:
+            self._fetch_stage = None
+        self._decode_stage = self._add_stage("decode", self._decode_step, cpu_workers, queue_size)
+        self._add_stage("normalize", self._normalize_step, cpu_workers, queue_size)
+        self._add_stage("encode", self._encode_step, cpu_workers, queue_size)
+
+    def _add_stage(self, name, step, workers, queue_size):
+        stage = _Stage(name, step, workers, queue_size, self)
+        if self.stages:
+            self.stages[-1].next = stage
+        self.stages.append(stage)
+        return stage
+
+    def _fetch_step(self, job):
+        job["audio"] = self.fetch(job)
+        if not job["audio"]:
+            raise ValueError("TTS generation failed")
+
+    def _decode_step(self, job):
+        job["duration_ms"], job["qa_metrics"] = self._executor.submit(inspect_audio, job["audio"]).result()
+
+    def _normalize_step(self, job):
+        if self.normalize_dbfs is not None:
+            job["audio"] = self._executor.submit(normalize_audio, job["audio"], self.normalize_dbfs).result()
+
+    def _encode_step(self, job):
+        job["output_path"] = encode_audio(job["audio"], job["output_base"], self.format)
+
+    def submit(self, job):
+        """Queue a job at the TTS stage. Blocks while that stage's queue is full."""
+        if self._fetch_stage is None:
+            raise RuntimeError("Pipeline has no fetch stage; use submit_audio()")
+        self._enter(job, self._fetch_stage)
+
+    def submit_audio(self, job):
+        """Queue a job whose job["audio"] is already fetched, skipping the TTS stage."""
+        self._enter(job, self._decode_stage)
+
+    def _enter(self, job, stage):
+        job.setdefault("trace", tracing.current())
+        job.setdefault("profile", current_run())
+        with self._pending_cond:
+            self._pending += 1
+        stage.queue.put(job)
+
+    def _finish(self, job, error):
+        job["error"] = error
+        callback = job.get("on_done")
+        if callback:
+            try:
+                callback(job, error)
+            except Exception as e:
+                print(f"Pipeline callback failed: {e}")
+        with self._pending_cond:
+            self._pending -= 1
+            self._pending_cond.notify_all()
+
+    def join(self):
+        """Wait until every submitted job has finished."""
+        with self._pending_cond:
+            while self._pending > 0:
+                self._pending_cond.wait()
+
+    def stats(self):
+        return {
+            stage.name: {
+                "queued": stage.queue.qsize(),
+                "processed": stage.processed,
+                "busy_seconds": round(stage.busy_seconds, 3),
+            }
+            for stage in self.stages
+        }
+
+    def shutdown(self):
+        """Stop the stage threads and the process pool. Call after join()."""
+        for stage in self.stages:
+            stage.stop()
+        self._executor.shutdown(wait=False, cancel_futures=True)
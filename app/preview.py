@@ -0,0 +1,107 @@
+import os
+import math
+import wave
+import threading
+from tts import DEFAULT_PAUSE_MS, SAME_SPEAKER_PAUSE_MS
+
+# Chunks in these states will get audio soon, so the live playlist stops there
+UNFINISHED_STATUSES = ("pending", "queued", "generating")
+
+_duration_cache = {}  # (path, mtime) -> duration in ms
+_duration_lock = threading.Lock()
+
+def probe_duration_ms(path):
+    """Duration of an audio file in ms, cached by path and mtime. None if unreadable."""
+    try:
+        key = (path, os.path.getmtime(path))
+    except OSError:
+        # Removed or replaced since the caller saw it (e.g. by a re-render)
+        return None
+    with _duration_lock:
+        if key in _duration_cache:
+            return _duration_cache[key]
+
+    try:
+        if path.lower().endswith(".wav"):
+            with wave.open(path, "rb") as w:
+                duration = round(w.getnframes() * 1000 / w.getframerate())
+        else:
+            from pydub import AudioSegment
+            duration = len(AudioSegment.from_file(path))
+    except Exception as e:
+        print(f"Could not read duration of {path}: {e}")
+        return None
+
+    with _duration_lock:
+        _duration_cache[key] = duration
+    return duration
+
+def ensure_silence(cache_dir, duration_ms, fmt):
+    """Create (once) a silent segment used as the pause between voicelines."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"silence_{duration_ms}.{fmt}")
+    if not os.path.exists(path):
+        from pydub import AudioSegment
+        tmp_path = path + ".tmp"
+        AudioSegment.silent(duration=duration_ms).export(tmp_path, format=fmt)
+        os.replace(tmp_path, path)
+    return path
+
+def build_playlist(chunks, root_dir, silence_uri, pause_ms=DEFAULT_PAUSE_MS, same_speaker_pause_ms=SAME_SPEAKER_PAUSE_MS,
+                   audio_prefix="/"):
+    """Build a live HLS (m3u8) playlist of the finished voicelines in script order.
+
+    Pauses between lines are emitted as silence segments using the same
+    speaker-dependent rules as combine_audio_with_pauses. The playlist stops at
+    the first chunk that is still waiting to render and is only closed with
+    EXT-X-ENDLIST once every chunk is accounted for, so players keep reloading it.
+    It has no EXT-X-PLAYLIST-TYPE: an EVENT playlist may only grow, but here
+    earlier lines change when they are re-rendered.
+
+    silence_uri(duration_ms, fmt) must return the URI of a silent segment;
+    voicelines are served at audio_prefix + their audio_path.
+    Returns (playlist_text, segment_count, complete).
+    """
+    entries = []  # (uri, duration_ms)
+    prev_speaker = None
+    complete = True
+
+    for chunk in chunks:
+        path = chunk.get("audio_path")
+        full_path = os.path.join(root_dir, path) if path else None
+
+        if not full_path or not os.path.exists(full_path):
+            if chunk.get("status") in UNFINISHED_STATUSES:
+                complete = False
+                break
+            # Failed chunks without audio are skipped, as in merge_audio
+            continue
+
+        duration = chunk.get("duration_ms") or probe_duration_ms(full_path)
+        if not duration:
+            continue
+
+        speaker = chunk.get("speaker")
+        if prev_speaker is not None:
+            gap = same_speaker_pause_ms if speaker == prev_speaker else pause_ms
+            fmt = os.path.splitext(path)[1].lstrip(".").lower() or "mp3"
+            entries.append((silence_uri(gap, fmt), gap))
+
+        # Version in the URI so a re-rendered line is not served from cache
+        entries.append((f"{audio_prefix}{path}?v={chunk.get('version', 0)}", duration))
+        prev_speaker = speaker
+
+    target = max((math.ceil(d / 1000) for _, d in entries), default=1)
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{target}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+    ]
+    for uri, duration in entries:
+        lines.append(f"#EXTINF:{duration / 1000:.3f},")
+        lines.append(uri)
+    if complete:
+        lines.append("#EXT-X-ENDLIST")
+
+    return "\n".join(lines) + "\n", len(entries), complete
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import pstats
+import cProfile
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from json_store import get_file
+import tracing
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BASE_DIR)
+CONFIG_PATH = os.path.join(BASE_DIR, "config.json")
+PROFILES_DIR = os.path.join(ROOT_DIR, "profiles")
+
+PROFILE_ENV = "ALEXANDRIA_PROFILE"
+TOP_FUNCTIONS = 30
+
+# Profiling is opt-in: set ALEXANDRIA_PROFILE=1 or "profiling": {"enabled": true}
+# in config.json. Each profiled run writes to profiles/:
+#   <run>.prof  cProfile data of the thread that ran the task (open with snakeviz/pstats)
+#   <run>.json  wall clock, per-stage breakdown across all threads, top functions
+# Stage timings (stage()/record_stage()) cost nothing while no run is active.
+# They go to the run of the calling context; threads that work for a run
+# (pipeline stages, LLM and encoder threads) attach it with attach_run().
+# With tracing on (tracing.py), every stage() and profiled() call is also a span.
+
+def is_enabled():
+    if os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes", "on"):
+        return True
+    return bool(get_file(CONFIG_PATH).load().get("profiling", {}).get("enabled"))
+
+class ProfileRun:
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started))
+        self.run_id = f"{name}_{stamp}-{int(self.started * 1000) % 1000:03d}"
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage_name, seconds):
+        with self._lock:
+            entry = self.stages.setdefault(stage_name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def save(self, wall_seconds, profiler=None):
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        report = {
+            "run_id": self.run_id,
+            "name": self.name,
+            "started": self.started,
+            "wall_seconds": round(wall_seconds, 3),
+            "stages": {
+                name: {
+                    "count": s["count"],
+                    "total_seconds": round(s["total_seconds"], 3),
+                    "max_seconds": round(s["max_seconds"], 3),
+                }
+                for name, s in sorted(self.stages.items(), key=lambda kv: -kv[1]["total_seconds"])
+            },
+            "profile": None,
+            "top_functions": [],
+        }
+
+        if profiler is not None:
+            prof_name = f"{self.run_id}.prof"
+            profiler.dump_stats(os.path.join(PROFILES_DIR, prof_name))
+            report["profile"] = prof_name
+            report["top_functions"] = top_functions(pstats.Stats(profiler))
+
+        with open(os.path.join(PROFILES_DIR, f"{self.run_id}.json"), "w") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+def top_functions(stats, limit=TOP_FUNCTIONS):
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, callers) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({func})",
+            "calls": nc,
+            "total_seconds": round(tt, 4),
+            "cumulative_seconds": round(ct, 4),
+        })
+    rows.sort(key=lambda r: -r["cumulative_seconds"])
+    return rows[:limit]
+
+_active_runs = []
+_runs_lock = threading.Lock()
+_current_run = contextvars.ContextVar("profile_run", default=None)
+
+def current_run():
+    """The profiled run of the calling context, to hand to attach_run() on another thread."""
+    return _current_run.get()
+
+@contextmanager
+def attach_run(run):
+    """Record the stages of this block into run (no-op for None)."""
+    if run is None:
+        yield
+        return
+    token = _current_run.set(run)
+    try:
+        yield
+    finally:
+        _current_run.reset(token)
+
+def record_stage(stage_name, seconds):
+    """Add one timing sample to the run of the calling context.
+
+    A thread that was not attached to a run only counts while a single run is
+    active; with several there is no telling which one it works for.
+    """
+    if not _active_runs:
+        return
+    run = _current_run.get()
+    if run is None:
+        runs = list(_active_runs)
+        if len(runs) != 1:
+            return
+        run = runs[0]
+    run.record(stage_name, seconds)
+
+@contextmanager
+def stage(stage_name, **attributes):
+    """Time a block as one sample of stage_name and as a trace span with attributes
+    (no-op unless profiling or tracing). Yields the span, or None if not tracing."""
+    if not _active_runs and not tracing.enabled():
+        yield None
+        return
+    start = time.perf_counter()
+    try:
+        with tracing.span(stage_name, **attributes) as span:
+            yield span
+    finally:
+        record_stage(stage_name, time.perf_counter() - start)
+
+def profiled(name):
+    """Decorator: profile each call as one run when profiling is enabled.
+
+    Calls nested inside another profiled run on the same thread are only timed
+    as a stage of the outer run.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_run.get() is not None:
+                with stage(name):
+                    return func(*args, **kwargs)
+            with tracing.span(name):
+                if not is_enabled():
+                    return func(*args, **kwargs)
+                return _run_profiled(name, func, args, kwargs)
+        return wrapper
+    return decorator
+
+def _run_profiled(name, func, args, kwargs):
+    run = ProfileRun(name)
+    token = _current_run.set(run)
+    with _runs_lock:
+        _active_runs.append(run)
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Another profiler is already active (e.g. a concurrent task on Python 3.12+)
+        print(f"Profiling {name}: cProfile unavailable ({e}); recording stage timings only")
+        profiler = None
+
+    start = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        wall = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+        with _runs_lock:
+            _active_runs.remove(run)
+        _current_run.reset(token)
+        try:
+            report = run.save(wall, profiler)
+            print_breakdown(report)
+        except Exception as e:
+            print(f"Could not save profile for {name}: {e}")
+
+def print_breakdown(report):
+    print(f"--- Profile {report['run_id']}: {report['wall_seconds']:.1f}s wall ---")
+    for stage_name, s in report["stages"].items():
+        print(f"  {stage_name:<24} {s['total_seconds']:>9.2f}s  x{s['count']}  (max {s['max_seconds']:.2f}s)")
+    print(f"  Saved to profiles/{report['run_id']}.json")
+
+def list_profiles():
+    """Summaries of saved runs, newest first."""
+    if not os.path.isdir(PROFILES_DIR):
+        return []
+    runs = []
+    for filename in os.listdir(PROFILES_DIR):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILES_DIR, filename), "r") as f:
+                report = json.load(f)
+        except Exception:
+            continue
+        runs.append({
+            "run_id": report.get("run_id"),
+            "name": report.get("name"),
+            "started": report.get("started"),
+            "wall_seconds": report.get("wall_seconds"),
+            "files": [filename] + ([report["profile"]] if report.get("profile") else []),
+        })
+    runs.sort(key=lambda r: r.get("started") or 0, reverse=True)
+    return runs
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BASE_DIR)
+HISTORY_PATH = os.path.join(ROOT_DIR, "runs", "history.jsonl")
+
+RATE_WINDOW_SECONDS = 300   # rolling window for items per minute
+UPDATE_INTERVAL = 1.0       # min seconds between on_update callbacks per run
+
+# Optional callback(snapshot_dict) fired (throttled) when any run progresses
+on_update = None
+
+class ProgressTracker:
+    """Structured progress of one long-running run (a task or a render batch).
+
+    Counts items done/failed out of a total that may grow while running
+    (render batches), characters processed and seconds of audio produced.
+    From those it derives a rolling items/minute rate, the real-time factor
+    (audio seconds per wall second) and an ETA. finish() appends a summary
+    to runs/history.jsonl so runs with different backends or settings can be
+    compared later.
+    """
+
+    def __init__(self, name, total=0, unit="chunks", meta=None):
+        self.name = name
+        self.unit = unit
+        self.meta = meta or {}
+        self.started = time.time()
+        self.run_id = f"{name}-{int(self.started * 1000)}"
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.chars = 0
+        self.audio_ms = 0
+        self.finished = None
+        self.status = "running"
+        self._recent = deque()   # completion timestamps inside the rate window
+        self._lock = threading.Lock()
+        self._last_update = 0.0
+
+    def add_total(self, count):
+        with self._lock:
+            self.total += count
+        self._changed()
+
+    def advance(self, chars=0, audio_ms=0, failed=False):
+        now = time.time()
+        with self._lock:
+            if failed:
+                self.failed += 1
+            else:
+                self.done += 1
+                self.chars += chars
+                self.audio_ms += audio_ms or 0
+            self._recent.append(now)
+            while self._recent and self._recent[0] < now - RATE_WINDOW_SECONDS:
+                self._recent.popleft()
+        self._changed()
+
+    def finish(self, status="completed"):
+        with self._lock:
+            if self.finished is not None:
+                return
+            self.finished = time.time()
+            self.status = status
+        self._changed(force=True)
+        save_run(self.snapshot())
+
+    def snapshot(self):
+        with self._lock:
+            end = self.finished or time.time()
+            elapsed = max(end - self.started, 1e-6)
+            processed = self.done + self.failed
+
+            # Rolling rate over recent completions; overall rate until the window has data
+            if len(self._recent) >= 2 and self.finished is None:
+                span = max(end - self._recent[0], 1e-6)
+                per_minute = len(self._recent) / span * 60
+            else:
+                per_minute = processed / elapsed * 60
+
+            remaining = max(self.total - processed, 0)
+            eta = remaining / per_minute * 60 if per_minute > 0 and self.finished is None else None
+
+            return {
+                "run_id": self.run_id,
+                "name": self.name,
+                "unit": self.unit,
+                "status": self.status,
+                "meta": self.meta,
+                "started": self.started,
+                "finished": self.finished,
+                "elapsed_seconds": round(elapsed, 1),
+                "total": self.total,
+                "done": self.done,
+                "failed": self.failed,
+                "percent": round(processed / self.total * 100, 1) if self.total else 0.0,
+                "chars": self.chars,
+                "audio_seconds": round(self.audio_ms / 1000, 1),
+                "per_minute": round(per_minute, 2),
+                "chars_per_second": round(self.chars / elapsed, 1),
+                "real_time_factor": round(self.audio_ms / 1000 / elapsed, 3) if self.audio_ms else None,
+                "eta_seconds": round(eta) if eta is not None else None,
+            }
+
+    def _changed(self, force=False):
+        now = time.time()
+        if not force and now - self._last_update < UPDATE_INTERVAL:
+            return
+        self._last_update = now
+        if on_update:
+            try:
+                on_update(self.snapshot())
+            except Exception as e:
+                print(f"Progress listener failed: {e}")
+
+_runs = {}
+_runs_lock = threading.Lock()
+
+def start(name, total=0, unit="chunks", meta=None):
+    """Begin a new run under name, replacing (and closing) any previous one."""
+    tracker = ProgressTracker(name, total, unit, meta)
+    with _runs_lock:
+        previous = _runs.get(name)
+        _runs[name] = tracker
+    if previous is not None and previous.finished is None:
+        previous.finish("interrupted")
+    tracker._changed(force=True)
+    return tracker
+
+def get(name):
+    with _runs_lock:
+        return _runs.get(name)
+
+def track_batch(name, count, meta=None):
+    """Add count items to the open run under name, starting a run if none is open.
+
+    For render queues, where one run lasts until the queue drains.
+    """
+    tracker = get(name)
+    if tracker is None or tracker.finished is not None:
+        return start(name, total=count, meta=meta)
+    tracker.add_total(count)
+    return tracker
+
+def snapshot(name):
+    tracker = get(name)
+    return tracker.snapshot() if tracker else None
+
+def snapshots():
+    with _runs_lock:
+        trackers = list(_runs.values())
+    return {t.name: t.snapshot() for t in trackers}
+
+def save_run(summary):
+    os.makedirs(os.path.dirname(HISTORY_PATH), exist_ok=True)
+    with open(HISTORY_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(summary) + "\n")
+
+def load_history(name=None, limit=100):
+    """Most recent persisted run summaries, newest first."""
+    if not os.path.exists(HISTORY_PATH):
+        return []
+    runs = []
+    with open(HISTORY_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                run = json.loads(line)
+            except ValueError:
+                continue
+            if name is None or run.get("name") == name:
+                runs.append(run)
+    return runs[::-1][:limit]
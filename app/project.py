@@ -1,20 +1,49 @@
 import os
 import json
-import shutil
+import time
+import threading
 from tts import (
-    generate_voice,
+    synthesize_voice,
     combine_audio_with_pauses,
     sanitize_filename,
     DEFAULT_PAUSE_MS,
     SAME_SPEAKER_PAUSE_MS
 )
-from pydub import AudioSegment
-from gradio_client import Client
+from tts_client import get_manager, DEFAULT_TTS_URL
+from pipeline import post_process
+from export import export_audiobook
+from profiling import profiled, stage
+from script_index import refresh_index, script_stat
+from json_store import get_file
+from take_qa import QA_DEFAULTS, speaker_baseline, check_take, retake_voice
+from build_graph import (
+    file_hash,
+    load_graph,
+    update_graph,
+    chunk_render_hash,
+    reconcile_chunks,
+    region_key,
+    split_regions
+)
 
 MAX_CHUNK_CHARS = 500
+# Render bookkeeping (status, audio path, duration) is written to chunks.json at
+# most this often; rewriting the whole file twice per rendered chunk dominated
+# the server's CPU on long books
+CHUNKS_FLUSH_DELAY = 0.5
+# ...and per-speaker render progress in the script index is refreshed at most
+# this often while only render bookkeeping changed
+INDEX_REFRESH_SECONDS = 1.0
+# ...and so is each speaker's take QA baseline: rescanning every chunk for every
+# finished take made a long render quadratic, and a median over the speaker's
+# takes barely moves between two of them
+BASELINE_REFRESH_SECONDS = 1.0
 
 def group_into_chunks(script_entries, max_chars=MAX_CHUNK_CHARS):
-    """Group consecutive entries by same speaker into chunks up to max_chars"""
+    """Group consecutive entries by same speaker into chunks up to max_chars.
+
+    Each chunk records the [start, end) range of script entries it came from.
+    """
     if not script_entries:
         return []
 
@@ -22,8 +51,9 @@ def group_into_chunks(script_entries, max_chars=MAX_CHUNK_CHARS):
     current_speaker = script_entries[0].get("speaker")
     current_text = script_entries[0].get("text", "")
     current_style = script_entries[0].get("style", "")
+    current_start = 0
 
-    for entry in script_entries[1:]:
+    for i, entry in enumerate(script_entries[1:], 1):
         speaker = entry.get("speaker")
         text = entry.get("text", "")
         style = entry.get("style", "")
@@ -39,217 +69,694 @@ def group_into_chunks(script_entries, max_chars=MAX_CHUNK_CHARS):
                 chunks.append({
                     "speaker": current_speaker,
                     "text": current_text,
-                    "style": current_style
+                    "style": current_style,
+                    "entries": [current_start, i]
                 })
                 current_text = text
                 current_style = style
+                current_start = i
         else:
             chunks.append({
                 "speaker": current_speaker,
                 "text": current_text,
-                "style": current_style
+                "style": current_style,
+                "entries": [current_start, i]
             })
             current_speaker = speaker
             current_text = text
             current_style = style
+            current_start = i
 
     # Don't forget the last chunk
     chunks.append({
         "speaker": current_speaker,
         "text": current_text,
-        "style": current_style
+        "style": current_style,
+        "entries": [current_start, len(script_entries)]
     })
 
     return chunks
 
 class ProjectManager:
-    def __init__(self, root_dir):
+    def __init__(self, root_dir, config_path=None):
         self.root_dir = root_dir
         self.script_path = os.path.join(root_dir, "annotated_script.json")
         self.chunks_path = os.path.join(root_dir, "chunks.json")
         self.voicelines_dir = os.path.join(root_dir, "voicelines")
         self.voice_config_path = os.path.join(root_dir, "voice_config.json")
-        self.config_path = os.path.join(root_dir, "app", "config.json")
+        # App-wide settings (TTS server, export formats); shared by every project
+        self.config_path = config_path or os.path.join(root_dir, "app", "config.json")
+        self.merge_dir = os.path.join(root_dir, "build", "merge")
+        # Cached, atomically written JSON files (shared with app.py through json_store)
+        self.config_file = get_file(self.config_path)
+        self.voice_config_file = get_file(self.voice_config_path)
+        self.state_file = get_file(os.path.join(root_dir, "state.json"))
 
         # Ensure voicelines dir exists
         os.makedirs(self.voicelines_dir, exist_ok=True)
 
-        self.client = None
+        # Optional loudness target (dBFS) applied to every rendered chunk
+        self.normalize_dbfs = None
+
+        # Guards read-modify-write cycles on chunks.json across render workers
+        self._chunks_lock = threading.RLock()
+        # (generation, version, chunks) as last loaded or saved. Readers use it
+        # without the lock, so API requests never wait behind a render save.
+        self._snapshot = None
+        self._generation = 0
+        # What chunks.json holds: its (mtime_ns, size) and snapshot generation
+        self._disk_stat = None
+        self._disk_generation = 0
+        self._flush_timer = None
+        # {id(chunk): (chunk, json line)} from the last write, see _serialize
+        self._chunk_lines = {}
+        # Bumped by every save or load other than render bookkeeping (edits,
+        # regrouping), which must show up in the script index right away
+        self._structure = 0
+        # Optional callback(list_of_chunks) fired after chunks change on disk
+        self.on_chunks_changed = None
+        # Optional callback() fired after chunks.json was rebuilt from the script
+        self.on_chunks_rebuilt = None
+        # Optional callback(index, attempt) fired when a take failed QA and
+        # should be rendered again (see take_qa.py)
+        self.on_take_rejected = None
+        # Every chunk change stamps chunk["version"] from this counter so clients
+        # can ask for deltas; the epoch changes whenever versions may restart.
+        self._version = None
+        self._epoch = str(int(time.time()))
+        # In-memory copy of script_index.json and the
+        # (chunks etag, structure, script stat, build time) it matches
+        self._index = None
+        self._index_key = None
+        self._index_lock = threading.Lock()
+        # {speaker: (computed at, take QA baseline)}, see review_take
+        self._baselines = {}
+
+    def get_tts_url(self):
+        return self.config_file.load().get("tts", {}).get("url", DEFAULT_TTS_URL)
+
+    def get_export_formats(self):
+        """Configured {format: settings} for the final audiobook, or None for the default."""
+        return self.config_file.load().get("export", {}).get("formats")
+
+    def get_qa_config(self):
+        """Take QA settings: QA_DEFAULTS overridden by the "qa" section of config.json."""
+        return dict(QA_DEFAULTS, **self.config_file.load().get("qa", {}))
+
+    def get_client_manager(self):
+        return get_manager(self.get_tts_url())
 
     def get_client(self):
-        if self.client:
-            return self.client
-
-        # Load config to get URL
-        url = "http://127.0.0.1:7860"
-        if os.path.exists(self.config_path):
-            try:
-                with open(self.config_path, "r") as f:
-                    config = json.load(f)
-                    url = config.get("tts", {}).get("url", url)
-            except: pass
+        # The shared manager reconnects with backoff and drops stale clients
+        return self.get_client_manager().get()
 
-        print(f"Connecting to TTS server at {url}...")
+    def _chunks_stat(self):
         try:
-            self.client = Client(url)
-            return self.client
-        except Exception as e:
-            print(f"Failed to connect to TTS: {e}")
+            st = os.stat(self.chunks_path)
+        except OSError:
             return None
+        return (st.st_mtime_ns, st.st_size)
 
-    def load_chunks(self):
-        if os.path.exists(self.chunks_path):
-            with open(self.chunks_path, "r") as f:
-                return json.load(f)
+    def _remember(self, chunks):
+        # The snapshot owns chunks from here on: nothing may modify them
+        self._generation += 1
+        self._snapshot = (self._generation, self._version or 0, chunks)
 
-        # If no chunks, generate from script
-        if os.path.exists(self.script_path):
-            with open(self.script_path, "r") as f:
-                script = json.load(f)
-            chunks = group_into_chunks(script)
+    def _snapshot_current(self):
+        """True if the snapshot is still what chunks.json holds (or will hold once flushed)."""
+        stat = self._chunks_stat()
+        return self._snapshot is not None and stat is not None and stat == self._disk_stat
 
-            # Initialize chunk status
-            for i, chunk in enumerate(chunks):
-                chunk["id"] = i
-                chunk["status"] = "pending" # pending, generating, done, error
-                chunk["audio_path"] = None
+    def load_chunks(self):
+        """Chunks as a fresh list the caller may modify (and pass to save_chunks)."""
+        with self._chunks_lock:
+            if self._snapshot_current():
+                return [dict(c) for c in self._snapshot[2]]
+
+            if os.path.exists(self.chunks_path):
+                with open(self.chunks_path, "r") as f:
+                    chunks = json.load(f)
+                if self._version is None:
+                    self._version = max((c.get("version", 0) for c in chunks), default=0)
+                self._remember(chunks)
+                self._disk_stat = self._chunks_stat()
+                self._disk_generation = self._generation
+                self._structure += 1
+                return [dict(c) for c in chunks]
+
+            # If no chunks, generate from script
+            if os.path.exists(self.script_path):
+                with open(self.script_path, "r") as f:
+                    script = json.load(f)
+                chunks = group_into_chunks(script)
+
+                # Initialize chunk status
+                self._version = 0
+                self._epoch = str(int(time.time()))
+                for i, chunk in enumerate(chunks):
+                    chunk["id"] = i
+                    chunk["status"] = "pending" # pending, queued, generating, done, error
+                    chunk["audio_path"] = None
+                    chunk["version"] = 0
 
-            self.save_chunks(chunks)
-            return chunks
+                self.save_chunks(chunks)
+                update_graph(self.root_dir, "chunks", {"script_hash": file_hash(self.script_path)})
+                return chunks
 
-        return []
+            return []
 
     def save_chunks(self, chunks):
-        with open(self.chunks_path, "w") as f:
-            json.dump(chunks, f, indent=2)
+        with self._chunks_lock:
+            # Copy each chunk: callers may keep modifying the list they saved
+            self._remember([dict(c) for c in chunks])
+            self._structure += 1
+            self._write_snapshot(self._snapshot)
+
+    def _save_later(self, chunks):
+        """Make chunks current now and write them within CHUNKS_FLUSH_DELAY,
+        merged with other deferred saves. chunks must not be modified after."""
+        with self._chunks_lock:
+            self._remember(chunks)
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(CHUNKS_FLUSH_DELAY, self.flush_chunks)
+                self._flush_timer.start()
+
+    def _current_chunks(self):
+        # Read-only chunk list for the copy-on-write updates below (lock held)
+        if self._snapshot_current():
+            return self._snapshot[2]
+        return self.load_chunks()
+
+    def flush_chunks(self):
+        """Write a deferred save now (no-op if there is none)."""
+        with self._chunks_lock:
+            self._flush_timer = None
+            snapshot = self._snapshot
+            if snapshot is None or snapshot[0] <= self._disk_generation:
+                return
+        # Serialize outside the lock: render workers keep updating meanwhile
+        text = self._serialize(snapshot[2])
+        with self._chunks_lock:
+            # A synchronous save may have written something newer already
+            if snapshot[0] > self._disk_generation:
+                self._write_snapshot(snapshot, text)
+
+    def _serialize(self, chunks):
+        # One chunk per line keeps the file diffable at a fraction of the
+        # cost of indent=2, which uses the pure-Python encoder. Snapshot chunks
+        # are never modified, so a chunk object already written keeps its line:
+        # a render write only encodes the chunks it changed.
+        previous = self._chunk_lines
+        entries = []
+        for c in chunks:
+            entry = previous.get(id(c))
+            if entry is None or entry[0] is not c:
+                entry = (c, json.dumps(c))
+            entries.append(entry)
+        self._chunk_lines = {id(entry[0]): entry for entry in entries}
+        return "[\n" + ",\n".join(line for _, line in entries) + "\n]\n"
+
+    def _write_snapshot(self, snapshot, text=None):
+        with stage("save_chunks"):
+            if text is None:
+                text = self._serialize(snapshot[2])
+            # Replaced atomically so a reader never parses a half-written file
+            tmp = self.chunks_path + ".tmp"
+            with open(tmp, "w") as f:
+                f.write(text)
+            os.replace(tmp, self.chunks_path)
+            self._disk_stat = self._chunks_stat()
+            self._disk_generation = snapshot[0]
+
+    def chunks_snapshot(self):
+        """(version, chunks) as last saved, without waiting for a writer.
+
+        The list is shared with other readers: do not modify it. Falls back
+        to load_chunks() when chunks.json is missing or changed outside the app.
+        """
+        snapshot = self._snapshot
+        if not self._snapshot_current():
+            with self._chunks_lock:
+                chunks = self.load_chunks()
+                if not self._snapshot_current():
+                    return self._version or 0, chunks
+                snapshot = self._snapshot
+        return snapshot[1], snapshot[2]
 
     def update_chunk(self, index, data):
-        chunks = self.load_chunks()
-        if 0 <= index < len(chunks):
-            chunk = chunks[index]
-            # Update fields
-            if "text" in data: chunk["text"] = data["text"]
-            if "style" in data: chunk["style"] = data["style"]
-            if "speaker" in data: chunk["speaker"] = data["speaker"]
-
-            # If text/style/speaker changed, reset status (but keep old audio until regen)
-            if "text" in data or "style" in data or "speaker" in data:
-                chunk["status"] = "pending"
+        with self._chunks_lock:
+            chunks = self.load_chunks()
+            if 0 <= index < len(chunks):
+                chunk = chunks[index]
+                # Update fields
+                if "text" in data: chunk["text"] = data["text"]
+                if "style" in data: chunk["style"] = data["style"]
+                if "speaker" in data: chunk["speaker"] = data["speaker"]
+
+                # If text/style/speaker changed, reset status (but keep old audio until regen)
+                if "text" in data or "style" in data or "speaker" in data:
+                    chunk["status"] = "pending"
+
+                self._stamp(chunk)
+                self.save_chunks(chunks)
+                self._notify_changed([chunk])
+                return chunk
+            return None
 
-            self.save_chunks(chunks)
-            return chunk
-        return None
+    def set_chunk_fields(self, index, **fields):
+        """Update bookkeeping fields of one chunk and persist. Returns the chunk or None."""
+        with self._chunks_lock:
+            chunks = list(self._current_chunks())
+            if not (0 <= index < len(chunks)):
+                return None
+            chunk = dict(chunks[index])
+            chunk.update(fields)
+            self._stamp(chunk)
+            chunks[index] = chunk
+            self._save_later(chunks)
+            self._notify_changed([chunk])
+            return dict(chunk)
+
+    def set_chunk_statuses(self, indices, status, only_from=None):
+        """Set the status of many chunks with a single write.
+
+        If only_from is given, only chunks currently in one of those statuses change.
+        Returns the list of indices that were actually updated.
+        """
+        with self._chunks_lock:
+            chunks = list(self._current_chunks())
+            changed = []
+            for index in indices:
+                if not (0 <= index < len(chunks)):
+                    continue
+                if only_from is not None and chunks[index].get("status") not in only_from:
+                    continue
+                chunk = dict(chunks[index])
+                chunk["status"] = status
+                self._stamp(chunk)
+                chunks[index] = chunk
+                changed.append(index)
+            if changed:
+                self._save_later(chunks)
+                self._notify_changed([chunks[i] for i in changed])
+            return changed
+
+    def _stamp(self, chunk):
+        self._version = (self._version or 0) + 1
+        chunk["version"] = self._version
+
+    def chunks_etag(self):
+        return f'"{self._epoch}-{self.chunks_snapshot()[0]}"'
+
+    def get_script_index(self):
+        """The speaker/entry/chunk index, rebuilt only after the script or chunks changed.
+
+        Changes from render bookkeeping alone (statuses, durations) rebuild it
+        at most every INDEX_REFRESH_SECONDS and only in memory, so polling it
+        during a render doesn't rebuild and rewrite it for every finished chunk.
+        """
+        version, chunks = self.chunks_snapshot()
+        etag = f'"{self._epoch}-{version}"'
+        with self._index_lock:
+            stat = script_stat(self.root_dir)
+            stale = self._index is None or self._index_key is None
+            bookkeeping = False
+            if not stale:
+                built_etag, built_structure, built_stat, built_at = self._index_key
+                bookkeeping = built_structure == self._structure and built_stat == stat
+                stale = not bookkeeping or (
+                    built_etag != etag and time.time() - built_at >= INDEX_REFRESH_SECONDS
+                )
+            if stale:
+                # Encoding the whole index holds the GIL for milliseconds; the file
+                # records its chunks version, so a reader of a stale one rebuilds it
+                self._index = refresh_index(self.root_dir, chunks, etag, index=self._index, save=not bookkeeping)
+                self._index_key = (etag, self._structure, stat, time.time())
+            return self._index
+
+    def speaker_chunk_ids(self, speaker):
+        index = self.get_script_index() or {}
+        return index.get("speakers", {}).get(speaker, {}).get("chunks", [])
+
+    def query_chunks(self, offset=0, limit=None, speaker=None, status=None, q=None, since=None):
+        """Return one filtered page of chunks, optionally only rows changed after `since`.
+
+        The window (filters + offset/limit) is applied first, so a delta request
+        only returns changed rows inside the caller's visible page. It also lists
+        the ids in the window ("ids"): rows that left it (a filter no longer
+        matches, or the page shifted) are not among the changed rows.
+        """
+        version, chunks = self.chunks_snapshot()
+
+        status_counts = {}
+        for c in chunks:
+            status_counts[c.get("status", "pending")] = status_counts.get(c.get("status", "pending"), 0) + 1
+
+        matched = chunks
+        if speaker:
+            matched = [chunks[i] for i in self.speaker_chunk_ids(speaker) if i < len(chunks)]
+        if status:
+            wanted = set(status.split(","))
+            matched = [c for c in matched if c.get("status") in wanted]
+        if q:
+            needle = q.lower()
+            matched = [c for c in matched if needle in c.get("text", "").lower() or needle in (c.get("style") or "").lower()]
+
+        offset = max(0, offset)
+        window = matched[offset:offset + limit] if limit else matched[offset:]
+        ids = [c["id"] for c in window]
+        if since is not None:
+            window = [c for c in window if c.get("version", 0) > since]
+
+        page = {
+            "items": window,
+            "total": len(matched),
+            "count": len(chunks),
+            "offset": offset,
+            "limit": limit,
+            "version": version,
+            "epoch": self._epoch,
+            "status_counts": status_counts,
+        }
+        if since is not None:
+            page["ids"] = ids
+        return page
+
+    def _notify_changed(self, changed_chunks):
+        if self.on_chunks_changed:
+            try:
+                self.on_chunks_changed([dict(c) for c in changed_chunks])
+            except Exception as e:
+                print(f"Chunk change listener failed: {e}")
+
+    def reset_stale_statuses(self):
+        """Return chunks left queued/generating by a previous run to pending."""
+        with self._chunks_lock:
+            chunks = self.load_chunks()
+            stale = [c["id"] for c in chunks if c.get("status") in ("queued", "generating")]
+            return self.set_chunk_statuses(stale, "pending")
+
+    @profiled("rebuild_chunks")
+    def rebuild_chunks(self):
+        """Bring chunks.json up to date with the script and voice config.
+
+        If the script changed, it is regrouped and every new chunk whose speaker,
+        text, style and voice match an already rendered chunk keeps that audio
+        (the file is renamed to its new position). If only voices changed, the
+        chunks rendered with an old voice go back to pending.
+        Returns a summary dict, or None if there is no script yet.
+        """
+        if not os.path.exists(self.script_path):
+            return None
 
-    def generate_chunk_audio(self, index):
-        chunks = self.load_chunks()
-        if not (0 <= index < len(chunks)):
-            return False, "Invalid chunk index"
+        with self._chunks_lock:
+            script_hash = file_hash(self.script_path)
+            recorded = load_graph(self.root_dir).get("chunks", {}).get("script_hash")
+            voice_config = self.load_voice_config()
+
+            if not os.path.exists(self.chunks_path) or recorded is None:
+                # First run or chunks.json from before the build graph: adopt as is
+                chunks = self.load_chunks()
+                update_graph(self.root_dir, "chunks", {"script_hash": script_hash})
+                return {"regrouped": False, "reused": 0, "invalidated": 0, "total": len(chunks)}
+
+            old_chunks = self.load_chunks()
+
+            if recorded == script_hash:
+                # Chunks rendered before render hashes existed are assumed current
+                stale = [
+                    c["id"] for c in old_chunks
+                    if c.get("status") == "done" and c.get("render_hash")
+                    and c["render_hash"] != chunk_render_hash(c, voice_config)
+                ]
+                invalidated = self.set_chunk_statuses(stale, "pending")
+                if invalidated:
+                    print(f"Voice settings changed for {len(invalidated)} rendered chunks; marked pending")
+                return {"regrouped": False, "reused": 0, "invalidated": len(invalidated), "total": len(old_chunks)}
 
-        chunk = chunks[index]
-        chunk["status"] = "generating"
-        self.save_chunks(chunks)
+            with open(self.script_path, "r") as f:
+                script = json.load(f)
+            chunks = group_into_chunks(script)
+            for i, chunk in enumerate(chunks):
+                chunk["id"] = i
+                chunk["status"] = "pending"
+                chunk["audio_path"] = None
 
-        try:
-            client = self.get_client()
-            if not client:
-                chunk["status"] = "error"
-                self.save_chunks(chunks)
-                return False, "TTS Client not connected"
+            moves = reconcile_chunks(old_chunks, chunks, voice_config)
+            self._move_audio(moves)
 
-            # Load voice config
-            voice_config = {}
-            if os.path.exists(self.voice_config_path):
-                with open(self.voice_config_path, "r") as f:
-                    voice_config = json.load(f)
+            # Indices changed meaning: start a new epoch so clients reload
+            self._version = 0
+            self._epoch = str(int(time.time() * 1000))
+            for chunk in chunks:
+                self._stamp(chunk)
 
-            speaker = chunk["speaker"]
-            text = chunk["text"]
-            style = chunk["style"]
+            self.save_chunks(chunks)
+            update_graph(self.root_dir, "chunks", {"script_hash": script_hash})
 
-            # Generate to temp file
-            temp_path = os.path.join(self.root_dir, "temp_chunk.wav")
+        self.get_script_index()
+        print(f"Rebuilt chunks from script: {len(chunks)} chunks, reused audio for {len(moves)}")
+        if self.on_chunks_rebuilt:
+            try:
+                self.on_chunks_rebuilt()
+            except Exception as e:
+                print(f"Chunk rebuild listener failed: {e}")
+        return {"regrouped": True, "reused": len(moves), "invalidated": 0, "total": len(chunks)}
+
+    def _move_audio(self, moves):
+        """Rename reused audio files to their chunk's new position.
+
+        Two phases (old -> temp -> new) so swapped positions never clobber each other.
+        """
+        staged = []
+        for old_path, chunk in moves:
+            ext = os.path.splitext(old_path)[1]
+            new_path = f"voicelines/voiceline_{chunk['id']+1:04d}_{sanitize_filename(chunk['speaker'])}{ext}"
+            chunk["audio_path"] = new_path
+            if new_path == old_path:
+                continue
+            src = os.path.join(self.root_dir, old_path)
+            if not os.path.exists(src):
+                chunk["status"] = "pending"
+                chunk["audio_path"] = None
+                continue
+            tmp = src + ".rebuild"
+            os.replace(src, tmp)
+            staged.append((tmp, os.path.join(self.root_dir, new_path)))
+
+        for tmp, dst in staged:
+            os.replace(tmp, dst)
+
+    def load_voice_config(self):
+        """Speaker -> voice settings. Cached and shared: do not modify the result."""
+        return self.voice_config_file.load()
+
+    def prepare_chunk_job(self, index, attempt=0):
+        """Mark a chunk as generating and build its render job. Returns (job, error).
+
+        attempt counts retakes after failed QA (0 for a normal render).
+        """
+        chunk = self.set_chunk_fields(index, status="generating")
+        if chunk is None:
+            return None, "Invalid chunk index"
+        filename_base = f"voiceline_{index+1:04d}_{sanitize_filename(chunk['speaker'])}"
+        job = {
+            "index": index,
+            "speaker": chunk["speaker"],
+            "text": chunk["text"],
+            "style": chunk["style"],
+            "output_base": os.path.join(self.voicelines_dir, filename_base),
+            "attempt": attempt,
+        }
+        return job, None
+
+    def synthesize_chunk(self, job):
+        """TTS stage: fill job["audio"] with WAV bytes. Returns (ok, error)."""
+        client = self.get_client()
+        if not client:
+            return False, "TTS Client not connected"
+
+        voice_config = self.load_voice_config()
+        job["render_hash"] = chunk_render_hash(job, voice_config)
+        if job.get("attempt") and job["speaker"] in voice_config:
+            voice_config = dict(voice_config)
+            voice_config[job["speaker"]] = retake_voice(voice_config[job["speaker"]], job["attempt"])
+
+        # Audio stays in memory from download to encoder; each job owns its buffer
+        with stage("tts", speaker=job["speaker"], chars=len(job["text"])):
+            job["audio"] = synthesize_voice(job["text"], job["style"], job["speaker"], voice_config, client)
+        if job["audio"] is None:
+            # Have the client manager re-check the server before the next job
+            self.get_client_manager().report_failure()
+            return False, "Generation failed"
+
+        print(f"Generated WAV size: {len(job['audio'])} bytes")
+        return True, None
+
+    def finish_chunk_job(self, job, error=None):
+        """Record the outcome of a render job on its chunk."""
+        index = job["index"]
+        if error:
+            self.set_chunk_fields(index, status="error")
+            return False, error
+
+        audio_path = f"voicelines/{os.path.basename(job['output_path'])}"
+        chunks = self.chunks_snapshot()[1]
+        if (job.get("render_hash") and 0 <= index < len(chunks)
+                and chunk_render_hash(chunks[index], self.load_voice_config()) != job["render_hash"]):
+            # Edited while rendering: keep the take like any old audio, but it is not done
+            self.set_chunk_fields(
+                index, status="pending", qa=None,
+                audio_path=audio_path, duration_ms=job["duration_ms"], render_hash=job["render_hash"]
+            )
+            return True, audio_path
+        self.record_take(
+            index, job["text"], job.get("qa_metrics"), job.get("attempt", 0),
+            audio_path=audio_path, duration_ms=job["duration_ms"], render_hash=job.get("render_hash")
+        )
+        return True, audio_path
+
+    def review_take(self, index, text, metrics, attempt=0):
+        """QA verdict on a new take of a chunk. Returns (chunk["qa"] record or None, render again?)."""
+        config = self.get_qa_config()
+        if not config["enabled"] or metrics is None:
+            return None, False
+        chunks = self.chunks_snapshot()[1]
+        speaker = chunks[index]["speaker"] if 0 <= index < len(chunks) else None
+        computed_at, baseline = self._baselines.get(speaker, (None, None))
+        if computed_at is None or time.monotonic() - computed_at >= BASELINE_REFRESH_SECONDS:
+            baseline = speaker_baseline(chunks, speaker, config, exclude=index)
+            self._baselines[speaker] = (time.monotonic(), baseline)
+        issues = check_take(metrics, text, baseline, config)
+        qa = dict(metrics, issues=issues, attempt=attempt)
+        if baseline:
+            qa["baseline"] = baseline
+        retry = bool(issues) and attempt < config["max_retries"]
+        if issues:
+            outcome = "rendering it again" if retry else f"keeping it after {attempt + 1} takes"
+            print(f"QA flagged chunk {index} ({', '.join(issues)}): {outcome}")
+        return qa, retry
+
+    def record_take(self, index, text, metrics, attempt=0, **fields):
+        """Mark a chunk done with a new take and its QA result.
+
+        A take that fails QA is kept (better than nothing) and on_take_rejected
+        asks for another one, until qa.max_retries.
+        """
+        qa, retry = self.review_take(index, text, metrics, attempt)
+        # None when QA is off, so an older verdict does not outlive its take
+        self.set_chunk_fields(index, status="done", qa=qa, **fields)
+        if retry and self.on_take_rejected:
+            try:
+                self.on_take_rejected(index, attempt + 1)
+            except Exception as e:
+                print(f"Retake listener failed: {e}")
 
-            success = generate_voice(text, style, speaker, voice_config, temp_path, client)
+    def generate_chunk_audio(self, index, attempt=0):
+        """Render one chunk synchronously: TTS, then decode/normalize/encode inline."""
+        job, error = self.prepare_chunk_job(index, attempt)
+        if job is None:
+            return False, error
 
-            if success:
-                # Check file size
-                if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
-                     chunk["status"] = "error"
-                     self.save_chunks(chunks)
-                     return False, "Generated audio file is missing or empty"
+        try:
+            ok, error = self.synthesize_chunk(job)
+            if not ok:
+                return self.finish_chunk_job(job, error)
 
-                print(f"Generated WAV size: {os.path.getsize(temp_path)} bytes")
+            post_process(job, normalize_dbfs=self.normalize_dbfs)
+            return self.finish_chunk_job(job)
 
-                # Try to convert to mp3, fallback to wav if ffmpeg missing
-                filename_base = f"voiceline_{index+1:04d}_{sanitize_filename(speaker)}"
+        except Exception as e:
+            return self.finish_chunk_job(job, str(e))
 
-                try:
-                    segment = AudioSegment.from_wav(temp_path)
+    @profiled("merge_audio")
+    def merge_audio(self):
+        """Merge all rendered chunks into the final audiobook.
 
-                    if len(segment) == 0:
-                         chunk["status"] = "error"
-                         self.save_chunks(chunks)
-                         return False, "Generated audio has 0 duration"
+        The book is assembled from merge regions cached in build/merge/, so after
+        a small edit only the regions containing changed chunks are re-decoded.
+        """
+        chunks = self.load_chunks()
+        rendered = [
+            c for c in chunks
+            if c.get("audio_path") and os.path.exists(os.path.join(self.root_dir, c["audio_path"]))
+        ]
+        if not rendered:
+            return False, "No audio segments found"
 
-                    mp3_filename = f"{filename_base}.mp3"
-                    mp3_filepath = os.path.join(self.voicelines_dir, mp3_filename)
+        from pydub import AudioSegment
 
-                    # This might fail if ffmpeg is missing
-                    segment.export(mp3_filepath, format="mp3")
+        os.makedirs(self.merge_dir, exist_ok=True)
+        region_audio = []
+        region_nodes = []
+        reused = 0
 
-                    chunk["audio_path"] = f"voicelines/{mp3_filename}"
+        for region in split_regions(rendered):
+            key = region_key(region, self.root_dir)
+            path = os.path.join(self.merge_dir, f"region_{key}.wav")
 
-                except Exception as e:
-                    print(f"MP3 conversion failed (ffmpeg missing?): {e}")
-                    # Fallback: copy WAV
-                    wav_filename = f"{filename_base}.wav"
-                    wav_filepath = os.path.join(self.voicelines_dir, wav_filename)
-                    shutil.copy(temp_path, wav_filepath)
+            if os.path.exists(path):
+                with stage("merge.load_region"):
+                    segment = AudioSegment.from_file(path, format="wav")
+                speakers = [c["speaker"] for c in region]
+                reused += 1
+            else:
+                with stage("merge.build_region"):
+                    segment, speakers = self._build_region(region)
+                if segment is None:
+                    continue
+                tmp_path = path + ".tmp"
+                segment.export(tmp_path, format="wav")
+                os.replace(tmp_path, path)
+
+            region_audio.append((segment, speakers[0], speakers[-1]))
+            region_nodes.append({
+                "start": region[0]["id"],
+                "end": region[-1]["id"],
+                "key": key,
+                "path": os.path.relpath(path, self.root_dir),
+            })
 
-                    chunk["audio_path"] = f"voicelines/{wav_filename}"
+        if not region_audio:
+            return False, "No audio segments found"
 
-                chunk["status"] = "done"
-                self.save_chunks(chunks)
+        print(f"Merging {len(region_audio)} regions ({reused} unchanged)")
+        with stage("merge.concat"):
+            # Same pause rules across region seams as between the chunks inside them
+            segments, first_speakers, last_speakers = zip(*region_audio)
+            final_audio = combine_audio_with_pauses(segments, first_speakers, last_speakers=last_speakers)
 
-                # Cleanup
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+        written = export_audiobook(final_audio, self.root_dir, self.get_export_formats())
 
-                return True, chunk["audio_path"]
-            else:
-                chunk["status"] = "error"
-                self.save_chunks(chunks)
-                return False, "Generation failed"
+        self._prune_regions({node["path"] for node in region_nodes})
+        update_graph(self.root_dir, "merge", {"regions": region_nodes})
 
-        except Exception as e:
-            chunk["status"] = "error"
-            self.save_chunks(chunks)
-            return False, str(e)
+        return True, ", ".join(written)
 
-    def merge_audio(self):
-        chunks = self.load_chunks()
+    def _build_region(self, region):
+        from pydub import AudioSegment
         audio_segments = []
         speakers = []
-
-        for chunk in chunks:
-            path = chunk.get("audio_path")
-            if path:
-                full_path = os.path.join(self.root_dir, path)
-                if os.path.exists(full_path):
-                    try:
-                        # Auto-detect format (mp3 or wav)
-                        segment = AudioSegment.from_file(full_path)
-                        audio_segments.append(segment)
-                        speakers.append(chunk["speaker"])
-                    except Exception as e:
-                        print(f"Error loading audio segment {path}: {e}")
+        for chunk in region:
+            path = chunk["audio_path"]
+            try:
+                # Auto-detect format (mp3 or wav)
+                segment = AudioSegment.from_file(os.path.join(self.root_dir, path))
+                audio_segments.append(segment)
+                speakers.append(chunk["speaker"])
+            except Exception as e:
+                print(f"Error loading audio segment {path}: {e}")
 
         if not audio_segments:
-            return False, "No audio segments found"
-
-        final_audio = combine_audio_with_pauses(audio_segments, speakers)
-        output_filename = "cloned_audiobook.mp3"
-        output_path = os.path.join(self.root_dir, output_filename)
-        final_audio.export(output_path, format="mp3")
-
-        return True, output_filename
+            return None, []
+        return combine_audio_with_pauses(audio_segments, speakers), speakers
+
+    def _prune_regions(self, keep):
+        """Delete cached regions that are no longer part of the book."""
+        for name in os.listdir(self.merge_dir):
+            rel = os.path.relpath(os.path.join(self.merge_dir, name), self.root_dir)
+            if name.startswith("region_") and rel not in keep:
+                try:
+                    os.remove(os.path.join(self.merge_dir, name))
+                except OSError:
+                    pass
@@ -0,0 +1,118 @@
+import os
+import re
+import json
+import time
+import threading
+from project import ProjectManager
+
+DEFAULT_PROJECT = "default"
+PROJECTS_DIRNAME = "projects"
+PROJECT_FILENAME = "project.json"
+
+# The default project is the repository root (the original single-book layout).
+# Every other project is a directory projects/<id>/ with the same files
+# (annotated_script.json, chunks.json, voice_config.json, voicelines/, ...)
+# plus a project.json holding its display name. config.json stays app-wide:
+# all projects share the same LLM and TTS servers.
+
+def run_key(project_id, name):
+    """Task and progress run name of a project's stage: "script" for the
+    default project, "<id>/script" for the others."""
+    return name if project_id == DEFAULT_PROJECT else f"{project_id}/{name}"
+
+def split_run_key(key):
+    """Inverse of run_key: (project id, stage name)."""
+    project_id, _, name = key.rpartition("/")
+    return project_id or DEFAULT_PROJECT, name
+
+def slugify(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") or "project"
+
+class Project:
+    """One book: its directory, ProjectManager and (once set up) render queue."""
+
+    def __init__(self, project_id, root_dir, name, config_path, uploads_dir=None):
+        self.id = project_id
+        self.root_dir = root_dir
+        self.name = name
+        self.uploads_dir = uploads_dir or os.path.join(root_dir, "uploads")
+        self.manager = ProjectManager(root_dir, config_path)
+        self.render_queue = None
+
+    def path(self, filename):
+        return os.path.join(self.root_dir, filename)
+
+    def run_key(self, name):
+        return run_key(self.id, name)
+
+    def info(self):
+        return {"id": self.id, "name": self.name, "root_dir": self.root_dir}
+
+class ProjectRegistry:
+    """Projects known to this server, opened once and kept for its lifetime.
+
+    setup(project) is called for every project as it is opened (at startup
+    and on create) so the app can attach callbacks and a render queue.
+    """
+
+    def __init__(self, root_dir, config_path, default_uploads_dir=None, setup=None):
+        self.root_dir = root_dir
+        self.config_path = config_path
+        self.projects_dir = os.path.join(root_dir, PROJECTS_DIRNAME)
+        self.setup = setup
+        self._lock = threading.Lock()
+        self._projects = {}
+
+        self._open(Project(DEFAULT_PROJECT, root_dir, "Default", config_path, default_uploads_dir))
+        if os.path.isdir(self.projects_dir):
+            for project_id in sorted(os.listdir(self.projects_dir)):
+                meta = self._read_meta(project_id)
+                if meta is not None:
+                    self._open(Project(
+                        project_id, os.path.join(self.projects_dir, project_id),
+                        meta.get("name") or project_id, config_path
+                    ))
+
+    def _read_meta(self, project_id):
+        try:
+            with open(os.path.join(self.projects_dir, project_id, PROJECT_FILENAME), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _open(self, project):
+        with self._lock:
+            self._projects[project.id] = project
+        if self.setup:
+            self.setup(project)
+        return project
+
+    def get(self, project_id):
+        with self._lock:
+            return self._projects.get(project_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._projects.values())
+
+    def create(self, name):
+        """Create a project directory named after name and open it."""
+        name = name.strip()
+        if not name:
+            raise ValueError("Project name is required")
+        base = slugify(name)
+        with self._lock:
+            project_id = base
+            suffix = 2
+            while project_id in self._projects or project_id == DEFAULT_PROJECT \
+                    or os.path.exists(os.path.join(self.projects_dir, project_id)):
+                project_id = f"{base}-{suffix}"
+                suffix += 1
+            project_dir = os.path.join(self.projects_dir, project_id)
+            os.makedirs(project_dir)
+            path = os.path.join(project_dir, PROJECT_FILENAME)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"name": name, "created": time.time()}, f, indent=2)
+            os.replace(path + ".tmp", path)
+        print(f"Created project {project_id} in {project_dir}")
+        return self._open(Project(project_id, project_dir, name, self.config_path))
@@ -0,0 +1,286 @@
+import os
+import time
+import socket
+import threading
+import progress
+import tracing
+from lease_store import DEFAULT_LEASE_SECONDS
+from build_graph import chunk_render_hash
+from render_queue import PRIORITY_BATCH
+from tts import synthesize_voice, sanitize_filename
+from tts_client import get_manager
+from pipeline import post_process
+from take_qa import retake_voice
+
+POLL_INTERVAL = 1.0   # seconds between store polls when idle
+STORE_FILENAME = "render_farm.db"
+
+def default_store_path(root_dir):
+    return os.path.join(root_dir, STORE_FILENAME)
+
+class FarmWorker:
+    """Render loop that leases chunks from a LeaseStore.
+
+    Runs in worker.py on any machine that sees the project directory, or as
+    threads inside the app. Each job carries everything needed to render it
+    (text, style, the speaker's voice settings), so workers never read
+    chunks.json; they only write the voiceline file and report back.
+    """
+
+    def __init__(self, root_dir, store, tts_url, worker_id=None,
+                 lease_seconds=DEFAULT_LEASE_SECONDS, normalize_dbfs=None, format="mp3"):
+        self.root_dir = root_dir
+        self.store = store
+        self.tts_url = tts_url
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident() % 10000}"
+        self.lease_seconds = lease_seconds
+        self.normalize_dbfs = normalize_dbfs
+        self.format = format
+        self.voicelines_dir = os.path.join(root_dir, "voicelines")
+        self.current = None
+        os.makedirs(self.voicelines_dir, exist_ok=True)
+
+    def run(self, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        manager = get_manager(self.tts_url)
+        print(f"Worker {self.worker_id} rendering with TTS at {self.tts_url}")
+        try:
+            while not stop_event.is_set():
+                self.store.heartbeat(self.worker_id, self._info())
+                # Don't take work we can't do; the manager backs off reconnects
+                if manager.get() is None:
+                    stop_event.wait(POLL_INTERVAL * 5)
+                    continue
+                job = self.store.lease(self.worker_id, self.lease_seconds)
+                if job is None:
+                    stop_event.wait(POLL_INTERVAL)
+                    continue
+                self.render(job, manager)
+        finally:
+            if self.current is not None:
+                self.store.release(self.current, self.worker_id)
+
+    def _info(self):
+        return {"host": socket.gethostname(), "pid": os.getpid(), "tts_url": self.tts_url}
+
+    def render(self, job, manager):
+        index = job["index"]
+        self.current = index
+        self.store.heartbeat(self.worker_id, self._info(), current=index)
+        renewing = threading.Event()
+        threading.Thread(target=self._renew, args=(index, renewing), daemon=True).start()
+
+        start = time.perf_counter()
+        try:
+            with tracing.attach(job.get("trace")), \
+                    tracing.span("render_chunk", worker=self.worker_id, chunk=index):
+                voice_config = {job["speaker"]: job["voice"]} if job.get("voice") else {}
+                audio = synthesize_voice(job["text"], job["style"], job["speaker"], voice_config, manager.get())
+                if audio is None:
+                    manager.report_failure()
+                    raise RuntimeError("Generation failed")
+
+                render = {"audio": audio, "output_base": os.path.join(self.voicelines_dir, job["filename_base"])}
+                with tracing.span("post_process", chunk=index):
+                    post_process(render, normalize_dbfs=self.normalize_dbfs, format=self.format)
+            self.store.complete(index, self.worker_id, {
+                "audio_path": f"voicelines/{os.path.basename(render['output_path'])}",
+                "duration_ms": render["duration_ms"],
+                "qa_metrics": render.get("qa_metrics"),
+                "render_hash": job["render_hash"],
+                "worker": self.worker_id,
+            })
+            print(f"Chunk {index} rendered in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            print(f"Chunk {index} failed: {e}")
+            self.store.fail(index, self.worker_id, str(e))
+        finally:
+            renewing.set()
+            self.current = None
+
+    def _renew(self, index, done):
+        while not done.wait(self.lease_seconds / 3):
+            if not self.store.renew(index, self.worker_id, self.lease_seconds):
+                print(f"Lost the lease on chunk {index}; another worker may render it")
+                return
+
+class FarmQueue:
+    """RenderQueue replacement that hands chunks to render workers via a LeaseStore.
+
+    Offers the same enqueue/cancel/pause/status interface, so the app's render
+    endpoints work unchanged. A sync thread copies worker progress and results
+    back into chunks.json. A result is ignored if its chunk was edited after it
+    was queued (the render hash no longer matches).
+    """
+
+    def __init__(self, project_manager, store, local_workers=0, lease_seconds=DEFAULT_LEASE_SECONDS,
+                 name="render"):
+        self.project_manager = project_manager
+        self.name = name      # progress run name
+        self.store = store
+        self.local_workers = max(0, int(local_workers))
+        self.lease_seconds = lease_seconds
+        self.pipeline = None   # workers post-process inline
+        self.on_change = None
+        self._active = {}      # chunk index -> worker id
+        self._retakes = {}     # chunk index -> retake to queue after the next sync
+        self._stop = threading.Event()
+
+    def start(self):
+        self.project_manager.reset_stale_statuses()
+        threading.Thread(target=self._sync_loop, name="render-farm-sync", daemon=True).start()
+        pm = self.project_manager
+        for i in range(self.local_workers):
+            worker = FarmWorker(
+                pm.root_dir, self.store, pm.get_tts_url(),
+                worker_id=f"{socket.gethostname()}-app-{i}",
+                lease_seconds=self.lease_seconds, normalize_dbfs=pm.normalize_dbfs
+            )
+            threading.Thread(target=worker.run, args=(self._stop,), name=f"{self.name}-farm-{i}", daemon=True).start()
+
+    def enqueue(self, index, priority=PRIORITY_BATCH):
+        return self.enqueue_many([index], priority)
+
+    def enqueue_many(self, indices, priority=PRIORITY_BATCH, attempt=0):
+        pm = self.project_manager
+        chunks = pm.load_chunks()
+        voice_config = pm.load_voice_config()
+        # Workers continue the trace of the request that queued the chunk
+        trace = tracing.current()
+        jobs = []
+        for index in indices:
+            if not (0 <= index < len(chunks)):
+                continue
+            chunk = chunks[index]
+            voice = voice_config.get(chunk["speaker"])
+            jobs.append({
+                "index": index,
+                "speaker": chunk["speaker"],
+                "text": chunk["text"],
+                "style": chunk["style"],
+                "voice": retake_voice(voice, attempt) if voice else None,
+                "render_hash": chunk_render_hash(chunk, voice_config),
+                "filename_base": f"voiceline_{index+1:04d}_{sanitize_filename(chunk['speaker'])}",
+                "trace": trace,
+                "attempt": attempt,
+            })
+
+        accepted = self.store.enqueue(jobs, priority)
+        if accepted:
+            pm.set_chunk_statuses(accepted, "queued")
+            progress.track_batch(self.name, len(accepted), meta={
+                "mode": "farm",
+                "local_workers": self.local_workers,
+                "lease_seconds": self.lease_seconds,
+            })
+            self._notify()
+        return accepted
+
+    def cancel(self, indices=None):
+        cancelled = self.store.cancel(indices)
+        if cancelled:
+            self.project_manager.set_chunk_statuses(cancelled, "pending", only_from=("queued",))
+            tracker = progress.get(self.name)
+            if tracker is not None and tracker.finished is None:
+                tracker.add_total(-len(cancelled))
+            self._notify()
+        return cancelled
+
+    def retake(self, index, attempt):
+        """Queue another take of a chunk whose take failed QA (ProjectManager.on_take_rejected)."""
+        # Called from sync() while the finished job is still in the store
+        self._retakes[index] = attempt
+
+    def pause(self):
+        self.store.set_paused(True)
+        self._notify()
+
+    def resume(self):
+        self.store.set_paused(False)
+        self._notify()
+
+    def status(self):
+        farm = self.store.status()
+        return {
+            "workers": len(farm["workers"]),
+            "paused": self.store.is_paused(),
+            "queued": farm["jobs"].get("queued", 0),
+            "active": sorted(self._active),
+            "farm": farm,
+        }
+
+    def _notify(self):
+        if self.on_change:
+            try:
+                self.on_change(self.status())
+            except Exception as e:
+                print(f"Render queue listener failed: {e}")
+
+    def _sync_loop(self):
+        while not self._stop.wait(POLL_INTERVAL):
+            try:
+                if self.sync():
+                    self._notify()
+            except Exception as e:
+                print(f"Render farm sync failed: {e}")
+
+    def sync(self):
+        """Apply worker progress and results to chunks.json. Returns True if anything changed."""
+        pm = self.project_manager
+        changed = False
+
+        leased = self.store.leased()
+        started = [i for i in leased if i not in self._active]
+        if started:
+            pm.set_chunk_statuses(started, "generating", only_from=("queued", "pending"))
+        if set(leased) != set(self._active):
+            changed = True
+        self._active = leased
+
+        tracker = progress.get(self.name)
+        if tracker is not None and tracker.finished is not None:
+            tracker = None
+
+        finished = self.store.finished()
+        stale = {}
+        if finished:
+            chunks = pm.load_chunks()
+            voice_config = pm.load_voice_config()
+            for item in finished:
+                index = item["index"]
+                if not (0 <= index < len(chunks)):
+                    continue
+                current_hash = chunk_render_hash(chunks[index], voice_config)
+                if item["payload"]["render_hash"] != current_hash:
+                    print(f"Ignoring stale result for chunk {index} (edited since it was queued), rendering it again")
+                    stale[index] = item["priority"]
+                    if tracker:
+                        tracker.add_total(-1)
+                elif item["state"] == "done":
+                    result = item["result"]
+                    pm.record_take(
+                        index, item["payload"]["text"], result.get("qa_metrics"), item["payload"].get("attempt", 0),
+                        audio_path=result["audio_path"], duration_ms=result["duration_ms"],
+                        render_hash=result["render_hash"]
+                    )
+                    if tracker:
+                        tracker.advance(chars=len(item["payload"]["text"]), audio_ms=result["duration_ms"])
+                else:
+                    print(f"Chunk {index} failed: {item['result'].get('error')}")
+                    pm.set_chunk_fields(index, status="error")
+                    if tracker:
+                        tracker.advance(failed=True)
+            self.store.remove_finished(finished)
+            changed = True
+
+        # A chunk edited while it rendered needs a take of its current text
+        for index, priority in stale.items():
+            self.enqueue_many([index], priority)
+        retakes, self._retakes = self._retakes, {}
+        for index, attempt in retakes.items():
+            self.enqueue_many([index], PRIORITY_BATCH, attempt)
+
+        if tracker and not leased and not self.store.status()["jobs"].get("queued"):
+            tracker.finish()
+
+        return changed
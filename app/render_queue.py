@@ -0,0 +1,389 @@
+import time
+import heapq
+import itertools
+import threading
+import progress
+import tracing
+from concurrency import get_limiter, lower_priority
+
+# Lower numbers run first
+PRIORITY_EDIT = 0     # Single chunk re-rendered from the editor
+PRIORITY_BATCH = 10   # Bulk "Render All" jobs
+
+DEFAULT_WORKERS = 2
+
+class RenderPool:
+    """Render worker threads shared by the queues of several projects.
+
+    Scheduling is fair-share by characters: each queue counts the characters
+    it has been served, and a free worker takes the next job from the queue
+    with the lowest count (edit jobs from any project still go first). A small
+    book therefore keeps getting its share of TTS time while a huge book is
+    rendering. A queue that was idle rejoins at the current count, so idling
+    earns no credit to burst with later.
+
+    With an AudioPipeline, workers only wait on TTS and hand the audio to the
+    pipeline's post-processing stages, so the next synthesis starts while the
+    previous chunk is still being encoded.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, pipeline=None):
+        self.num_workers = max(1, int(workers))
+        self.pipeline = pipeline
+        self._queues = []
+        self._cond = threading.Condition()
+        self._clock = 0.0     # served count of the most recently scheduled queue
+        self._workers = []
+
+    def attach(self, render_queue):
+        with self._cond:
+            if render_queue not in self._queues:
+                render_queue.served = max(render_queue.served, self._clock)
+                self._queues.append(render_queue)
+            self._cond.notify_all()
+
+    def detach(self, render_queue):
+        with self._cond:
+            if render_queue in self._queues:
+                self._queues.remove(render_queue)
+
+    def start(self):
+        with self._cond:
+            if self._workers:
+                return
+            for i in range(self.num_workers):
+                t = threading.Thread(target=self._worker, name=f"render-worker-{i}", daemon=True)
+                t.start()
+                self._workers.append(t)
+
+    def wake(self, render_queue=None, was_idle=False):
+        """Tell workers that a queue has new (or resumed) work."""
+        with self._cond:
+            if render_queue is not None and was_idle:
+                render_queue.served = max(render_queue.served, self._clock)
+            self._cond.notify_all()
+
+    def status(self):
+        with self._cond:
+            queues = list(self._queues)
+        return {
+            "workers": self.num_workers,
+            "queues": [
+                {"name": q.name, "queued": len(q._queued), "active": len(q._active),
+                 "paused": not q._running.is_set(), "served_chars": round(q.served)}
+                for q in queues
+            ],
+        }
+
+    def _next_job(self):
+        while True:
+            # Workers beyond the adaptive TTS limit leave jobs queued, so a chunk
+            # edited meanwhile still jumps ahead of the bulk render
+            get_limiter("tts").wait_for_capacity()
+            with self._cond:
+                best = None
+                for q in self._queues:
+                    priority = q._head_priority()
+                    if priority is None:
+                        continue
+                    key = (priority, q.served)
+                    if best is None or key < best[0]:
+                        best = (key, q)
+                if best is None:
+                    self._cond.wait()
+                    continue
+                render_queue = best[1]
+                index = render_queue._take()
+                if index is None:
+                    continue
+                self._clock = render_queue.served
+                render_queue.served += render_queue._costs.pop(index, 1)
+            render_queue._notify()
+            return render_queue, index
+
+    def _worker(self):
+        lower_priority()
+        while True:
+            render_queue, index = self._next_job()
+            render_queue._render(index)
+
+class RenderQueue:
+    """Server-side chunk render queue of one project.
+
+    Jobs are keyed by chunk index. Re-enqueueing a chunk that is already queued
+    only bumps its priority, so an edited chunk jumps ahead of a bulk render.
+
+    Jobs are rendered by a RenderPool's workers, either a pool of its own or
+    one shared with other projects' queues. TTS calls go through the shared
+    adaptive limiter (concurrency.py); run at least as many workers as its
+    max_limit so it has room to grow.
+    """
+
+    def __init__(self, project_manager, workers=DEFAULT_WORKERS, pipeline=None, pool=None,
+                 name="render"):
+        self.project_manager = project_manager
+        self.name = name      # progress run name
+        self.pool = pool or RenderPool(workers, pipeline)
+        self._owns_pool = pool is None
+
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._queued = {}     # chunk index -> (priority, token) of its live heap entry
+        self._costs = {}      # chunk index -> characters, charged when a worker takes it
+        self._active = set()  # chunk indices currently rendering
+        self._traces = {}     # chunk index -> (traceparent, enqueue time) while tracing
+        self._attempts = {}   # chunk index -> retake number of its queued job (after failed QA)
+        self._retakes = {}    # active chunk index -> retake to queue once it is released
+        self._requeue = {}    # active chunk index -> priority it was queued at again while rendering
+        self._running = threading.Event()
+        self._running.set()
+        self.served = 0.0     # characters rendered so far, for the pool's fair share
+        # Optional callback(status_dict) fired whenever the queue changes
+        self.on_change = None
+
+    @property
+    def num_workers(self):
+        return self.pool.num_workers
+
+    @property
+    def pipeline(self):
+        return self.pool.pipeline
+
+    @pipeline.setter
+    def pipeline(self, pipeline):
+        self.pool.pipeline = pipeline
+
+    def start(self):
+        # Chunks marked queued/generating by a previous server run will never finish
+        self.project_manager.reset_stale_statuses()
+        self.pool.attach(self)
+        if self._owns_pool:
+            self.pool.start()
+
+    def enqueue(self, index, priority=PRIORITY_BATCH):
+        return self.enqueue_many([index], priority)
+
+    def enqueue_many(self, indices, priority=PRIORITY_BATCH, attempt=0):
+        """Queue chunks for rendering. Returns the indices that were (re)queued.
+
+        attempt > 0 queues a retake of chunks whose last take failed QA.
+        A chunk that is rendering right now (e.g. edited mid-render) is queued
+        again once its current take is done; it is not in the returned list.
+        """
+        chunks = self.project_manager.load_chunks()
+        trace = (tracing.current(), time.time()) if tracing.enabled() else None
+        accepted = []
+        with self._lock:
+            was_idle = not self._queued
+            for index in indices:
+                if index in self._active:
+                    if not attempt:
+                        self._requeue[index] = min(priority, self._requeue.get(index, priority))
+                    continue
+                current = self._queued.get(index)
+                if current and current[0] <= priority:
+                    continue
+                token = next(self._counter)
+                self._queued[index] = (priority, token)
+                self._costs[index] = len(chunks[index].get("text", "")) if 0 <= index < len(chunks) else 1
+                if trace is not None:
+                    self._traces[index] = trace
+                if attempt:
+                    self._attempts[index] = attempt
+                else:
+                    self._attempts.pop(index, None)
+                heapq.heappush(self._heap, (priority, token, index))
+                accepted.append(index)
+
+        if accepted:
+            self.project_manager.set_chunk_statuses(accepted, "queued")
+            # One progress run per batch of work, until the queue drains
+            progress.track_batch(self.name, len(accepted), meta=self._progress_meta())
+            self.pool.wake(self, was_idle)
+            self._notify()
+        return accepted
+
+    def cancel(self, indices=None):
+        """Drop queued jobs (all of them if indices is None). Running jobs finish."""
+        with self._lock:
+            if indices is None:
+                cancelled = list(self._queued)
+                self._requeue.clear()
+            else:
+                cancelled = [i for i in indices if i in self._queued]
+                for index in indices:
+                    self._requeue.pop(index, None)
+            for index in cancelled:
+                # The stale heap entry is skipped when it reaches the top
+                del self._queued[index]
+                self._costs.pop(index, None)
+                self._traces.pop(index, None)
+                self._attempts.pop(index, None)
+
+        if cancelled:
+            self.project_manager.set_chunk_statuses(cancelled, "pending", only_from=("queued",))
+            tracker = progress.get(self.name)
+            if tracker is not None and tracker.finished is None:
+                tracker.add_total(-len(cancelled))
+            self._check_drained()
+            self._notify()
+        return cancelled
+
+    def retake(self, index, attempt):
+        """Queue another take of a chunk whose take failed QA (ProjectManager.on_take_rejected)."""
+        with self._lock:
+            if index in self._active:
+                # Its job is still finishing; queued again in _release()
+                self._retakes[index] = attempt
+                return
+        self.enqueue_many([index], PRIORITY_BATCH, attempt)
+
+    def pause(self):
+        self._running.clear()
+        self._notify()
+
+    def resume(self):
+        self._running.set()
+        self.pool.wake()
+        self._notify()
+
+    def status(self):
+        with self._lock:
+            return {
+                "workers": self.num_workers,
+                "paused": not self._running.is_set(),
+                "queued": len(self._queued),
+                "active": sorted(self._active),
+            }
+
+    def _progress_meta(self):
+        return {
+            "mode": "local",
+            "workers": self.num_workers,
+            "tts_url": self.project_manager.get_tts_url(),
+            "pipeline": self.pipeline is not None,
+            "normalize_dbfs": self.project_manager.normalize_dbfs,
+        }
+
+    def _record(self, index, ok, job=None):
+        """Count a finished render in the open progress run."""
+        tracker = progress.get(self.name)
+        if tracker is None or tracker.finished is not None:
+            return
+        if job is None:
+            chunks = self.project_manager.load_chunks()
+            job = chunks[index] if 0 <= index < len(chunks) else {}
+        tracker.advance(chars=len(job.get("text", "")), audio_ms=job.get("duration_ms"), failed=not ok)
+
+    def _check_drained(self):
+        with self._lock:
+            drained = not self._queued and not self._active
+        tracker = progress.get(self.name)
+        if drained and tracker is not None and tracker.finished is None:
+            tracker.finish()
+
+    def _notify(self):
+        if self.on_change:
+            try:
+                self.on_change(self.status())
+            except Exception as e:
+                print(f"Render queue listener failed: {e}")
+
+    def _head_priority(self):
+        """Priority of the next live job, or None if paused or empty."""
+        if not self._running.is_set():
+            return None
+        with self._lock:
+            while self._heap:
+                priority, token, index = self._heap[0]
+                current = self._queued.get(index)
+                if current is not None and current[1] == token:
+                    return priority
+                heapq.heappop(self._heap)  # Cancelled or superseded by a higher priority entry
+        return None
+
+    def _take(self):
+        """Pop the next live job and mark it active (called by the pool)."""
+        with self._lock:
+            while self._heap:
+                priority, token, index = heapq.heappop(self._heap)
+                current = self._queued.get(index)
+                if current is None or current[1] != token:
+                    continue
+                del self._queued[index]
+                self._active.add(index)
+                return index
+        return None
+
+    def _render(self, index):
+        with self._lock:
+            parent, enqueued = self._traces.pop(index, None) or (None, None)
+            attempt = self._attempts.pop(index, 0)
+        # A child of the request that queued the chunk; post-processing spans
+        # on the pipeline threads hang off this one
+        with tracing.attach(parent), tracing.span("render_chunk", queue=self.name, chunk=index) as span:
+            if span is not None and enqueued is not None:
+                span.set("queued_ms", round((time.time() - enqueued) * 1000))
+            self._render_chunk(index, attempt)
+
+    def _render_chunk(self, index, attempt=0):
+        handed_off = False
+        try:
+            if self.pipeline is None:
+                success, msg = self.project_manager.generate_chunk_audio(index, attempt)
+                if not success:
+                    print(f"Chunk {index} failed: {msg}")
+                self._record(index, success)
+            else:
+                handed_off = self._fetch_and_hand_off(index, attempt)
+                if not handed_off:
+                    self._record(index, False)
+        except Exception as e:
+            print(f"Render worker error on chunk {index}: {e}")
+            self._record(index, False)
+        finally:
+            if not handed_off:
+                self._release(index)
+
+    def _fetch_and_hand_off(self, index, attempt=0):
+        pm = self.project_manager
+        job, error = pm.prepare_chunk_job(index, attempt)
+        if job is None:
+            print(f"Chunk {index} failed: {error}")
+            return False
+
+        try:
+            ok, error = pm.synthesize_chunk(job)
+        except Exception as e:
+            ok, error = False, str(e)
+        if not ok:
+            pm.finish_chunk_job(job, error)
+            print(f"Chunk {index} failed: {error}")
+            return False
+
+        job["on_done"] = self._on_post_processed
+        self.pipeline.submit_audio(job)
+        return True
+
+    def _on_post_processed(self, job, error):
+        try:
+            self.project_manager.finish_chunk_job(job, error)
+            if error:
+                print(f"Chunk {job['index']} failed: {error}")
+            self._record(job["index"], not error, job)
+        finally:
+            self._release(job["index"])
+
+    def _release(self, index):
+        with self._lock:
+            self._active.discard(index)
+            attempt = self._retakes.pop(index, None)
+            priority = self._requeue.pop(index, None)
+        if priority is not None:
+            # Queued again while rendering: the take just finished may be of old text
+            self.enqueue_many([index], priority)
+        elif attempt is not None:
+            self.enqueue_many([index], PRIORITY_BATCH, attempt)
+        self._check_drained()
+        self._notify()
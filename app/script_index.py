@@ -0,0 +1,194 @@
+import os
+import json
+import re
+import tracing
+
+INDEX_FILENAME = "script_index.json"
+SCRIPT_FILENAME = "annotated_script.json"
+CHARS_PER_SECOND = 15   # speaking rate used to estimate chunks that are not rendered yet
+
+# script_index.json is a sidecar of annotated_script.json and chunks.json:
+#   entries   per script entry: speaker, chars, source offset, chunk id
+#   speakers  per speaker: entry ids, chunk ids, chars, rendered/estimated duration
+# It records the script file's (size, mtime_ns) and the chunks version it was
+# built from; refresh_index() rebuilds it when either moved on, so voice
+# listing and per-speaker lookups never rescan the script.
+
+def index_path(root_dir):
+    return os.path.join(root_dir, INDEX_FILENAME)
+
+def script_stat(root_dir):
+    try:
+        st = os.stat(os.path.join(root_dir, SCRIPT_FILENAME))
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def load_index(root_dir):
+    try:
+        with open(index_path(root_dir), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_index(root_dir, index):
+    path = index_path(root_dir)
+    tmp = path + ".tmp"
+    with tracing.span("script_index.save"), open(tmp, "w", encoding="utf-8") as f:
+        # One write: json.dump() streams thousands of small writes
+        f.write(json.dumps(index))
+    os.replace(tmp, path)
+
+def locate_entries(source_text, llm_chunks, entries):
+    """Best-effort source offset of every entry.
+
+    Each entry is searched for, by its first words, inside the span of the LLM
+    chunk it came from, moving forward as entries are found. Entries the model
+    reworded too much to find get the position of the previous match (or their
+    chunk's start); entries of chunks that couldn't be located get None.
+    """
+    offsets = [None] * len(entries)
+    for node in llm_chunks:
+        base = node.get("offset")
+        if base is None:
+            continue
+        end = base + node.get("length", 0)
+        cursor = base
+        for i in range(node["entry_start"], min(node["entry_end"], len(entries))):
+            entry = entries[i]
+            text = str(entry.get("text", "")) if isinstance(entry, dict) else ""
+            words = re.findall(r"\w+", re.sub(r'\[[^\]]*\]', ' ', text))[:4]
+            found = -1
+            if words:
+                pattern = r"\W+".join(re.escape(w) for w in words)
+                match = re.compile(pattern, re.IGNORECASE).search(source_text, cursor, end)
+                if match:
+                    found = match.start()
+            if found != -1:
+                cursor = found
+            offsets[i] = cursor
+    return offsets
+
+def entry_records(entries, offsets=None):
+    """Per-entry speaker, length and source offset: all the index needs from the script."""
+    records = []
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            entry = {}
+        records.append({
+            "speaker": str(entry.get("speaker", "")).strip(),
+            "chars": len(str(entry.get("text", ""))),
+            "offset": offsets[i] if offsets and i < len(offsets) else None,
+        })
+    return records
+
+def build_index(records, chunks, stat=None, chunks_version=None):
+    """Build the index dict from entry records and chunks.
+
+    Chunk membership comes from each chunk's "entries" [start, end) range;
+    duration is the rendered duration_ms where a chunk has audio, otherwise an
+    estimate from its length.
+    """
+    entry_chunk = [None] * len(records)
+    for chunk in chunks:
+        span = chunk.get("entries")
+        if span:
+            for i in range(span[0], min(span[1], len(records))):
+                entry_chunk[i] = chunk["id"]
+
+    speakers = {}
+
+    def speaker_stats(name):
+        if name not in speakers:
+            speakers[name] = {
+                "entries": [], "chunks": [], "chars": 0,
+                "rendered_chunks": 0, "rendered_ms": 0, "estimated_ms": 0,
+            }
+        return speakers[name]
+
+    index_entries = []
+    for i, record in enumerate(records):
+        index_entries.append({
+            "speaker": record["speaker"],
+            "chars": record["chars"],
+            "offset": record.get("offset"),
+            "chunk": entry_chunk[i],
+        })
+        if record["speaker"]:
+            stats = speaker_stats(record["speaker"])
+            stats["entries"].append(i)
+            stats["chars"] += record["chars"]
+
+    for chunk in chunks:
+        speaker = str(chunk.get("speaker", "")).strip()
+        if not speaker:
+            continue
+        stats = speaker_stats(speaker)
+        stats["chunks"].append(chunk["id"])
+        if chunk.get("status") == "done" and chunk.get("duration_ms"):
+            stats["rendered_chunks"] += 1
+            stats["rendered_ms"] += chunk["duration_ms"]
+            stats["estimated_ms"] += chunk["duration_ms"]
+        else:
+            stats["estimated_ms"] += round(len(chunk.get("text", "")) / CHARS_PER_SECOND * 1000)
+
+    return {
+        "script_stat": stat,
+        "chunks_version": chunks_version,
+        "entries": index_entries,
+        "speakers": dict(sorted(speakers.items())),
+    }
+
+def refresh_index(root_dir, chunks, chunks_version=None, entries=None, offsets=None, index=None, save=True):
+    """Return an up-to-date index, rebuilding and saving it only if it is stale.
+
+    While the script file is unchanged, a rebuild (after chunk changes) reuses
+    the index's own entry records instead of re-reading the script. Pass the
+    script entries (and source offsets, which only generate_script can compute)
+    right after writing a new script. chunks=None accepts whatever chunk data
+    the index already has (for callers that only need speakers) and carries it
+    over if the entries are rebuilt. index is the
+    caller's in-memory copy, if any, to save re-reading the file while the
+    script is unchanged. save=False keeps a rebuilt index in memory only.
+    """
+    stat = script_stat(root_dir)
+    if index is None or index.get("script_stat") != stat:
+        index = load_index(root_dir)
+    same_script = bool(index) and index.get("script_stat") == stat
+    if entries is None and same_script and (chunks is None or index.get("chunks_version") == chunks_version):
+        return index
+
+    if entries is not None:
+        records = entry_records(entries, offsets)
+    elif same_script:
+        records = index.get("entries", [])
+    elif stat is not None:
+        with open(os.path.join(root_dir, SCRIPT_FILENAME), "r", encoding="utf-8") as f:
+            records = entry_records(json.load(f))
+    else:
+        return None
+
+    if chunks is None:
+        previous = index
+        index = build_index(records, [], stat)
+        if previous:
+            _keep_chunk_data(index, previous)
+    else:
+        index = build_index(records, chunks, stat, chunks_version)
+    if save:
+        save_index(root_dir, index)
+    return index
+
+def _keep_chunk_data(index, previous):
+    """Copy chunk membership and durations from the index being replaced."""
+    index["chunks_version"] = previous.get("chunks_version")
+    for entry, old in zip(index["entries"], previous.get("entries", [])):
+        entry["chunk"] = old.get("chunk")
+    old_speakers = previous.get("speakers", {})
+    for name, stats in index["speakers"].items():
+        if name in old_speakers:
+            for key in ("chunks", "rendered_chunks", "rendered_ms", "estimated_ms"):
+                stats[key] = old_speakers[name].get(key, stats[key])
+
+def speaker_names(index):
+    return list(index.get("speakers", {})) if index else []
@@ -0,0 +1,140 @@
+import io
+import math
+import wave
+
+# Automatic QA of rendered takes. Every take is measured once, before
+# normalization, in the pipeline's decode step (measure_take). The chunk's
+# text and its speaker's other takes then decide whether it is usable
+# (check_take). Failing takes are kept, flagged in chunk["qa"]["issues"], and
+# rendered again up to max_retries times. Every limit below can be
+# overridden in the "qa" section of config.json.
+QA_DEFAULTS = {
+    "enabled": True,
+    "max_retries": 2,
+    "min_text_chars": 15,         # shorter lines say too little about speaking rate
+    "min_ms_per_char": 25,        # faster than anyone reads: the take was cut off
+    "max_ms_per_char": 250,       # the model kept going, or mostly paused
+    "max_rate_deviation": 1.8,    # times faster or slower than the speaker's median
+    "max_silence": 0.6,           # share of 20 ms frames below silence_dbfs
+    "silence_dbfs": -45.0,
+    "max_clipped": 0.001,         # share of samples at full scale
+    "max_level_deviation_db": 12.0,  # voiced RMS against the speaker's median
+    "baseline_takes": 5,          # good takes needed before comparing against the speaker
+}
+
+FRAME_MS = 20
+CLIP_LEVEL = 0.999
+
+def _samples(audio):
+    """Decode a take into float samples in [-1, 1], shape (frames, channels), and its frame rate."""
+    import numpy as np
+    try:
+        with wave.open(io.BytesIO(audio), "rb") as w:
+            channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+            raw = w.readframes(w.getnframes())
+    except (wave.Error, EOFError):
+        # Not a plain PCM WAV; let pydub/ffmpeg decode it
+        from pydub import AudioSegment
+        segment = AudioSegment.from_file(io.BytesIO(audio))
+        channels, width, rate = segment.channels, segment.sample_width, segment.frame_rate
+        raw = segment.raw_data
+
+    if width == 1:
+        data = (np.frombuffer(raw, np.uint8).astype(np.float32) - 128) / 128
+    elif width == 3:
+        b = np.frombuffer(raw[:len(raw) // 3 * 3], np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        data = (np.where(ints & 0x800000, ints - 0x1000000, ints) / float(1 << 23)).astype(np.float32)
+    else:
+        dtype = {2: np.int16, 4: np.int32}[width]
+        data = np.frombuffer(raw[:len(raw) // width * width], dtype).astype(np.float32) / float(1 << (8 * width - 1))
+    frames = len(data) // channels
+    return data[:frames * channels].reshape(frames, channels), rate
+
+def measure_take(audio, silence_dbfs=QA_DEFAULTS["silence_dbfs"]):
+    """Duration, silence share, clipped share and voiced loudness of a take (WAV bytes)."""
+    import numpy as np
+    samples, rate = _samples(audio)
+    if not len(samples):
+        return {"duration_ms": 0, "silence": 1.0, "clipped": 0.0, "rms_dbfs": None, "peak_dbfs": None}
+
+    mono = samples.mean(axis=1)
+    frame = max(1, rate * FRAME_MS // 1000)
+    count = max(1, len(mono) // frame)
+    frames = mono[:count * frame].reshape(count, -1) if len(mono) >= frame else mono.reshape(1, -1)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    voiced = rms >= 10 ** (silence_dbfs / 20)
+    peak = float(np.max(np.abs(samples)))
+
+    level = None
+    if voiced.any():
+        level = round(20 * math.log10(math.sqrt(float(np.mean(np.square(rms[voiced]))))), 1)
+    return {
+        "duration_ms": round(len(samples) * 1000 / rate),
+        "silence": round(1 - float(voiced.mean()), 3),
+        "clipped": round(float(np.mean(np.abs(samples) >= CLIP_LEVEL)), 5),
+        "rms_dbfs": level,
+        "peak_dbfs": round(20 * math.log10(peak), 1) if peak > 0 else None,
+    }
+
+def _speech_chars(text):
+    return len((text or "").strip())
+
+def speaker_baseline(chunks, speaker, limits=QA_DEFAULTS, exclude=None):
+    """Median speaking rate (ms per character) and loudness of a speaker's good takes.
+
+    None until the speaker has limits["baseline_takes"] takes that passed QA.
+    """
+    import numpy as np
+    durations, chars, levels = [], [], []
+    for chunk in chunks:
+        qa = chunk.get("qa")
+        if (chunk.get("speaker") != speaker or chunk.get("id") == exclude or chunk.get("status") != "done"
+                or not qa or qa.get("issues")):
+            continue
+        n = _speech_chars(chunk.get("text"))
+        if n >= limits["min_text_chars"] and qa.get("duration_ms"):
+            durations.append(qa["duration_ms"])
+            chars.append(n)
+        if qa.get("rms_dbfs") is not None:
+            levels.append(qa["rms_dbfs"])
+    if len(durations) < limits["baseline_takes"]:
+        return None
+    return {
+        "ms_per_char": round(float(np.median(np.array(durations) / np.array(chars))), 1),
+        "rms_dbfs": round(float(np.median(levels)), 1) if len(levels) >= limits["baseline_takes"] else None,
+        "takes": len(durations),
+    }
+
+def check_take(metrics, text, baseline=None, limits=QA_DEFAULTS):
+    """Issues found in a measured take: too_short, too_long, silent, clipping, loudness."""
+    issues = []
+    chars = _speech_chars(text)
+    if chars >= limits["min_text_chars"]:
+        rate = metrics["duration_ms"] / chars
+        low, high = limits["min_ms_per_char"], limits["max_ms_per_char"]
+        if baseline:
+            low = max(low, baseline["ms_per_char"] / limits["max_rate_deviation"])
+            high = min(high, baseline["ms_per_char"] * limits["max_rate_deviation"])
+        if rate < low:
+            issues.append("too_short")
+        elif rate > high:
+            issues.append("too_long")
+    if metrics["silence"] > limits["max_silence"] or metrics["rms_dbfs"] is None:
+        issues.append("silent")
+    if metrics["clipped"] > limits["max_clipped"]:
+        issues.append("clipping")
+    if (baseline and baseline.get("rms_dbfs") is not None and metrics["rms_dbfs"] is not None
+            and abs(metrics["rms_dbfs"] - baseline["rms_dbfs"]) > limits["max_level_deviation_db"]):
+        issues.append("loudness")
+    return issues
+
+def retake_voice(voice_data, attempt):
+    """Voice settings for the attempt-th retake: a voice with a fixed seed would repeat the bad take."""
+    try:
+        seed = int(voice_data.get("seed", -1))
+    except (TypeError, ValueError):
+        seed = -1
+    if not attempt or seed < 0:
+        return voice_data
+    return dict(voice_data, seed=str(seed + attempt))
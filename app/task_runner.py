@@ -0,0 +1,206 @@
+import io
+import sys
+import threading
+import traceback
+from collections import deque
+import progress
+import tracing
+
+MAX_LOG_LINES = 1000
+
+class LogBuffer:
+    """Fixed-size ring buffer of log lines addressed by an absolute cursor.
+
+    The cursor counts every line ever appended, so a reader that passes back the
+    cursor it was given only receives lines it has not seen. Lines that fell
+    out of the buffer are skipped.
+    """
+
+    def __init__(self, maxlen=MAX_LOG_LINES):
+        self._lines = deque(maxlen=maxlen)
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def append(self, line):
+        with self._lock:
+            self._lines.append(line)
+            self._total += 1
+
+    def clear(self):
+        with self._lock:
+            self._lines.clear()
+
+    def read(self, cursor=0):
+        """Return (lines after cursor, next cursor)."""
+        with self._lock:
+            first = self._total - len(self._lines)
+            start = max(cursor, first) - first
+            return list(self._lines)[start:], self._total
+
+    def lines(self):
+        with self._lock:
+            return list(self._lines)
+
+class _TaskStdout(io.TextIOBase):
+    """sys.stdout replacement that routes writes from task threads to their log."""
+
+    def __init__(self, fallback):
+        self._fallback = fallback
+        self._local = threading.local()
+
+    def bind(self, sink):
+        self._local.sink = sink
+        self._local.partial = ""
+
+    def unbind(self):
+        partial = getattr(self._local, "partial", "")
+        sink = getattr(self._local, "sink", None)
+        if sink and partial.strip():
+            sink(partial.strip())
+        self._local.sink = None
+        self._local.partial = ""
+
+    def write(self, text):
+        sink = getattr(self._local, "sink", None)
+        if sink is None:
+            return self._fallback.write(text)
+
+        data = self._local.partial + text
+        *complete, self._local.partial = data.split("\n")
+        for line in complete:
+            line = line.strip()
+            if line:
+                sink(line)
+        return len(text)
+
+    def flush(self):
+        if getattr(self._local, "sink", None) is None:
+            self._fallback.flush()
+
+    @property
+    def encoding(self):
+        return getattr(self._fallback, "encoding", "utf-8")
+
+    def isatty(self):
+        return False
+
+_stdout_lock = threading.Lock()
+_task_stdout = None
+
+def _install_stdout():
+    global _task_stdout
+    with _stdout_lock:
+        if _task_stdout is None:
+            _task_stdout = _TaskStdout(sys.stdout)
+            sys.stdout = _task_stdout
+    return _task_stdout
+
+def current_log_sink():
+    """Log sink bound to the calling thread (None outside a task).
+
+    Helper threads started by a task call bind_log_sink() with this value so
+    their output lands in the same task log.
+    """
+    if _task_stdout is None:
+        return None
+    return getattr(_task_stdout._local, "sink", None)
+
+def bind_log_sink(sink):
+    if sink is not None:
+        _install_stdout().bind(sink)
+
+class TaskRunner:
+    """Run pipeline stages in-process on persistent threads instead of subprocesses.
+
+    Each task name has one log buffer and runs at most one job at a time. Output
+    printed by the job (including from library code) is captured line by line.
+    Modules and clients stay loaded and warm between runs.
+    """
+
+    def __init__(self, task_names, on_log=None, on_status=None):
+        self.on_log = on_log
+        self.on_status = on_status
+        self._lock = threading.Lock()
+        self._state = {name: {"running": False, "logs": LogBuffer()} for name in task_names}
+
+    def add(self, task_name):
+        """Register another task name (e.g. for a newly opened project)."""
+        with self._lock:
+            self._state.setdefault(task_name, {"running": False, "logs": LogBuffer()})
+
+    def __contains__(self, task_name):
+        return task_name in self._state
+
+    def is_running(self, task_name):
+        return self._state[task_name]["running"]
+
+    def log(self, task_name, line):
+        self._state[task_name]["logs"].append(line)
+        if self.on_log:
+            self.on_log(task_name, line)
+
+    def begin(self, task_name):
+        """Mark a task as running. Returns False if it already is."""
+        with self._lock:
+            state = self._state[task_name]
+            if state["running"]:
+                return False
+            state["running"] = True
+            state["logs"].clear()
+        if self.on_status:
+            self.on_status(task_name, True)
+        return True
+
+    def end(self, task_name):
+        self._state[task_name]["running"] = False
+        if self.on_status:
+            self.on_status(task_name, False)
+
+    def start(self, task_name, func, *args, **kwargs):
+        """Run func(*args, **kwargs) on a background thread. Returns False if busy."""
+        if not self.begin(task_name):
+            return False
+        # The task's spans continue the trace of the request that started it
+        t = threading.Thread(
+            target=self._run, args=(task_name, func, args, kwargs, tracing.current()),
+            name=f"task-{task_name}", daemon=True
+        )
+        t.start()
+        return True
+
+    def _run(self, task_name, func, args, kwargs, trace=None):
+        stdout = _install_stdout()
+        stdout.bind(lambda line: self.log(task_name, line))
+        return_code = 0
+        try:
+            with tracing.attach(trace), tracing.span("task", task=task_name):
+                result = func(*args, **kwargs)
+            if isinstance(result, int):
+                return_code = result
+        except SystemExit as e:
+            # Pipeline scripts signal failure with sys.exit(1)
+            return_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception as e:
+            print(f"Error: {e}")
+            for line in traceback.format_exc().splitlines():
+                print(line)
+            return_code = 1
+        finally:
+            stdout.unbind()
+
+        # Close a progress run the task started but did not finish (e.g. sys.exit)
+        tracker = progress.get(task_name)
+        if tracker is not None and tracker.finished is None:
+            tracker.finish("completed" if return_code == 0 else "failed")
+
+        if return_code == 0:
+            self.log(task_name, f"Task {task_name} completed successfully.")
+        else:
+            self.log(task_name, f"Task {task_name} failed with return code {return_code}.")
+        self.end(task_name)
+
+    def status(self, task_name, cursor=None):
+        """Task state; with a cursor only lines after it are returned."""
+        state = self._state[task_name]
+        lines, next_cursor = state["logs"].read(cursor or 0)
+        return {"running": state["running"], "logs": lines, "cursor": next_cursor}
@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import contextvars
+from contextlib import contextmanager
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BASE_DIR)
+TRACES_DIR = os.path.join(ROOT_DIR, "traces")
+
+TRACE_ENV = "ALEXANDRIA_TRACE"       # "1" (default file) or the trace file path
+TRACEPARENT_ENV = "TRACEPARENT"      # W3C trace context, as OpenTelemetry passes it to processes
+SERVICE_NAME = "alexandria"
+MAX_ATTRIBUTE_CHARS = 200
+
+# Tracing is opt-in: set ALEXANDRIA_TRACE=1 (or a file path), or "tracing":
+# {"enabled": true} in config.json for the server. Every finished span is
+# appended to traces/trace-<date>.jsonl as one OTLP/JSON export request per
+# line, the OpenTelemetry Collector file exporter format (its otlpjsonfile
+# receiver forwards it to Jaeger, Tempo, ...). To look at it directly:
+#   python app/tracing.py traces/trace-20260101.jsonl              self time per span name
+#   python app/tracing.py traces/trace-20260101.jsonl --chrome t.json   open in ui.perfetto.dev
+# Child processes get the file and the current span through the environment
+# (ALEXANDRIA_TRACE, TRACEPARENT), so their spans land in the same trace.
+# span() costs nothing while tracing is off.
+
+_current = contextvars.ContextVar("trace_span", default=None)   # (trace id, span id)
+_process_parent = None   # TRACEPARENT this process was started with
+_path = None
+_file = None
+_lock = threading.Lock()
+
+def default_path():
+    return os.path.join(TRACES_DIR, time.strftime("trace-%Y%m%d.jsonl"))
+
+def enable(path=None):
+    """Start appending spans to path (default: today's file in traces/)."""
+    global _path, _file
+    path = os.path.abspath(path or default_path())
+    with _lock:
+        if path == _path:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if _file is not None:
+            _file.close()
+        _file = open(path, "a", encoding="utf-8")
+        _path = path
+    print(f"Tracing to {path}")
+
+def enabled():
+    return _file is not None
+
+class Span:
+    def __init__(self, trace_id, span_id, parent_id, name, attributes):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+@contextmanager
+def span(name, **attributes):
+    """Time a block as a span, child of the current one (yields None while tracing is off)."""
+    if _file is None:
+        yield None
+        return
+    parent = _current.get() or _process_parent
+    trace_id = parent[0] if parent else os.urandom(16).hex()
+    s = Span(trace_id, os.urandom(8).hex(), parent[1] if parent else None, name, attributes)
+    s.attributes["thread.name"] = threading.current_thread().name
+    token = _current.set((trace_id, s.span_id))
+    try:
+        yield s
+    except Exception as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        s.end_ns = time.time_ns()
+        _write(s)
+
+def current():
+    """traceparent of the current span, to carry it to another thread or process (None if none)."""
+    if _file is None:
+        return None
+    context = _current.get() or _process_parent
+    return f"00-{context[0]}-{context[1]}-01" if context else None
+
+def _parse(traceparent):
+    parts = (traceparent or "").split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+@contextmanager
+def attach(traceparent):
+    """Make spans in this block children of traceparent (from current() elsewhere).
+
+    Threads do not inherit the current span; helper threads and queued jobs
+    carry current() along, like the task log sink.
+    """
+    context = _parse(traceparent) if _file is not None else None
+    if context is None:
+        yield
+        return
+    token = _current.set(context)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+def subprocess_env():
+    """Environment for a child process that continues the current trace (None: inherit as is)."""
+    if _file is None:
+        return None
+    env = dict(os.environ)
+    env[TRACE_ENV] = _path
+    parent = current()
+    if parent:
+        env[TRACEPARENT_ENV] = parent
+    return env
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        encoded = {"boolValue": value}
+    elif isinstance(value, int):
+        encoded = {"intValue": str(value)}
+    elif isinstance(value, float):
+        encoded = {"doubleValue": value}
+    else:
+        encoded = {"stringValue": str(value)[:MAX_ATTRIBUTE_CHARS]}
+    return {"key": key, "value": encoded}
+
+def _write(s):
+    record = {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "parentSpanId": s.parent_id or "",
+        "name": s.name,
+        "kind": 1,
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns),
+        "attributes": [_attribute(k, v) for k, v in s.attributes.items() if v is not None],
+        "status": {"code": 2, "message": s.error} if s.error else {},
+    }
+    line = json.dumps({"resourceSpans": [{
+        "resource": {"attributes": [
+            _attribute("service.name", SERVICE_NAME),
+            _attribute("process.pid", os.getpid()),
+            _attribute("process.command", os.path.basename(sys.argv[0]) if sys.argv else ""),
+        ]},
+        "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": [record]}],
+    }]})
+    with _lock:
+        if _file is not None:
+            # One write per line: other processes append to the same file
+            _file.write(line + "\n")
+            _file.flush()
+
+def _configure_from_env():
+    global _process_parent
+    value = os.environ.get(TRACE_ENV, "")
+    if value.lower() in ("", "0", "false", "no", "off"):
+        return
+    enable(None if value.lower() in ("1", "true", "yes", "on") else value)
+    _process_parent = _parse(os.environ.get(TRACEPARENT_ENV))
+
+_configure_from_env()
+
+# --- Reading trace files ---
+
+def _value(encoded):
+    for kind in ("stringValue", "intValue", "doubleValue", "boolValue"):
+        if kind in encoded:
+            return int(encoded[kind]) if kind == "intValue" else encoded[kind]
+    return None
+
+def load_spans(path):
+    """Flatten a trace file into dicts with the resource (pid, command) merged in."""
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource_spans in json.loads(line).get("resourceSpans", []):
+                resource = {a["key"]: _value(a["value"]) for a in resource_spans.get("resource", {}).get("attributes", [])}
+                for scope in resource_spans.get("scopeSpans", []):
+                    for record in scope.get("spans", []):
+                        spans.append({
+                            "trace_id": record["traceId"],
+                            "span_id": record["spanId"],
+                            "parent_id": record.get("parentSpanId") or None,
+                            "name": record["name"],
+                            "start_ns": int(record["startTimeUnixNano"]),
+                            "end_ns": int(record["endTimeUnixNano"]),
+                            "attributes": {a["key"]: _value(a["value"]) for a in record.get("attributes", [])},
+                            "error": record.get("status", {}).get("message"),
+                            "pid": resource.get("process.pid"),
+                            "command": resource.get("process.command"),
+                        })
+    return spans
+
+def summarize(spans, top=15):
+    """Where time goes: per span name, total and self time (minus child spans)."""
+    child_ns = {}
+    for s in spans:
+        if s["parent_id"]:
+            child_ns[s["parent_id"]] = child_ns.get(s["parent_id"], 0) + s["end_ns"] - s["start_ns"]
+    by_name = {}
+    for s in spans:
+        duration = s["end_ns"] - s["start_ns"]
+        entry = by_name.setdefault(s["name"], {"count": 0, "total_ms": 0.0, "self_ms": 0.0, "max_ms": 0.0, "errors": 0})
+        entry["count"] += 1
+        entry["total_ms"] += duration / 1e6
+        entry["self_ms"] += max(0, duration - child_ns.get(s["span_id"], 0)) / 1e6
+        entry["max_ms"] = max(entry["max_ms"], duration / 1e6)
+        entry["errors"] += 1 if s["error"] else 0
+    rows = sorted(by_name.items(), key=lambda kv: -kv[1]["self_ms"])[:top]
+    return [{"name": name, **{k: round(v, 1) if isinstance(v, float) else v for k, v in e.items()}} for name, e in rows]
+
+def to_chrome(spans):
+    """Chrome trace event JSON (Perfetto, chrome://tracing): one lane per process thread."""
+    events = []
+    threads = {}
+    for s in spans:
+        key = (s["pid"], s["attributes"].get("thread.name", ""))
+        if key not in threads:
+            threads[key] = len(threads) + 1
+            events.append({"name": "thread_name", "ph": "M", "pid": s["pid"], "tid": threads[key],
+                           "args": {"name": key[1]}})
+        args = dict(s["attributes"], trace_id=s["trace_id"], span_id=s["span_id"], parent_id=s["parent_id"])
+        if s["error"]:
+            args["error"] = s["error"]
+        events.append({
+            "name": s["name"], "ph": "X", "pid": s["pid"], "tid": threads[key],
+            "ts": s["start_ns"] / 1000, "dur": (s["end_ns"] - s["start_ns"]) / 1000, "args": args,
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize or convert an Alexandria trace file")
+    parser.add_argument("path", help="trace .jsonl file (see traces/)")
+    parser.add_argument("--chrome", metavar="OUT", help="write a Chrome trace JSON for ui.perfetto.dev")
+    parser.add_argument("--top", type=int, default=15, help="span names to list")
+    args = parser.parse_args(argv)
+
+    spans = load_spans(args.path)
+    if args.chrome:
+        with open(args.chrome, "w", encoding="utf-8") as f:
+            json.dump(to_chrome(spans), f)
+        print(f"Wrote {len(spans)} spans to {args.chrome}")
+        return 0
+
+    traces = len({s["trace_id"] for s in spans})
+    print(f"{len(spans)} spans in {traces} traces\n")
+    print(f"{'span':<32} {'count':>7} {'total ms':>11} {'self ms':>11} {'max ms':>9} {'errors':>7}")
+    for row in summarize(spans, args.top):
+        print(f"{row['name'][:32]:<32} {row['count']:>7} {row['total_ms']:>11.1f} {row['self_ms']:>11.1f} "
+              f"{row['max_ms']:>9.1f} {row['errors']:>7}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,18 @@
+import io
 import os
 import re
 import json
-from pydub import AudioSegment
-from gradio_client import Client, handle_file
+import wave
 import shutil
+import functools
+import subprocess
+from tts_client import get_manager
+from concurrency import get_limiter
+import tracing
+
+# pydub, gradio_client and requests are imported inside the functions that need
+# them: text-only callers (parse_voices, chunking, the web app at boot) never pay
+# for loading them.
 
 DEFAULT_PAUSE_MS = 500  # Pause between different speakers
 SAME_SPEAKER_PAUSE_MS = 250  # Shorter pause for same speaker continuing
@@ -116,7 +125,7 @@ def preprocess_text_for_tts(text):
 
     return processed, nonverbal_style
 
-def test_tts_connection(tts_url, voice_config):
+def test_tts_connection(tts_url, voice_config, client=None):
     """Test the TTS connection with the first configured voice"""
     print(f"Testing TTS connection to {tts_url}...")
 
@@ -133,7 +142,10 @@ def test_tts_connection(tts_url, voice_config):
     print(f"  Seed: {seed}")
 
     try:
-        client = Client(tts_url)
+        if client is None:
+            client = get_manager(tts_url).get()
+            if client is None:
+                raise ConnectionError(f"Could not connect to {tts_url}")
 
         result = client.predict(
             text="Testing, one two three.",
@@ -144,7 +156,8 @@ def test_tts_connection(tts_url, voice_config):
             seed=seed,
             api_name="/generate_custom_voice"
         )
-        print(f"  Test successful! Output: {result[0]}")
+        audio = read_generated_audio(result[0], client)
+        print(f"  Test successful! Output: {len(audio or b'')} bytes of audio")
         return True
     except Exception as e:
         print(f"  TTS Test FAILED: {e}")
@@ -153,13 +166,100 @@ def test_tts_connection(tts_url, voice_config):
         print("  2. Check if the CustomVoice model is loaded")
         return False
 
-def generate_custom_voice(text, style, speaker, voice_config, output_path, client):
-    """Generate audio using CustomVoice model"""
+def read_generated_audio(result_item, client=None):
+    """Load a Gradio audio result into memory and reclaim its temp file.
+
+    Accepts a local file path (client downloaded the file) or a FileData
+    dict / URL (client created with download_files=False). Returns the
+    audio bytes, or None if nothing usable came back.
+    """
+    path = None
+    url = None
+    if isinstance(result_item, dict):
+        path = result_item.get("path")
+        url = result_item.get("url")
+    elif isinstance(result_item, str) and result_item.startswith(("http://", "https://")):
+        url = result_item
+    else:
+        path = result_item
+
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            data = f.read()
+        # Gradio never cleans its download dir; drop the file and its per-result
+        # folder. Anything else (a FileData path) is the server's own file.
+        download_dir = _download_dir(client)
+        folder = os.path.dirname(os.path.realpath(path))
+        if download_dir and os.path.commonpath([folder, download_dir]) == download_dir:
+            try:
+                os.remove(path)
+                if folder != download_dir:
+                    os.rmdir(folder)
+            except OSError:
+                pass
+        return data
+
+    if url:
+        import requests
+        headers = getattr(client, "headers", None) if client is not None else None
+        response = requests.get(url, headers=headers, timeout=120)
+        response.raise_for_status()
+        return response.content
+
+    return None
+
+def _download_dir(client):
+    """Directory the Gradio client downloads results into, or None if it doesn't download."""
+    download_files = getattr(client, "download_files", False)
+    if not download_files:
+        return None
+    return os.path.realpath(download_files)
+
+def wav_duration_ms(wav_bytes):
+    """Duration of an in-memory WAV, or None if the buffer is not a readable WAV."""
+    try:
+        with wave.open(io.BytesIO(wav_bytes), "rb") as w:
+            return round(w.getnframes() * 1000 / w.getframerate())
+    except (wave.Error, EOFError, ZeroDivisionError):
+        return None
+
+@functools.lru_cache(maxsize=None)
+def _converter_installed(converter):
+    # Looked up once: trying to spawn a missing ffmpeg for every chunk holds up the render threads
+    return shutil.which(converter) is not None
+
+def encode_wav_bytes(wav_bytes, output_path, format="mp3"):
+    """Encode an in-memory WAV straight to output_path by piping it into ffmpeg.
+
+    Raises if ffmpeg is missing or fails, so callers can fall back to WAV.
+    """
+    from pydub import AudioSegment
+    if not _converter_installed(AudioSegment.converter):
+        raise RuntimeError(f"{AudioSegment.converter} not found")
+    command = [AudioSegment.converter, "-y", "-loglevel", "error", "-f", "wav", "-i", "pipe:0", "-f", format, output_path]
+    with tracing.span("encode", format=format, bytes=len(wav_bytes)):
+        result = subprocess.run(command, input=wav_bytes, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                env=tracing.subprocess_env())
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='replace').strip()}")
+
+def _validated_audio(result, text, client):
+    audio = read_generated_audio(result[0], client) if result else None
+    if audio is None:
+        print(f"Error: No audio file generated for: '{text[:50]}...'")
+        return None
+    if len(audio) == 0:
+        print(f"Error: Generated audio file is empty for: '{text[:50]}...'")
+        return None
+    return audio
+
+def synthesize_custom_voice(text, style, speaker, voice_config, client):
+    """Generate audio using CustomVoice model. Returns WAV bytes or None."""
     try:
         voice_data = voice_config.get(speaker)
         if not voice_data:
             print(f"Warning: No voice configuration for '{speaker}'. Skipping.")
-            return False
+            return None
 
         voice = voice_data.get("voice", "Ryan")
         default_style = voice_data.get("default_style", "")
@@ -182,40 +282,32 @@ def generate_custom_voice(text, style, speaker, voice_config, output_path, clien
 
         instruct = ', '.join(style_parts) if style_parts else "neutral"
 
-        result = client.predict(
-            text=processed_text,
-            language="Auto",
-            speaker=voice,
-            instruct=instruct,
-            model_size="1.7B",
-            seed=seed,
-            api_name="/generate_custom_voice"
-        )
-
-        generated_audio_filepath = result[0]
-        if not generated_audio_filepath or not os.path.exists(generated_audio_filepath):
-            print(f"Error: No audio file generated for: '{text[:50]}...'")
-            return False
-
-        # Check file size
-        if os.path.getsize(generated_audio_filepath) == 0:
-            print(f"Error: Generated audio file is empty for: '{text[:50]}...'")
-            return False
-
-        shutil.copy(generated_audio_filepath, output_path)
-        return True
+        # Adaptive limit on in-flight requests so the server never queues internally
+        with get_limiter("tts").acquire(cost=len(processed_text)), \
+                tracing.span("tts.predict", api="generate_custom_voice", speaker=speaker, chars=len(processed_text)):
+            result = client.predict(
+                text=processed_text,
+                language="Auto",
+                speaker=voice,
+                instruct=instruct,
+                model_size="1.7B",
+                seed=seed,
+                api_name="/generate_custom_voice"
+            )
+
+        return _validated_audio(result, text, client)
 
     except Exception as e:
         print(f"Error generating custom voice for '{speaker}': {e}")
-        return False
+        return None
 
-def generate_clone_voice(text, speaker, voice_config, output_path, client):
-    """Generate audio using voice cloning from reference audio"""
+def synthesize_clone_voice(text, speaker, voice_config, client):
+    """Generate audio using voice cloning from reference audio. Returns WAV bytes or None."""
     try:
         voice_data = voice_config.get(speaker)
         if not voice_data:
             print(f"Warning: No voice configuration for '{speaker}'. Skipping.")
-            return False
+            return None
 
         ref_audio = voice_data.get("ref_audio")
         ref_text = voice_data.get("ref_text")
@@ -223,77 +315,115 @@ def generate_clone_voice(text, speaker, voice_config, output_path, client):
 
         if not ref_audio or not ref_text:
             print(f"Warning: Clone voice for '{speaker}' missing ref_audio or ref_text. Skipping.")
-            return False
+            return None
 
         if not os.path.exists(ref_audio):
             print(f"Warning: Reference audio not found for '{speaker}': {ref_audio}")
-            return False
+            return None
 
         # Preprocess text (strip non-verbals but don't use style since clone doesn't support it)
         processed_text, _ = preprocess_text_for_tts(text)
 
-        result = client.predict(
-            handle_file(ref_audio),  # Reference audio file path (wrapped for Gradio)
-            ref_text,            # Transcript of reference audio
-            processed_text,      # Text to generate
-            "Auto",              # Language detection
-            False,               # use_xvector_only
-            "1.7B",              # Model size
-            200,                 # max_chunk_chars
-            0,                   # chunk_gap
-            seed,                # seed
-            api_name="/generate_voice_clone"
-        )
-
-        generated_audio_filepath = result[0]
-        if not generated_audio_filepath or not os.path.exists(generated_audio_filepath):
-            print(f"Error: No audio file generated for: '{text[:50]}...'")
-            return False
-
-        # Check file size
-        if os.path.getsize(generated_audio_filepath) == 0:
-            print(f"Error: Generated audio file is empty for: '{text[:50]}...'")
-            return False
-
-        shutil.copy(generated_audio_filepath, output_path)
-        return True
+        from gradio_client import handle_file
+        with get_limiter("tts").acquire(cost=len(processed_text)), \
+                tracing.span("tts.predict", api="generate_voice_clone", speaker=speaker, chars=len(processed_text)):
+            result = client.predict(
+                handle_file(ref_audio),  # Reference audio file path (wrapped for Gradio)
+                ref_text,            # Transcript of reference audio
+                processed_text,      # Text to generate
+                "Auto",              # Language detection
+                False,               # use_xvector_only
+                "1.7B",              # Model size
+                200,                 # max_chunk_chars
+                0,                   # chunk_gap
+                seed,                # seed
+                api_name="/generate_voice_clone"
+            )
+
+        return _validated_audio(result, text, client)
 
     except Exception as e:
         print(f"Error generating clone voice for '{speaker}': {e}")
-        return False
+        return None
 
-def generate_voice(text, style, speaker, voice_config, output_path, client):
-    """Generate audio using either custom voice or clone voice based on config"""
+def synthesize_voice(text, style, speaker, voice_config, client):
+    """Generate audio using either custom voice or clone voice based on config.
+
+    Returns the generated WAV as bytes (None on failure); nothing touches disk.
+    """
     voice_data = voice_config.get(speaker)
     if not voice_data:
         print(f"Warning: No voice configuration for '{speaker}'. Skipping.")
-        return False
+        return None
 
     voice_type = voice_data.get("type", "custom")
 
     if voice_type == "clone":
         # Clone voice ignores style
-        return generate_clone_voice(text, speaker, voice_config, output_path, client)
+        return synthesize_clone_voice(text, speaker, voice_config, client)
     else:
         # Custom voice uses style directions
-        return generate_custom_voice(text, style, speaker, voice_config, output_path, client)
+        return synthesize_custom_voice(text, style, speaker, voice_config, client)
 
-def combine_audio_with_pauses(audio_segments, speakers, pause_ms=DEFAULT_PAUSE_MS, same_speaker_pause_ms=SAME_SPEAKER_PAUSE_MS):
-    """Combine audio segments with pauses between them"""
+def _write_audio(audio, output_path):
+    if not audio:
+        return False
+    with open(output_path, "wb") as f:
+        f.write(audio)
+    return True
+
+def generate_custom_voice(text, style, speaker, voice_config, output_path, client):
+    """Generate audio using CustomVoice model"""
+    return _write_audio(synthesize_custom_voice(text, style, speaker, voice_config, client), output_path)
+
+def generate_clone_voice(text, speaker, voice_config, output_path, client):
+    """Generate audio using voice cloning from reference audio"""
+    return _write_audio(synthesize_clone_voice(text, speaker, voice_config, client), output_path)
+
+def generate_voice(text, style, speaker, voice_config, output_path, client):
+    """Generate audio using either custom voice or clone voice based on config"""
+    return _write_audio(synthesize_voice(text, style, speaker, voice_config, client), output_path)
+
+def combine_audio_with_pauses(audio_segments, speakers, pause_ms=DEFAULT_PAUSE_MS, same_speaker_pause_ms=SAME_SPEAKER_PAUSE_MS,
+                              last_speakers=None):
+    """Combine audio segments with pauses between them.
+
+    speakers[i] opens segment i. For segments that are themselves several
+    lines (merge regions), last_speakers[i] is who closes it.
+    """
     if not audio_segments:
         return None
 
-    silence_between_speakers = AudioSegment.silent(duration=pause_ms)
-    silence_same_speaker = AudioSegment.silent(duration=same_speaker_pause_ms)
+    from pydub import AudioSegment
+    # Converted to a common format (the highest rate, channels and width, as
+    # AudioSegment + would) and joined once: adding segments one at a time
+    # copies everything combined so far, quadratic in the length of the book
+    params = {
+        "frame_rate": max(s.frame_rate for s in audio_segments),
+        "channels": max(s.channels for s in audio_segments),
+        "sample_width": max(s.sample_width for s in audio_segments),
+    }
+
+    def pcm(segment):
+        return (segment.set_frame_rate(params["frame_rate"])
+                .set_channels(params["channels"])
+                .set_sample_width(params["sample_width"])
+                .raw_data)
+
+    silence_between_speakers = pcm(AudioSegment.silent(duration=pause_ms, frame_rate=params["frame_rate"]))
+    silence_same_speaker = pcm(AudioSegment.silent(duration=same_speaker_pause_ms, frame_rate=params["frame_rate"]))
 
-    combined = audio_segments[0]
-    prev_speaker = speakers[0]
+    if last_speakers is None:
+        last_speakers = speakers
+    parts = [pcm(audio_segments[0])]
+    prev_speaker = last_speakers[0]
 
-    for segment, speaker in zip(audio_segments[1:], speakers[1:]):
+    for segment, speaker, last_speaker in zip(audio_segments[1:], speakers[1:], last_speakers[1:]):
         if speaker == prev_speaker:
-            combined += silence_same_speaker + segment
+            parts.append(silence_same_speaker)
         else:
-            combined += silence_between_speakers + segment
-        prev_speaker = speaker
+            parts.append(silence_between_speakers)
+        parts.append(pcm(segment))
+        prev_speaker = last_speaker
 
-    return combined
+    return AudioSegment(data=b"".join(parts), **params)
@@ -0,0 +1,161 @@
+import time
+import threading
+
+DEFAULT_TTS_URL = "http://127.0.0.1:7860"
+HEALTH_CHECK_INTERVAL = 30   # seconds between background health checks
+HEALTH_CHECK_TIMEOUT = 5
+MIN_BACKOFF = 1              # seconds before the first reconnect attempt
+MAX_BACKOFF = 60
+
+class TTSClientManager:
+    """Owns one gradio Client per TTS server and keeps it usable.
+
+    - get() returns the live client, reconnecting with exponential backoff
+      when there is none (callers never block on a server that is down).
+      One caller connects; the others get None until it is done.
+    - start() connects eagerly, runs a warm-up synthesis and begins
+      background health checks that drop and replace a stale client.
+    - report_failure() lets callers flag a failed call so health is rechecked now.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self._client = None
+        self._lock = threading.Lock()
+        self._backoff = 0
+        self._next_attempt = 0.0
+        self._connecting = False
+        self._last_error = None
+        self._last_check = None
+        self._warm = False
+        self._stop = threading.Event()
+        self._check_now = threading.Event()
+        self._thread = None
+
+    def get(self):
+        """Return a connected client, or None if the server is unreachable."""
+        with self._lock:
+            if self._client is not None:
+                return self._client
+            if self._connecting or time.monotonic() < self._next_attempt:
+                return None
+            self._connecting = True
+        # The handshake can take seconds; other callers must not wait on the lock for it
+        return self._connect()
+
+    def _connect(self):
+        print(f"Connecting to TTS server at {self.url}...")
+        try:
+            # Imported on first connect; gradio_client is slow to load
+            from gradio_client import Client
+            # download_files=False: results come back as URLs and are fetched
+            # straight into memory instead of piling up in Gradio's temp dir
+            client = Client(self.url, verbose=False, download_files=False)
+        except Exception as e:
+            with self._lock:
+                self._backoff = min(MAX_BACKOFF, max(MIN_BACKOFF, self._backoff * 2))
+                self._next_attempt = time.monotonic() + self._backoff
+                self._last_error = str(e)
+                self._connecting = False
+            print(f"Failed to connect to TTS: {e} (retrying in {self._backoff}s)")
+            return None
+        with self._lock:
+            self._client = client
+            self._backoff = 0
+            self._next_attempt = 0.0
+            self._last_error = None
+            self._connecting = False
+        return client
+
+    def invalidate(self):
+        """Drop the current client; the next get() reconnects."""
+        with self._lock:
+            self._client = None
+            self._warm = False
+
+    def report_failure(self):
+        self._check_now.set()
+
+    def is_healthy(self):
+        import requests
+        try:
+            r = requests.get(f"{self.url.rstrip('/')}/config", timeout=HEALTH_CHECK_TIMEOUT)
+            healthy = r.status_code == 200
+            if not healthy:
+                self._last_error = f"Health check returned HTTP {r.status_code}"
+        except Exception as e:
+            self._last_error = str(e)
+            healthy = False
+        self._last_check = time.time()
+        return healthy
+
+    def warm_up(self, voice="Ryan"):
+        """Run one short synthesis so model weights and caches are hot."""
+        client = self.get()
+        if client is None:
+            return False
+        try:
+            start = time.perf_counter()
+            client.predict(
+                text="Warming up.",
+                language="Auto",
+                speaker=voice,
+                instruct="neutral",
+                model_size="1.7B",
+                seed=-1,
+                api_name="/generate_custom_voice"
+            )
+            self._warm = True
+            print(f"TTS warm-up finished in {time.perf_counter() - start:.1f}s")
+            return True
+        except Exception as e:
+            self._last_error = str(e)
+            print(f"TTS warm-up failed: {e}")
+            return False
+
+    def start(self, voice="Ryan"):
+        """Connect, warm up and begin health checks on a background thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(voice,), name="tts-health", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._check_now.set()
+
+    def _run(self, voice):
+        self.warm_up(voice)
+        while not self._stop.is_set():
+            self._check_now.wait(HEALTH_CHECK_INTERVAL)
+            self._check_now.clear()
+            if self._stop.is_set():
+                break
+
+            if self._client is not None and not self.is_healthy():
+                print(f"TTS server at {self.url} failed health check: {self._last_error}")
+                self.invalidate()
+
+            if self._client is None and self.get() is not None:
+                # Fresh connection: pay the cold start here, not on a user's chunk
+                self.warm_up(voice)
+
+    def status(self):
+        return {
+            "url": self.url,
+            "connected": self._client is not None,
+            "warm": self._warm,
+            "last_error": self._last_error,
+            "last_check": self._last_check,
+        }
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+def get_manager(url=DEFAULT_TTS_URL):
+    """Return the shared TTSClientManager for a server URL."""
+    with _managers_lock:
+        if url not in _managers:
+            _managers[url] = TTSClientManager(url)
+        return _managers[url]
@@ -0,0 +1,68 @@
+import os
+import sys
+import signal
+import argparse
+import threading
+from lease_store import LeaseStore, DEFAULT_LEASE_SECONDS
+from render_farm import FarmWorker, default_store_path
+from tts_client import DEFAULT_TTS_URL
+from json_store import get_file
+import concurrency
+import tracing
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BASE_DIR)
+# App-wide settings, shared by every project (same file as the app's CONFIG_PATH)
+CONFIG_PATH = os.path.join(BASE_DIR, "config.json")
+
+def load_config():
+    """The app's config.json; defaults ({}) if it is missing or unreadable."""
+    config_file = get_file(CONFIG_PATH)
+    if not config_file.exists():
+        print(f"No {CONFIG_PATH}; using default settings")
+    # An unreadable file is reported by json_store, which falls back to {} too
+    return config_file.load()
+
+def main(argv=None):
+    """Standalone render worker.
+
+    Run any number of these, on this machine or others that mount the project
+    directory, with the app's render mode set to "farm":
+
+        python app/worker.py --tts-url http://gpu-box:7860
+    """
+    parser = argparse.ArgumentParser(description="Alexandria render worker")
+    parser.add_argument("--root", default=ROOT_DIR, help="project directory (shared with the app)")
+    parser.add_argument("--tts-url", help="TTS server to render with (default: app config)")
+    parser.add_argument("--id", help="worker id shown in the app (default: host-pid)")
+    parser.add_argument("--store", help="lease store path (default: <root>/render_farm.db)")
+    parser.add_argument("--lease-seconds", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    config = load_config()
+    render_config = config.get("render", {})
+    concurrency.configure("tts", config.get("tts", {}))
+    tracing_config = config.get("tracing", {})
+    if tracing_config.get("enabled"):
+        tracing.enable(tracing_config.get("path"))
+    store = LeaseStore(args.store or render_config.get("store") or default_store_path(args.root))
+    worker = FarmWorker(
+        args.root, store,
+        tts_url=args.tts_url or config.get("tts", {}).get("url", DEFAULT_TTS_URL),
+        worker_id=args.id,
+        lease_seconds=args.lease_seconds or render_config.get("lease_seconds", DEFAULT_LEASE_SECONDS),
+        normalize_dbfs=config.get("pipeline", {}).get("normalize_dbfs"),
+    )
+
+    stop = threading.Event()
+    # SIGTERM finishes the current chunk then exits; Ctrl+C gives its lease back.
+    # After a crash the lease expires and another worker picks the chunk up
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        worker.run(stop)
+    except KeyboardInterrupt:
+        print("Worker stopped")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
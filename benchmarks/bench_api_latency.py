@@ -0,0 +1,239 @@
+"""API latency while the render queue is busy.
+
+Copies the app into a temporary project with a synthetic script, starts it
+under uvicorn with TTS replaced by a stub (a sleep per chunk plus a short
+generated tone of a plausible length for its text, so chunks.json rewrites,
+take QA and audio post-processing are real),
+and has a few client threads poll the UI's endpoints. Latency percentiles
+are measured while idle and then during a full "Render All".
+
+    python benchmarks/bench_api_latency.py
+    python benchmarks/bench_api_latency.py --chunks 5000 --workers 8 --seconds 20
+
+Exits with status 1 if the p99 latency while rendering exceeds --threshold
+times the idle p99 (plus MIN_P99_MS of timer noise), i.e. if rendering
+stalls the event loop. The render workers and the audio pipeline run at idle
+CPU priority (concurrency.lower_priority), so on a one or two core box what
+is left of the tail is mostly the GIL they share with the event loop.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import statistics
+import http.client
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+APP_DIR = os.path.join(ROOT_DIR, "app")
+
+DEFAULT_THRESHOLD = 2.0
+MIN_P99_MS = 3.0           # floor for a near-zero idle p99; small enough not to hide a 2x regression
+AUDIO_MS_PER_CHAR = 60.0   # stub take length; passes take QA, so no retakes are queued
+SPEAKERS = ["NARRATOR", "ELENA", "MARCUS", "THE STRANGER", "CAPTAIN REYES", "MOTHER"]
+ENDPOINTS = [
+    "/api/render/status",
+    "/api/chunks?offset={offset}&limit=100",
+    "/api/voices",
+    "/api/config",
+    "/api/progress",
+]
+
+# --- Server side (runs in a subprocess with --serve) ---
+
+def serve(root, port, tts_ms):
+    sys.path.insert(0, os.path.join(root, "app"))
+    import uvicorn
+    import project
+    from concurrency import get_limiter
+    from stub_tts_server import make_tone, make_wav
+    tone = make_tone()
+
+    def stub_synthesize(self, job):
+        with get_limiter("tts").acquire(cost=len(job["text"])):
+            time.sleep(tts_ms / 1000)
+        job["audio"] = make_wav(AUDIO_MS_PER_CHAR * len(job["text"]), tone)
+        job["render_hash"] = None
+        return True, None
+
+    project.ProjectManager.synthesize_chunk = stub_synthesize
+    import app
+    uvicorn.run(app.app, host="127.0.0.1", port=port, log_level="warning")
+
+def make_project(root, chunks, workers):
+    shutil.copytree(APP_DIR, os.path.join(root, "app"),
+                    ignore=shutil.ignore_patterns("__pycache__", "uploads", "config.json"))
+    config = {
+        "tts": {"url": "http://127.0.0.1:9", "max_concurrency": workers},
+        "render": {"workers": workers},
+    }
+    with open(os.path.join(root, "app", "config.json"), "w") as f:
+        json.dump(config, f)
+    # Alternating speakers so every entry becomes its own chunk
+    script = [
+        {"speaker": SPEAKERS[i % len(SPEAKERS)], "text": f"Line {i}. " + "The night was quiet. " * 10, "style": ""}
+        for i in range(chunks)
+    ]
+    with open(os.path.join(root, "annotated_script.json"), "w") as f:
+        json.dump(script, f)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+# --- Client side ---
+
+def request(conn, method, path, body=None):
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    return response.status, data
+
+def wait_ready(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            if request(conn, "GET", "/api/render/status")[0] == 200:
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def poll(port, seconds, clients, total_chunks):
+    """Hit ENDPOINTS round-robin from several threads. Returns {endpoint: [ms]}."""
+    latencies = {endpoint: [] for endpoint in ENDPOINTS}
+    lock = threading.Lock()
+    stop = time.time() + seconds
+
+    def client(n):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        i = n
+        while time.time() < stop:
+            endpoint = ENDPOINTS[i % len(ENDPOINTS)]
+            path = endpoint.format(offset=(i * 100) % max(total_chunks, 1))
+            start = time.perf_counter()
+            status, _ = request(conn, "GET", path)
+            elapsed = (time.perf_counter() - start) * 1000
+            if status != 200:
+                raise RuntimeError(f"{path} returned {status}")
+            with lock:
+                latencies[endpoint].append(elapsed)
+            i += 1
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+def summarize(latencies):
+    every = [ms for values in latencies.values() for ms in values]
+    rows = {endpoint: values for endpoint, values in latencies.items()}
+    rows["all"] = every
+    return {
+        name: {
+            "count": len(values),
+            "p50_ms": round(statistics.median(values), 1) if values else 0.0,
+            "p95_ms": round(percentile(values, 95), 1),
+            "p99_ms": round(percentile(values, 99), 1),
+            "max_ms": round(max(values), 1) if values else 0.0,
+        }
+        for name, values in rows.items()
+    }
+
+def print_phase(title, summary):
+    print(f"\n{title}")
+    print(f"  {'endpoint':<40} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for name, row in summary.items():
+        print(f"  {name:<40} {row['count']:>6} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+              f"{row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=3000, help="chunks in the synthetic project")
+    parser.add_argument("--workers", type=int, default=8, help="render workers (and TTS concurrency)")
+    parser.add_argument("--tts-ms", type=float, default=20.0, help="stub TTS time per chunk")
+    parser.add_argument("--clients", type=int, default=4, help="polling client threads")
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration of each phase")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--output", help="also write the results to a JSON file")
+    parser.add_argument("--serve", nargs=3, metavar=("ROOT", "PORT", "TTS_MS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.serve[0], int(args.serve[1]), float(args.serve[2]))
+        return 0
+
+    root = tempfile.mkdtemp(prefix="alexandria-latency-")
+    port = free_port()
+    log_path = os.path.join(root, "server.log")
+    server = None
+    try:
+        make_project(root, args.chunks, args.workers)
+        with open(log_path, "w") as log:
+            server = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--serve", root, str(port), str(args.tts_ms)],
+                cwd=root, stdout=log, stderr=subprocess.STDOUT,
+                start_new_session=True    # so the pipeline's worker processes go with it
+            )
+        if not wait_ready(port):
+            with open(log_path, "r") as f:
+                print(f.read()[-3000:])
+            print("Server did not start")
+            return 1
+
+        idle = summarize(poll(port, args.seconds, args.clients, args.chunks))
+        print_phase(f"Idle ({args.chunks} chunks, {args.clients} clients)", idle)
+
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        status, data = request(conn, "POST", "/api/render/all", {})
+        queued = json.loads(data).get("queued", 0)
+        busy = summarize(poll(port, args.seconds, args.clients, args.chunks))
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        _, data = request(conn, "GET", "/api/render/status")
+        render = json.loads(data).get("progress") or {}
+        print_phase(f"Rendering ({queued} queued, {args.workers} workers, "
+                    f"{render.get('done', 0)} rendered during the phase)", busy)
+    finally:
+        if server is not None:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait(timeout=10)
+            try:
+                # Pool workers inherit uvicorn's SIGTERM handler and can outlive it
+                os.killpg(server.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        shutil.rmtree(root, ignore_errors=True)
+
+    limit = max(idle["all"]["p99_ms"] * args.threshold, MIN_P99_MS)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"idle": idle, "rendering": busy, "p99_limit_ms": limit}, f, indent=2)
+
+    p99 = busy["all"]["p99_ms"]
+    print(f"\np99 while rendering: {p99:.1f} ms (limit {limit:.1f} ms)")
+    if p99 > limit:
+        print(f"REGRESSION: rendering raised API p99 from {idle['all']['p99_ms']:.1f} ms to {p99:.1f} ms")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""Microbenchmarks for the text, chunking and audio-assembly hot paths.
+
+Runs each function over synthetic novels of 100k, 1M and 10M characters and
+records wall time (best of --repeat runs) and peak Python memory (tracemalloc).
+
+    python benchmarks/bench_hotpaths.py                  # compare with baseline
+    python benchmarks/bench_hotpaths.py --save-baseline  # record a new baseline
+    python benchmarks/bench_hotpaths.py --sizes 100k,1M --only split,group
+
+Exits with status 1 if any case got slower or heavier than the baseline by
+more than --threshold. Baselines are machine specific; record one before
+starting an optimization and compare against it on the same machine.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+import warnings
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "app"))
+
+warnings.filterwarnings("ignore", message="Couldn't find ffmpeg")
+
+from pydub import AudioSegment
+from generate_script import split_into_chunks, clean_json_string, fix_mojibake
+from tts import preprocess_text_for_tts, combine_audio_with_pauses
+from project import group_into_chunks
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+SIZES = {"100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+DEFAULT_THRESHOLD = 1.25   # flag cases more than 25% worse than baseline
+MIN_SECONDS = 0.005        # timings below this are too noisy to compare
+MIN_PEAK_MB = 1.0
+
+# --- Synthetic inputs (deterministic for a given size) ---
+
+WORDS = (
+    "the a of and to in was he she it that his her with for as had on at by "
+    "said night house door light road river window letter voice morning king "
+    "captain silence shadow stranger garden remember whispered suddenly slowly "
+    "never always perhaps quite almost nothing everything somewhere"
+).split()
+SPEAKERS = ["NARRATOR", "ELENA", "MARCUS", "THE STRANGER", "CAPTAIN REYES", "MOTHER"]
+NONVERBALS = ["[laughs]", "[sighs]", "[gasps]", "[whispers]", "[clears throat]", "[pauses]", "[coughs]"]
+MOJIBAKE = ["â€™", "â€œ", "â€\x9d", "â€”", "â€¦"]
+
+def _sentence(rng, words=None):
+    n = words or rng.randint(6, 24)
+    text = " ".join(rng.choice(WORDS) for _ in range(n))
+    return text[0].upper() + text[1:] + rng.choice([".", ".", ".", "!", "?"])
+
+def make_novel(size, seed=1):
+    """Plain-text novel of about `size` chars: narration, dialogue, the odd
+    mojibake sequence and the occasional overlong paragraph."""
+    rng = random.Random(seed)
+    paragraphs = []
+    total = 0
+    while total < size:
+        kind = rng.random()
+        if kind < 0.4:
+            para = f"“{_sentence(rng)}” {rng.choice(['she said', 'he said', 'Marcus whispered'])}."
+        elif kind < 0.42:
+            # Paragraphs longer than a chunk exercise the sentence splitter
+            para = " ".join(_sentence(rng) for _ in range(300))
+        else:
+            para = " ".join(_sentence(rng) for _ in range(rng.randint(2, 7)))
+        if rng.random() < 0.05:
+            para = para.replace(" ", f" {rng.choice(MOJIBAKE)} ", 1)
+        paragraphs.append(para)
+        total += len(para) + 2
+    return "\n\n".join(paragraphs)[:size]
+
+def make_script(size, seed=2):
+    """Annotated script entries totalling about `size` chars of text."""
+    rng = random.Random(seed)
+    entries = []
+    total = 0
+    speaker = "NARRATOR"
+    while total < size:
+        if rng.random() < 0.35:
+            speaker = rng.choice(SPEAKERS)
+        text = _sentence(rng)
+        if rng.random() < 0.15:
+            text = f"{rng.choice(NONVERBALS)} {text}"
+        entries.append({"speaker": speaker, "text": text, "style": rng.choice(["", "", "calm", "tense, quiet"])})
+        total += len(text)
+    return entries
+
+def make_llm_response(size, seed=3):
+    """Raw LLM output of about `size` chars: a thinking block, a fenced JSON
+    array with escapes and a literal newline, and trailing chatter."""
+    entries = make_script(int(size * 0.75), seed)
+    body = json.dumps(entries, ensure_ascii=False, indent=2)
+    body = body.replace("\\n", "\n", 1)
+    thinking = "<think>" + " ".join(WORDS) * max(1, size // 4000) + "</think>\n"
+    return f"{thinking}Here is the script:\n```json\n{body}\n```\nLet me know if you need changes."
+
+def make_segments(size, seed=4):
+    """One 200 ms clip per 500 chars of book, about one per rendered chunk
+    (MAX_CHUNK_CHARS): 200, 2000 and 20000 clips."""
+    rng = random.Random(seed)
+    count = max(2, size // 500)
+    clip = AudioSegment.silent(duration=200, frame_rate=24000)
+    speakers = []
+    speaker = SPEAKERS[0]
+    for _ in range(count):
+        if rng.random() < 0.4:
+            speaker = rng.choice(SPEAKERS)
+        speakers.append(speaker)
+    return [clip] * count, speakers
+
+# --- Cases: name -> (setup(size) -> args, func) ---
+
+CASES = {
+    "split_into_chunks": (lambda size: (make_novel(size),), split_into_chunks),
+    "fix_mojibake": (lambda size: (make_novel(size),), fix_mojibake),
+    "clean_json_string": (lambda size: (make_llm_response(size),), clean_json_string),
+    "preprocess_text_for_tts": (
+        lambda size: (make_script(size),),
+        lambda entries: [preprocess_text_for_tts(e["text"]) for e in entries]
+    ),
+    "group_into_chunks": (lambda size: (make_script(size),), group_into_chunks),
+    "combine_audio_with_pauses": (make_segments, combine_audio_with_pauses),
+}
+
+def measure(func, args, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+
+    # Separate pass: tracemalloc slows the code under test
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(best, 5), "peak_mb": round(peak / (1024 * 1024), 3)}
+
+def compare(current, baseline, threshold):
+    """Return a list of (case, metric, old, new) that regressed."""
+    regressions = []
+    for case, result in current.items():
+        old = baseline.get(case)
+        if not old:
+            continue
+        if result["seconds"] >= MIN_SECONDS and result["seconds"] > old["seconds"] * threshold:
+            regressions.append((case, "seconds", old["seconds"], result["seconds"]))
+        if result["peak_mb"] >= MIN_PEAK_MB and result["peak_mb"] > old["peak_mb"] * threshold:
+            regressions.append((case, "peak_mb", old["peak_mb"], result["peak_mb"]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(SIZES), help="comma list of 100k,1M,10M")
+    parser.add_argument("--only", default="", help="comma list of case name prefixes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    args = parser.parse_args(argv)
+
+    sizes = [s for s in args.sizes.split(",") if s]
+    for s in sizes:
+        if s not in SIZES:
+            parser.error(f"unknown size {s}")
+    prefixes = [p for p in args.only.split(",") if p]
+    cases = {n: c for n, c in CASES.items() if not prefixes or any(n.startswith(p) for p in prefixes)}
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f).get("results", {})
+
+    results = {}
+    print(f"{'case':<40} {'time':>10} {'peak':>10} {'vs baseline':>14}")
+    for size_name in sizes:
+        for name, (setup, func) in cases.items():
+            key = f"{name}@{size_name}"
+            result = measure(func, setup(SIZES[size_name]), args.repeat)
+            results[key] = result
+
+            delta = ""
+            if key in baseline and baseline[key]["seconds"]:
+                delta = f"{result['seconds'] / baseline[key]['seconds']:.2f}x"
+            print(f"{key:<40} {result['seconds']:>9.4f}s {result['peak_mb']:>8.1f}MB {delta:>14}")
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        if os.path.exists(args.baseline):
+            # Keep results for cases/sizes not run this time
+            with open(args.baseline, "r") as f:
+                report["results"] = {**json.load(f).get("results", {}), **results}
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not baseline:
+        print("No baseline found; run with --save-baseline to record one.")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for case, metric, old, new in regressions:
+        print(f"REGRESSION {case}: {metric} {old} -> {new} ({new / old:.2f}x)")
+    if regressions:
+        return 1
+    print(f"No regressions beyond {args.threshold:.2f}x baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
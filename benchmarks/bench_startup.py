@@ -0,0 +1,138 @@
+"""Startup-time report for the app and the CLI scripts.
+
+For each entry module, imports it in a fresh interpreter under -X importtime
+and reports the process wall time (median of --repeat launches), the total
+import time and the slowest imports by cumulative time.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --modules app,parse_voices --top 20
+    python benchmarks/bench_startup.py --save-baseline
+
+Like bench_hotpaths.py, compares against a stored baseline and exits with
+status 1 when a module's startup got slower than --threshold times baseline.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+APP_DIR = os.path.join(ROOT_DIR, "app")
+
+DEFAULT_MODULES = ["app", "generate_script", "generate_audiobook", "parse_voices", "project", "tts"]
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "startup_baseline.json")
+DEFAULT_THRESHOLD = 1.25
+# Packages that should only load on first use, never at import
+HEAVY_MODULES = ["pydub", "gradio_client", "openai", "requests", "numpy"]
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into [(module, self_us, cumulative_us, depth)]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+def launch(module):
+    """Import module in a fresh interpreter. Returns (wall_seconds, importtime rows, heavy modules loaded)."""
+    code = (
+        f"import sys, warnings; warnings.simplefilter('ignore'); import {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    heavy = [m for m in result.stdout.strip().split(",") if m]
+    return wall, parse_importtime(result.stderr), heavy
+
+def report_module(module, repeat, top):
+    walls = []
+    rows = heavy = None
+    for _ in range(repeat):
+        wall, rows, heavy = launch(module)
+        walls.append(wall)
+
+    total_us = sum(r[1] for r in rows)
+    result = {
+        "wall_seconds": round(statistics.median(walls), 4),
+        "import_seconds": round(total_us / 1e6, 4),
+        "heavy_loaded": heavy,
+        "slowest": [
+            {"module": name, "cumulative_ms": round(cum / 1000, 1), "self_ms": round(self_us / 1000, 1)}
+            for name, self_us, cum, depth in sorted(rows, key=lambda r: -r[2])
+            if name != module
+        ][:top],
+    }
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", default=",".join(DEFAULT_MODULES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list per module")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f).get("results", {})
+
+    results = {}
+    for module in [m for m in args.modules.split(",") if m]:
+        result = report_module(module, args.repeat, args.top)
+        results[module] = result
+
+        delta = ""
+        if module in baseline:
+            delta = f"  ({result['wall_seconds'] / baseline[module]['wall_seconds']:.2f}x baseline)"
+        print(f"\n{module}: {result['wall_seconds'] * 1000:.0f} ms wall, "
+              f"{result['import_seconds'] * 1000:.0f} ms importing{delta}")
+        if result["heavy_loaded"]:
+            print(f"  eagerly loads: {', '.join(result['heavy_loaded'])}")
+        for row in result["slowest"]:
+            print(f"  {row['cumulative_ms']:>8.1f} ms  {row['module']}")
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    regressions = [
+        (m, baseline[m]["wall_seconds"], r["wall_seconds"])
+        for m, r in results.items()
+        if m in baseline and r["wall_seconds"] > baseline[m]["wall_seconds"] * args.threshold
+    ]
+    for module, old, new in regressions:
+        print(f"REGRESSION {module}: startup {old * 1000:.0f} ms -> {new * 1000:.0f} ms ({new / old:.2f}x)")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
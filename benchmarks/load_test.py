@@ -0,0 +1,375 @@
+"""Load test: many editors on the chunk table while a render runs.
+
+Starts the stub TTS server (stub_tts_server.py) and the app on a synthetic
+book of --chunks chunks, queues a "Render All", then runs --users simulated
+editors for --seconds. Each editor behaves like the UI: it loads a page of
+the chunk table, keeps refreshing it (with `since` and If-None-Match, as the
+page does), edits chunks, re-renders them, checks the render status and now
+and then merges the audiobook. The mix of actions is set with --mix.
+
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --chunks 20000 --users 50 --seconds 120 --tts-slots 4
+    python benchmarks/load_test.py --url http://gpu-box:4200 --project my-book --no-render
+
+With --url the test runs against an app that is already running (and its
+own TTS server and book) instead. Reports throughput, latency percentiles
+and the error rate per action, and how many chunks were rendered meanwhile.
+Exits with status 1 if more than --max-error-rate of the requests failed.
+Editing changes the book; with --url, point it at a scratch project.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+import urllib.parse
+from bench_api_latency import SPEAKERS, free_port, wait_ready, percentile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+APP_DIR = os.path.join(ROOT_DIR, "app")
+
+PAGE_SIZE = 100            # rows per page, as in the UI
+DEFAULT_MIX = "refresh=60,page=8,edit=12,generate=10,status=8,merge=2"
+DEFAULT_MAX_ERROR_RATE = 0.01
+# Responses that are a normal answer for an action (a merge is refused while one is running)
+ACCEPTED = {"merge": (200, 400), "refresh": (200, 304)}
+WORDS = ("the night was quiet and the river ran dark under the old stone bridge while "
+         "she waited for a sign that never came").split()
+
+# --- Setup ---
+
+def make_book(root, chunks, tts_url, workers, seed=1):
+    shutil.copytree(APP_DIR, os.path.join(root, "app"),
+                    ignore=shutil.ignore_patterns("__pycache__", "uploads", "config.json"))
+    config = {
+        "tts": {"url": tts_url, "max_concurrency": workers},
+        "render": {"workers": workers},
+    }
+    with open(os.path.join(root, "app", "config.json"), "w") as f:
+        json.dump(config, f)
+    with open(os.path.join(root, "voice_config.json"), "w") as f:
+        json.dump({speaker: {"type": "custom", "voice": "Ryan", "seed": "1"} for speaker in SPEAKERS}, f)
+    # Alternating speakers so every entry becomes its own chunk; lengths as in real scripts
+    rng = random.Random(seed)
+    script = [
+        {"speaker": SPEAKERS[i % len(SPEAKERS)],
+         "text": f"Line {i}. " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 70))) + ".",
+         "style": ""}
+        for i in range(chunks)
+    ]
+    with open(os.path.join(root, "annotated_script.json"), "w") as f:
+        json.dump(script, f)
+
+def start_process(command, cwd, log_path):
+    with open(log_path, "w") as log:
+        return subprocess.Popen(command, cwd=cwd, stdout=log, stderr=subprocess.STDOUT,
+                                start_new_session=True)   # so the app's pool processes go with it
+
+def stop_process(process):
+    if process is None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=10)
+        # Pool workers inherit uvicorn's SIGTERM handler and can outlive it
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+def wait_for(url, timeout=30):
+    parts = urllib.parse.urlsplit(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=5)
+            conn.request("GET", parts.path)
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+# --- Simulated editors ---
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("refresh", "page", "edit", "generate", "status", "merge"):
+            raise ValueError(f"Unknown action in --mix: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+class Editor:
+    """One UI session: its keep-alive connection, current page and sync state."""
+
+    def __init__(self, host, port, project, total, rng):
+        self.host = host
+        self.port = port
+        self.project = project
+        self.total = total
+        self.rng = rng
+        self.conn = None
+        self.offset = rng.randrange(0, max(total, 1), PAGE_SIZE) if total else 0
+        self.rows = []
+        self.version = None
+        self.etag = None
+        self.edited = None
+
+    def url(self, path, **params):
+        if self.project:
+            params["project"] = self.project
+        return f"{path}?{urllib.parse.urlencode(params)}" if params else path
+
+    def request(self, method, path, body=None, headers=None):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        headers = dict(headers or {})
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+        try:
+            self.conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = self.conn.getresponse()
+            return response.status, response.read(), response.headers
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+
+    def remember(self, status, data, headers, replace):
+        if status != 200:
+            return
+        page = json.loads(data)
+        self.version = page.get("version")
+        self.etag = headers.get("ETag")
+        self.total = page.get("total", self.total)
+        if replace:
+            self.rows = page["items"]
+        else:
+            changed = {row["id"]: row for row in page["items"]}
+            self.rows = [changed.get(row["id"], row) for row in self.rows]
+
+    def page(self):
+        if self.total:
+            self.offset = self.rng.randrange(0, self.total, PAGE_SIZE)
+        status, data, headers = self.request("GET", self.url("/api/chunks", offset=self.offset, limit=PAGE_SIZE))
+        self.remember(status, data, headers, replace=True)
+        return status
+
+    def refresh(self):
+        if self.version is None:
+            return self.page()
+        status, data, headers = self.request(
+            "GET", self.url("/api/chunks", offset=self.offset, limit=PAGE_SIZE, since=self.version),
+            headers={"If-None-Match": self.etag} if self.etag else None
+        )
+        self.remember(status, data, headers, replace=False)
+        return status
+
+    def edit(self):
+        if not self.rows:
+            return self.page()
+        row = self.rng.choice(self.rows)
+        # Toggle a trailing marker so every edit really changes the text
+        text = row["text"][:-2] if row["text"].endswith(" *") else row["text"] + " *"
+        status, data, _ = self.request("POST", self.url(f"/api/chunks/{row['id']}"), {"text": text})
+        if status == 200:
+            row.update(json.loads(data))
+            self.edited = row["id"]
+        return status
+
+    def generate(self):
+        if self.edited is None and not self.rows:
+            return self.page()
+        index = self.edited if self.edited is not None else self.rng.choice(self.rows)["id"]
+        self.edited = None
+        return self.request("POST", self.url(f"/api/chunks/{index}/generate"), {})[0]
+
+    def status(self):
+        return self.request("GET", self.url("/api/render/status"))[0]
+
+    def merge(self):
+        return self.request("POST", self.url("/api/merge"), {})[0]
+
+def run_editors(host, port, project, total, users, seconds, mix, think_ms, seed):
+    """Run the editors until the time is up. Returns {action: [(ms, ok, status)]}."""
+    results = {name: [] for name in mix}
+    lock = threading.Lock()
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    stop = time.time() + seconds
+
+    def editor(n):
+        rng = random.Random(seed + n)
+        session = Editor(host, port, project, total, rng)
+        try:
+            session.page()
+        except (OSError, http.client.HTTPException):
+            pass
+        while time.time() < stop:
+            action = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                status = getattr(session, action)()
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - start) * 1000
+            ok = status in ACCEPTED.get(action, (200,))
+            with lock:
+                results[action].append((elapsed, ok, status))
+            # Think time between clicks, exponentially distributed
+            time.sleep(min(rng.expovariate(1000 / think_ms), 10 * think_ms / 1000) if think_ms else 0)
+
+    threads = [threading.Thread(target=editor, args=(n,), daemon=True) for n in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+def chunk_counts(host, port, project):
+    """(total chunks, chunks done) from the chunk list's status counts."""
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    params = {"limit": 1}
+    if project:
+        params["project"] = project
+    conn.request("GET", f"/api/chunks?{urllib.parse.urlencode(params)}")
+    page = json.loads(conn.getresponse().read())
+    return page["total"], page.get("status_counts", {}).get("done", 0)
+
+def summarize(results, seconds):
+    rows = dict(results)
+    rows["all"] = [sample for samples in results.values() for sample in samples]
+    summary = {}
+    for name, samples in rows.items():
+        times = [ms for ms, _, _ in samples]
+        errors = {}
+        for _, ok, status in samples:
+            if not ok:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+        summary[name] = {
+            "count": len(samples),
+            "rps": round(len(samples) / seconds, 1),
+            "p50_ms": round(percentile(times, 50), 1),
+            "p95_ms": round(percentile(times, 95), 1),
+            "p99_ms": round(percentile(times, 99), 1),
+            "max_ms": round(max(times), 1) if times else 0.0,
+            "errors": sum(errors.values()),
+            "error_rate": round(sum(errors.values()) / len(samples), 4) if samples else 0.0,
+            "error_statuses": errors,
+        }
+    return summary
+
+def print_summary(summary):
+    print(f"\n  {'action':<10} {'n':>7} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'errors':>7}")
+    for name, row in summary.items():
+        detail = f"  {row['error_statuses']}" if row["errors"] else ""
+        print(f"  {name:<10} {row['count']:>7} {row['rps']:>7.1f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+              f"{row['p99_ms']:>8.1f} {row['max_ms']:>8.1f} {row['error_rate']:>6.1%}{detail}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=3000, help="chunks in the synthetic book")
+    parser.add_argument("--users", type=int, default=10, help="simulated editors")
+    parser.add_argument("--seconds", type=float, default=30.0, help="test duration")
+    parser.add_argument("--think-ms", type=float, default=500.0, help="mean pause between an editor's actions")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="action weights (refresh, page, edit, generate, status, merge)")
+    parser.add_argument("--no-render", action="store_true", help="do not queue a Render All first")
+    parser.add_argument("--workers", type=int, default=4, help="render workers (and TTS concurrency)")
+    parser.add_argument("--tts-slots", type=int, default=2, help="calls the stub TTS serves at once")
+    parser.add_argument("--tts-latency-ms", type=float, default=200.0)
+    parser.add_argument("--tts-ms-per-char", type=float, default=5.0)
+    parser.add_argument("--tts-error-rate", type=float, default=0.0)
+    parser.add_argument("--url", help="test an app that is already running instead")
+    parser.add_argument("--project", help="project id to work on (default project if omitted)")
+    parser.add_argument("--max-error-rate", type=float, default=DEFAULT_MAX_ERROR_RATE)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the results to a JSON file")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    root = None
+    stub = server = None
+    try:
+        if args.url:
+            parts = urllib.parse.urlsplit(args.url)
+            host, port = parts.hostname, parts.port or 80
+        else:
+            root = tempfile.mkdtemp(prefix="alexandria-load-")
+            host, port, tts_port = "127.0.0.1", free_port(), free_port()
+            tts_url = f"http://{host}:{tts_port}"
+            make_book(root, args.chunks, tts_url, args.workers, args.seed)
+            stub = start_process(
+                [sys.executable, os.path.join(BENCH_DIR, "stub_tts_server.py"), "--port", str(tts_port),
+                 "--slots", str(args.tts_slots), "--latency-ms", str(args.tts_latency_ms),
+                 "--ms-per-char", str(args.tts_ms_per_char), "--error-rate", str(args.tts_error_rate),
+                 "--seed", str(args.seed)],
+                root, os.path.join(root, "stub_tts.log")
+            )
+            server = start_process(
+                [sys.executable, "-m", "uvicorn", "app:app", "--app-dir", os.path.join(root, "app"),
+                 "--host", host, "--port", str(port), "--log-level", "warning"],
+                root, os.path.join(root, "server.log")
+            )
+            if not wait_for(f"{tts_url}/stats") or not wait_ready(port):
+                for log_name in ("stub_tts.log", "server.log"):
+                    with open(os.path.join(root, log_name), "r") as f:
+                        print(f.read()[-3000:])
+                print("Servers did not start")
+                return 1
+
+        total, done_before = chunk_counts(host, port, args.project)
+        queued = 0
+        if not args.no_render:
+            editor = Editor(host, port, args.project, total, random.Random(args.seed))
+            status, data, _ = editor.request("POST", editor.url("/api/render/all"), {})
+            queued = json.loads(data).get("queued", 0) if status == 200 else 0
+
+        print(f"{args.users} editors for {args.seconds:.0f}s on {total} chunks "
+              f"({queued} queued for rendering, think time {args.think_ms:.0f} ms)")
+        started = time.time()
+        results = run_editors(host, port, args.project, total, args.users, args.seconds,
+                              mix, args.think_ms, args.seed)
+        elapsed = time.time() - started
+        _, done_after = chunk_counts(host, port, args.project)
+        tts_stats = None
+        if stub is not None:
+            conn = http.client.HTTPConnection(host, tts_port, timeout=10)
+            conn.request("GET", "/stats")
+            tts_stats = json.loads(conn.getresponse().read())
+    finally:
+        stop_process(server)
+        stop_process(stub)
+        if root:
+            shutil.rmtree(root, ignore_errors=True)
+
+    summary = summarize(results, elapsed)
+    print_summary(summary)
+    rendered = done_after - done_before
+    print(f"\n  rendered {rendered} chunks ({rendered / elapsed * 60:.0f}/min)"
+          + (f", stub TTS served {tts_stats['calls']} calls ({tts_stats['errors']} failed)" if tts_stats else ""))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "seconds": round(elapsed, 1), "actions": summary,
+                       "rendered": rendered, "tts": tts_stats}, f, indent=2)
+
+    error_rate = summary["all"]["error_rate"]
+    if error_rate > args.max_error_rate:
+        print(f"\nFAILED: {error_rate:.1%} of requests failed (limit {args.max_error_rate:.1%})")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""Stand-in TTS server for load tests.
+
+Speaks the part of the Gradio queue protocol that gradio_client uses
+(config, info, queue/join, the queue/data event stream and file downloads)
+and serves /generate_custom_voice. The app therefore talks to it through its
+real TTS client. Each call waits for one of --slots "GPUs", sleeps
+--latency-ms plus --ms-per-char per character, and returns a WAV tone of
+--audio-ms-per-char per character. A share of calls can be made to fail
+with --error-rate.
+
+    python benchmarks/stub_tts_server.py --port 7860
+    python benchmarks/stub_tts_server.py --port 7860 --slots 2 --ms-per-char 5 --error-rate 0.02
+
+Point "tts": {"url": "http://127.0.0.1:7860"} in app/config.json at it and
+give every speaker a "custom" voice (voice cloning is not stubbed).
+GET /stats returns the call counts.
+"""
+import io
+import sys
+import json
+import math
+import time
+import uuid
+import wave
+import array
+import random
+import asyncio
+import argparse
+
+SAMPLE_RATE = 24000
+HEARTBEAT_SECONDS = 15
+CLOSE_IDLE_SECONDS = 1     # like Gradio, end a session's stream once it has nothing pending
+API_PREFIX = "/gradio_api"
+# Parameter names as in the real server's /generate_custom_voice
+CUSTOM_VOICE_PARAMETERS = ["text", "language", "speaker", "instruct", "model_size", "seed"]
+
+def make_tone(seconds=1.0, frequency=220.0, amplitude=0.2):
+    samples = array.array("h", (
+        int(32767 * amplitude * math.sin(2 * math.pi * frequency * i / SAMPLE_RATE))
+        for i in range(int(SAMPLE_RATE * seconds))
+    ))
+    return samples.tobytes()
+
+def make_wav(duration_ms, tone):
+    frames = int(SAMPLE_RATE * duration_ms / 1000) * 2
+    pcm = (tone * (frames // len(tone) + 1))[:frames]
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(pcm)
+    return buffer.getvalue()
+
+def gradio_config():
+    components = [
+        {"id": i + 1, "type": "textbox", "props": {"label": name}, "api_info": {"type": "string"}}
+        for i, name in enumerate(CUSTOM_VOICE_PARAMETERS)
+    ]
+    audio_id = len(components) + 1
+    components.append({"id": audio_id, "type": "audio", "props": {"label": "audio"},
+                       "api_info": {"$ref": "#/$defs/FileData"}})
+    components.append({"id": audio_id + 1, "type": "textbox", "props": {"label": "status"},
+                       "api_info": {"type": "string"}})
+    return {
+        "version": "5.0.0",
+        "protocol": "sse_v3",
+        "api_prefix": API_PREFIX,
+        "connect_heartbeat": False,
+        "components": components,
+        "dependencies": [{
+            "id": 0,
+            "api_name": "generate_custom_voice",
+            "inputs": [c["id"] for c in components[:len(CUSTOM_VOICE_PARAMETERS)]],
+            "outputs": [audio_id, audio_id + 1],
+            "backend_fn": True,
+            "cancels": [],
+        }],
+    }
+
+def api_info():
+    return {
+        "named_endpoints": {
+            "/generate_custom_voice": {
+                "parameters": [
+                    {"label": name, "parameter_name": name, "parameter_has_default": False,
+                     "type": {"type": "string"}, "python_type": {"type": "str"}, "component": "Textbox"}
+                    for name in CUSTOM_VOICE_PARAMETERS
+                ],
+                "returns": [
+                    {"label": "audio", "type": {"type": "string"}, "python_type": {"type": "filepath"}, "component": "Audio"},
+                    {"label": "status", "type": {"type": "string"}, "python_type": {"type": "str"}, "component": "Textbox"},
+                ],
+            }
+        },
+        "unnamed_endpoints": {},
+    }
+
+def create_app(slots=1, latency_ms=200.0, ms_per_char=10.0, audio_ms_per_char=60.0, error_rate=0.0, seed=None):
+    from fastapi import FastAPI, Request, HTTPException
+    from fastapi.responses import Response, StreamingResponse
+
+    app = FastAPI()
+    rng = random.Random(seed)
+    tone = make_tone()
+    sessions = {}      # session hash -> asyncio.Queue of messages for its event stream
+    pending = {}       # session hash -> calls not completed yet
+    files = {}         # name -> WAV bytes, dropped once downloaded
+    stats = {"calls": 0, "errors": 0, "in_flight": 0, "queued": 0, "chars": 0}
+    gpu = {}
+
+    def session_queue(session_hash):
+        if session_hash not in sessions:
+            sessions[session_hash] = asyncio.Queue()
+        return sessions[session_hash]
+
+    async def complete(session_hash, message):
+        pending[session_hash] -= 1
+        await session_queue(session_hash).put(message)
+
+    async def generate(request, session_hash, event_id, data):
+        queue = session_queue(session_hash)
+        text = str(data[0] if data else "")
+        stats["queued"] += 1
+        await queue.put({"msg": "estimation", "event_id": event_id, "rank": stats["queued"] - 1,
+                         "queue_size": stats["queued"]})
+        if "semaphore" not in gpu:
+            gpu["semaphore"] = asyncio.Semaphore(slots)
+        async with gpu["semaphore"]:
+            stats["queued"] -= 1
+            stats["in_flight"] += 1
+            await queue.put({"msg": "process_starts", "event_id": event_id})
+            try:
+                await asyncio.sleep((latency_ms + ms_per_char * len(text)) / 1000)
+            finally:
+                stats["in_flight"] -= 1
+        stats["calls"] += 1
+        stats["chars"] += len(text)
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            await complete(session_hash, {"msg": "process_completed", "event_id": event_id, "success": False,
+                                          "output": {"error": "Stub TTS failure"}})
+            return
+        name = f"stub/{event_id}.wav"
+        files[name] = make_wav(max(200.0, audio_ms_per_char * len(text)), tone)
+        url = f"{str(request.base_url).rstrip('/')}{API_PREFIX}/file={name}"
+        audio = {"path": name, "url": url, "orig_name": "audio.wav", "size": len(files[name]),
+                 "mime_type": "audio/wav", "meta": {"_type": "gradio.FileData"}}
+        await complete(session_hash, {"msg": "process_completed", "event_id": event_id, "success": True,
+                                      "output": {"data": [audio, "Done"], "is_generating": False}})
+
+    @app.get("/config")
+    @app.get(API_PREFIX + "/config")
+    async def config():
+        return gradio_config()
+
+    @app.get(API_PREFIX + "/info")
+    async def info():
+        return api_info()
+
+    @app.post(API_PREFIX + "/queue/join")
+    async def join(request: Request):
+        body = await request.json()
+        if body.get("fn_index") != 0:
+            raise HTTPException(status_code=404, detail="Unknown endpoint")
+        event_id = uuid.uuid4().hex
+        session_queue(body["session_hash"])
+        pending[body["session_hash"]] = pending.get(body["session_hash"], 0) + 1
+        asyncio.create_task(generate(request, body["session_hash"], event_id, body.get("data") or []))
+        return {"event_id": event_id}
+
+    @app.get(API_PREFIX + "/queue/data")
+    async def data(session_hash: str):
+        queue = session_queue(session_hash)
+
+        async def stream():
+            # One stream per client session; the client opens a new one for its next call
+            while True:
+                idle = not pending.get(session_hash)
+                try:
+                    message = await asyncio.wait_for(queue.get(), CLOSE_IDLE_SECONDS if idle else HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if pending.get(session_hash):
+                        message = {"msg": "heartbeat"}
+                    else:
+                        yield f"data: {json.dumps({'msg': 'close_stream'})}\n\n"
+                        return
+                yield f"data: {json.dumps(message)}\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.get(API_PREFIX + "/file={name:path}")
+    async def file(name: str):
+        audio = files.pop(name, None)
+        if audio is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        return Response(audio, media_type="audio/wav")
+
+    @app.post(API_PREFIX + "/reset")
+    async def reset():
+        return {"success": True}
+
+    @app.get("/stats")
+    async def get_stats():
+        return dict(stats, sessions=len(sessions), files=len(files), time=time.time())
+
+    return app
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7860)
+    parser.add_argument("--slots", type=int, default=1, help="calls served at once (GPUs)")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="fixed time per call")
+    parser.add_argument("--ms-per-char", type=float, default=10.0, help="added time per character")
+    parser.add_argument("--audio-ms-per-char", type=float, default=60.0, help="length of the returned audio")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls that fail")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    app = create_app(args.slots, args.latency_ms, args.ms_per_char, args.audio_ms_per_char,
+                     args.error_rate, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())